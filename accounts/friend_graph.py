@@ -0,0 +1,151 @@
+"""
+Cached friend graph.
+
+Friendships are stored as two directed Friendship rows and friend requests as
+FriendRequest rows. Views should not query those tables directly; they ask
+this module, which keeps per-user id sets in the Django cache:
+
+    friend_ids(user_id)                  -> frozenset of friend user ids
+    are_friends(user_id, other_id)       -> bool
+    friends_among(user_id, ids)          -> subset of ids that are friends
+    relationships(user_id, ids)          -> {id: "friend" | "sent" | "received" | None}
+    friend_users(user)                   -> User queryset ordered by username
+
+Each user's sets are stored under a per-user version number. The signal
+handlers in accounts/signals.py bump the versions of both sides after a
+Friendship/FriendRequest change commits, which orphans the old entries
+(they expire through GRAPH_TTL). A cache outage degrades to direct queries.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import FriendRequest, Friendship
+
+GRAPH_TTL = 6 * 3600
+KEY_PREFIX = "friendgraph"
+
+
+def _version_key(user_id):
+    return f"{KEY_PREFIX}:ver:{user_id}"
+
+
+def _version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = 1
+        cache.add(_version_key(user_id), version, None)
+    return version
+
+
+def _cached_set(user_id, kind, load):
+    try:
+        key = f"{KEY_PREFIX}:{kind}:{user_id}:{_version(user_id)}"
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(load(user_id))
+            cache.set(key, ids, GRAPH_TTL)
+        return ids
+    except Exception as e:
+        print(f"⚠️ Friend graph cache unavailable ({kind}):", e)
+        return frozenset(load(user_id))
+
+
+#region LOADERS
+##################### LOADERS #####################
+
+def _load_friends(user_id):
+    # both directions, in case one of the two rows is missing
+    pairs = Friendship.objects.filter(Q(user_id=user_id) | Q(friend_id=user_id)).values_list("user_id", "friend_id")
+    return {f if u == user_id else u for u, f in pairs}
+
+
+def _load_sent(user_id):
+    return FriendRequest.objects.filter(from_user_id=user_id).values_list("to_user_id", flat=True)
+
+
+def _load_received(user_id):
+    return FriendRequest.objects.filter(to_user_id=user_id).values_list("from_user_id", flat=True)
+
+##################### /LOADERS #####################
+#endregion
+
+
+#region QUERIES
+##################### QUERIES #####################
+
+def friend_ids(user_id):
+    if not user_id:
+        return frozenset()
+    return _cached_set(user_id, "friends", _load_friends)
+
+
+def sent_request_ids(user_id):
+    """Users this user has sent a still-pending request to."""
+    return _cached_set(user_id, "sent", _load_sent)
+
+
+def received_request_ids(user_id):
+    """Users with a pending request to this user."""
+    return _cached_set(user_id, "received", _load_received)
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def are_friends(user_id, other_id):
+    return _as_int(other_id) in friend_ids(user_id)
+
+
+def friends_among(user_id, candidate_ids):
+    friends = friend_ids(user_id)
+    return {cid for cid in map(_as_int, candidate_ids) if cid in friends}
+
+
+def relationships(user_id, candidate_ids):
+    """Relationship of user_id to each candidate, resolved from the cached sets."""
+    friends, sent, received = friend_ids(user_id), sent_request_ids(user_id), received_request_ids(user_id)
+    result = {}
+    for cid in map(_as_int, candidate_ids):
+        if cid in friends:
+            result[cid] = "friend"
+        elif cid in sent:
+            result[cid] = "sent"
+        elif cid in received:
+            result[cid] = "received"
+        else:
+            result[cid] = None
+    return result
+
+
+def friend_users(user):
+    """The user's friends as a User queryset, ordered by username."""
+    ids = friend_ids(user.pk)
+    if not ids:
+        return get_user_model().objects.none()
+    return get_user_model().objects.filter(id__in=ids).order_by("username")
+
+##################### /QUERIES #####################
+#endregion
+
+
+def invalidate_friend_graph(*user_ids):
+    """Drop the cached sets of these users once the current transaction commits."""
+    user_ids = {uid for uid in user_ids if uid}
+
+    def bump():
+        for uid in user_ids:
+            try:
+                try:
+                    cache.incr(_version_key(uid))
+                except ValueError:  # no version stored yet
+                    cache.set(_version_key(uid), 2, None)
+            except Exception as e:
+                print(f"⚠️ Could not invalidate friend graph for user {uid}:", e)
+
+    transaction.on_commit(bump)
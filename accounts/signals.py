@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import FriendRequest, Friendship
+from .friend_graph import invalidate_friend_graph
+
+
+#region FRIEND GRAPH
+##################### FRIEND GRAPH #####################
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def _friendship_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_friend_graph(instance.user_id, instance.friend_id)
+
+
+@receiver(post_save, sender=FriendRequest)
+@receiver(post_delete, sender=FriendRequest)
+def _friend_request_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_friend_graph(instance.from_user_id, instance.to_user_id)
+
+##################### /FRIEND GRAPH #####################
+#endregion
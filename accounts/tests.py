@@ -1,3 +1,58 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from .friend_graph import are_friends, friend_ids, relationships
+from .models import CustomUser, FriendRequest
+
+
+class FriendGraphCacheTests(TestCase):
+    """Friend sets are served from the cache and invalidated when a request is accepted or a friend removed."""
+
+    def setUp(self):
+        cache.clear()
+        self.anna = CustomUser.objects.create_user("anna", "anna@example.com", "pw", is_verified=True)
+        self.ben = CustomUser.objects.create_user("ben", "ben@example.com", "pw", is_verified=True)
+
+    def befriend(self):
+        friend_request = FriendRequest.objects.create(from_user=self.anna, to_user=self.ben)
+        self.client.force_login(self.ben)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("accounts:accept_friend_request", args=[friend_request.id]))
+
+    def test_sets_are_cached(self):
+        friend_ids(self.anna.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(friend_ids(self.anna.pk), frozenset())
+
+    def test_accept_invalidates_both_sides(self):
+        self.assertEqual(relationships(self.anna.pk, [self.ben.pk]), {self.ben.pk: None})
+        self.assertFalse(are_friends(self.ben.pk, self.anna.pk))  # warm both caches
+
+        self.befriend()
+
+        self.assertEqual(friend_ids(self.anna.pk), {self.ben.pk})
+        self.assertEqual(friend_ids(self.ben.pk), {self.anna.pk})
+        self.assertEqual(relationships(self.anna.pk, [self.ben.pk]), {self.ben.pk: "friend"})
+
+    def test_pending_request_shows_on_both_sides(self):
+        relationships(self.anna.pk, [self.ben.pk])
+        relationships(self.ben.pk, [self.anna.pk])
+        self.client.force_login(self.anna)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("accounts:send_friend_request", args=[self.ben.pk]))
+        self.assertEqual(relationships(self.anna.pk, [self.ben.pk]), {self.ben.pk: "sent"})
+        self.assertEqual(relationships(self.ben.pk, [self.anna.pk]), {self.anna.pk: "received"})
+
+    def test_remove_invalidates_both_sides(self):
+        self.befriend()
+        self.assertTrue(are_friends(self.anna.pk, self.ben.pk))
+        self.assertTrue(are_friends(self.ben.pk, self.anna.pk))
+
+        self.client.force_login(self.anna)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("accounts:delete_friend", args=[self.ben.pk]))
+
+        self.assertEqual(friend_ids(self.anna.pk), frozenset())
+        self.assertEqual(friend_ids(self.ben.pk), frozenset())
 
-# Create your tests here.
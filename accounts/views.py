@@ -9,8 +9,10 @@ from django.contrib.auth import login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .models import FriendRequest, Friendship, CustomUser
+from .friend_graph import friend_users, relationships
 from django.contrib.auth.models import User
 from django.db.models import Q
+from django.db import transaction
 from emails.utils import custom_send_verification_email
 from django.contrib.auth import get_user_model
 import uuid
@@ -141,11 +143,12 @@ User = get_user_model()
 @login_required
 def send_friend_request(request, user_id):
     to_user = get_object_or_404(User, id=user_id)
+    status = relationships(request.user.id, [to_user.id])[to_user.id]
     if request.user == to_user:
         messages.error(request, "You cannot send a friend request to yourself.")
-    elif FriendRequest.objects.filter(from_user=request.user, to_user=to_user).exists():
+    elif status == "sent":
         messages.info(request, "Friend request already sent.")
-    elif Friendship.objects.filter(user=request.user, friend=to_user).exists():
+    elif status == "friend":
         messages.info(request, "You are already friends.")
     else:
         FriendRequest.objects.create(from_user=request.user, to_user=to_user)
@@ -155,9 +158,10 @@ def send_friend_request(request, user_id):
 @login_required
 def accept_friend_request(request, request_id):
     friend_request = get_object_or_404(FriendRequest, id=request_id, to_user=request.user)
-    Friendship.objects.create(user=request.user, friend=friend_request.from_user)
-    Friendship.objects.create(user=friend_request.from_user, friend=request.user)
-    friend_request.delete()
+    with transaction.atomic():
+        Friendship.objects.create(user=request.user, friend=friend_request.from_user)
+        Friendship.objects.create(user=friend_request.from_user, friend=request.user)
+        friend_request.delete()
     messages.success(request, "Friend request accepted!")
     return redirect('accounts:friend_dashboard')
 
@@ -168,16 +172,17 @@ def decline_friend_request(request, request_id):
     messages.info(request, "Friend request declined.")
     return redirect('accounts:friend_dashboard')
 
+def _friend_dashboard_context(user):
+    """Friends and pending requests; the friend ids come from the cached friend graph."""
+    return {
+        'friends': list(friend_users(user)),
+        'received_requests': FriendRequest.objects.filter(to_user=user).select_related('from_user'),
+        'sent_requests': FriendRequest.objects.filter(from_user=user).select_related('to_user'),
+    }
+
 @login_required
 def friend_dashboard(request):
-    friends = Friendship.objects.filter(user=request.user).select_related('friend')
-    received_requests = FriendRequest.objects.filter(to_user=request.user)
-    sent_requests = FriendRequest.objects.filter(from_user=request.user)
-    context = {
-        'friends': [f.friend for f in friends],
-        'received_requests': received_requests,
-        'sent_requests': sent_requests,
-    }
+    context = _friend_dashboard_context(request.user)
     return render(request, 'friends/friend_dashboard.html', context)
 
 
@@ -200,19 +205,17 @@ def friend_search(request):
     query = request.GET.get('q')
     results = []
     if query:
-        results = User.objects.filter(Q(username__icontains=query)).exclude(id=request.user.id)
-    
-    friends = Friendship.objects.filter(user=request.user).select_related('friend')
-    received_requests = FriendRequest.objects.filter(to_user=request.user)
-    sent_requests = FriendRequest.objects.filter(from_user=request.user)
-
-    context = {
-        'friends': [f.friend for f in friends],
-        'received_requests': received_requests,
-        'sent_requests': sent_requests,
+        results = list(User.objects.filter(Q(username__icontains=query)).exclude(id=request.user.id))
+        # one batch lookup for the status shown next to each result
+        status = relationships(request.user.id, [u.id for u in results])
+        for u in results:
+            u.relationship = status[u.id]
+
+    context = _friend_dashboard_context(request.user)
+    context.update({
         'results': results,
         'query': query,
-    }
+    })
     return render(request, 'friends/friend_dashboard.html', context)
 
 ###################### FRIEND MANAGEMENT #####################
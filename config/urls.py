@@ -26,7 +26,7 @@ from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
 # Import Own Templates / Views
-from recipes.views import home
+from recipes.views import home, metrics
 
 
 
@@ -66,6 +66,8 @@ urlpatterns = [
     # ADMIN PAGE
     path("admin/", admin.site.urls),
     path("django-rq/", include("django_rq.urls")),
+    # PROMETHEUS SCRAPE ENDPOINT
+    path("metrics", metrics, name="metrics"),
 
     # EMAIL SENDING TEST
     path("test-email/", test_email_view),
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Recipe, Ingredient, Instruction
+from .models import Recipe, Ingredient, Instruction, IngredientSuggestion, ImportJob
+from .functions.import_jobs import import_latency_report
+from django.template.response import TemplateResponse
+from django.urls import path
 import traceback
 from django.core.files.storage import default_storage
 
@@ -71,6 +74,49 @@ class IngredientAdmin(admin.ModelAdmin):
 class InstructionAdmin(admin.ModelAdmin):
     list_display = ('recipe_id', 'step_number', 'description')
     search_fields = ('description',)
-    ordering = ['step_number']  
+    ordering = ['step_number']
+
+
+@admin.register(IngredientSuggestion)
+class IngredientSuggestionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'visibility', 'occurrences')
+    list_filter = ('visibility',)
+    search_fields = ('name',)
+
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'source', 'status', 'error_code', 'user', 'recipe', 'total_ms', 'prompt_tokens', 'completion_tokens')
+    list_filter = ('source', 'status', 'error_code')
+    search_fields = ('job_id', 'input_hash')
+    list_select_related = ('user', 'recipe')
+    date_hierarchy = 'started_at'
+    change_list_template = 'admin/recipes/importjob/change_list.html'
 
+    def has_add_permission(self, request):
+        return False  # rows are written by the import tasks
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('report/', self.admin_site.admin_view(self.report_view), name='recipes_importjob_report'),
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        """Per-stage latency percentiles: ?days=<n>&source=<source>."""
+        try:
+            days = max(1, min(int(request.GET.get('days', 7)), 365))
+        except ValueError:
+            days = 7
+        source = request.GET.get('source') or None
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import latency report',
+            'report': import_latency_report(days=days, source=source),
+            'sources': ImportJob.SOURCE_CHOICES,
+            'day_options': (1, 7, 30, 90),
+        }
+        return TemplateResponse(request, 'admin/recipes/importjob/report.html', context)
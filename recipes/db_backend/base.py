@@ -0,0 +1,25 @@
+"""
+PostgreSQL backend that times connection setup (TCP + TLS + auth, or the
+checkout from the psycopg3 pool when DATABASES OPTIONS["pool"] is set) into
+the db_connection_setup_seconds metric. Selected in config/settings.py
+whenever DATABASE_URL points at PostgreSQL; behaves exactly like
+django.db.backends.postgresql otherwise.
+"""
+import time
+
+from django.db.backends.postgresql import base as postgresql
+
+from recipes.functions.metrics import DB_CONNECT_SECONDS, process_role
+
+
+class DatabaseWrapper(postgresql.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        t0 = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        DB_CONNECT_SECONDS.observe(
+            time.perf_counter() - t0,
+            role=process_role(),
+            pooled="yes" if self.pool else "no",
+        )
+        return connection
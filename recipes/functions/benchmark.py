@@ -0,0 +1,665 @@
+"""
+Offline harness for benchmarking the import path (manage.py benchmark_imports).
+
+Nothing leaves the machine:
+- OpenAI is replaced by StubOpenAI. It answers every prompt kind the
+  pipeline sends (organize, image/document extraction, dish scoring and
+  ranking) with the recipe of the current case, and reports plausible token
+  usage. The cases come from recipe_data_import/: those JSON files are the
+  structured output of earlier LLM imports, so they serve as the recorded
+  responses.
+- recipe_scrapers.scrape_me is replaced by StubScraper over the same cases.
+- requests.get serves the sample images for bench.local URLs and refuses
+  everything else.
+- rembg runs for real when its model is already on disk and is stubbed
+  otherwise (first use would download it).
+- The LLM cache and metrics are switched off and file storage goes to a
+  temp directory. Every scenario runs in a transaction that is rolled back.
+
+run_isolated() runs one scenario in a forked child, so each scenario gets its
+own peak RSS figure instead of the whole run's high-water mark.
+"""
+import hashlib
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from io import BytesIO, StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from . import data_acquisition
+from .import_jobs import percentile
+from .llm_cache import reset_llm_cache
+
+BENCH_HOST = "bench.local"
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+TOKENS_PER_IMAGE = 765  # OpenAI's cost of one high-detail 512px-tiled image, roughly
+
+
+#region CORPUS
+##################### CORPUS #####################
+
+def _plain(text):
+    return re.sub(r"<[^>]+>", "", str(text or "")).strip()
+
+
+def load_cases(corpus_dir):
+    """Recipes of all user folders in corpus_dir (recipe_data_import/ layout), in a stable order."""
+    cases = []
+    for user_dir in sorted(p for p in Path(corpus_dir).iterdir() if p.is_dir()):
+        json_path = user_dir / "recipe_data.json"
+        if not json_path.exists():
+            continue
+        with json_path.open(encoding="utf-8") as f:
+            for rec in json.load(f):
+                if rec.get("title") and rec.get("ingredients") and rec.get("instructions"):
+                    cases.append({"user": user_dir.name, **rec})
+    return cases
+
+
+def load_sample_images(image_dir):
+    """Distinct sample images (by content) from image_dir as (name, bytes)."""
+    images, seen = [], set()
+    for path in sorted(Path(image_dir).iterdir()):
+        if path.suffix.lower() not in IMAGE_SUFFIXES or not path.is_file():
+            continue
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in seen:
+            seen.add(digest)
+            images.append((path.name, data))
+    return images
+
+
+def ingredient_lines(case):
+    lines = []
+    for group in case.get("ingredients", []):
+        for item in group.get("items", []):
+            qty = item.get("quantity")
+            lines.append(" ".join(str(p) for p in (qty if qty not in (None, "") else "", item.get("unit"), item.get("name")) if p))
+    return lines
+
+
+def recipe_text(case):
+    """The case as a plain-text recipe, as a user would paste or type it."""
+    return "\n".join([
+        case["title"],
+        f"{case.get('portions') or 1} Portionen, {case.get('cook_time') or 1} Minuten",
+        "",
+        "Zutaten:",
+        *ingredient_lines(case),
+        "",
+        "Zubereitung:",
+        *[_plain(step) for step in case.get("instructions", [])],
+    ])
+
+
+def recipe_pdf(case, image_bytes=None):
+    """A one-page PDF of the case (text plus an embedded photo), built with PyMuPDF."""
+    import fitz
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(50, 50, 545, 420), recipe_text(case), fontsize=9)
+    if image_bytes:
+        page.insert_image(fitz.Rect(50, 430, 400, 780), stream=image_bytes)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def recipe_docx(case, image_bytes=None):
+    """The same recipe as a DOCX, built with python-docx."""
+    from docx import Document
+    from docx.shared import Inches
+
+    doc = Document()
+    lines = recipe_text(case).splitlines()
+    doc.add_heading(lines[0], level=1)
+    for line in lines[1:]:
+        doc.add_paragraph(line)
+    if image_bytes:
+        doc.add_picture(BytesIO(image_bytes), width=Inches(4))
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+##################### /CORPUS #####################
+#endregion
+
+
+#region STUBS
+##################### STUBS #####################
+
+class Fixtures:
+    """The case the stubs answer for; scenarios set .current before each call."""
+
+    def __init__(self, cases, images, llm_latency_ms=0, scrape_latency_ms=0):
+        self.cases = cases
+        self.images = images
+        self.current = cases[0]
+        self.llm_latency = llm_latency_ms / 1000
+        self.scrape_latency = scrape_latency_ms / 1000
+        self.llm_calls = 0
+
+    def url_for(self, index):
+        return f"https://{BENCH_HOST}/recipe/{index}"
+
+    def image_url_for(self, index):
+        return f"https://{BENCH_HOST}/image/{index % len(self.images)}"
+
+    def case_for_url(self, url):
+        return self.cases[int(url.rstrip("/").rsplit("/", 1)[-1]) % len(self.cases)]
+
+
+class StubOpenAI:
+    """Drop-in for openai.OpenAI(api_key=...): chat.completions.create answers from the fixtures."""
+    fixtures = None
+
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        fixtures = self.fixtures
+        fixtures.llm_calls += 1
+        if fixtures.llm_latency:
+            time.sleep(fixtures.llm_latency)
+
+        content = messages[0]["content"]
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        text = "\n".join(p.get("text", "") for p in parts if p.get("type") == "text")
+        n_images = sum(1 for p in parts if p.get("type") == "image_url")
+        answer = self._answer(fixtures.current, text, n_images)
+
+        body = json.dumps(answer, ensure_ascii=False)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=body))],
+            usage=SimpleNamespace(
+                prompt_tokens=len(text) // 4 + n_images * TOKENS_PER_IMAGE,
+                completion_tokens=len(body) // 4,
+            ),
+        )
+
+    @staticmethod
+    def _answer(case, text, n_images):
+        recipe = {"ingredients": case["ingredients"], "instructions": case["instructions"]}
+        ranking = [
+            {"index": i, "confidence": round(0.95 - 0.1 * i, 2), "bounding_box": [0.1, 0.1, 0.8, 0.8]}
+            for i in range(n_images)
+        ]
+        if "Does this image show a clearly plated dish" in text:
+            return {"confidence": 0.92, "bounding_box": [0.1, 0.1, 0.8, 0.8]}
+        if 'Return only a JSON object: {"dish_ranking"' in text:
+            return {"dish_ranking": ranking}
+        if "Return JSON" in text:  # image or document extraction
+            full = {"title": case["title"], "cook_time": case.get("cook_time"),
+                    "portions": case.get("portions"), **recipe}
+            if n_images and '"dish_ranking"' in text:
+                full["dish_ranking"] = ranking
+            return full
+        return recipe  # organize_with_llm
+
+
+class StubScraper:
+    """Drop-in for recipe_scrapers.scrape_me(url) over the fixture cases."""
+    fixtures = None
+
+    def __init__(self, url, *args, **kwargs):
+        if self.fixtures.scrape_latency:
+            time.sleep(self.fixtures.scrape_latency)
+        self.url = url
+        self.case = self.fixtures.case_for_url(url)
+
+    def title(self):
+        return self.case["title"]
+
+    def ingredients(self):
+        return ingredient_lines(self.case)
+
+    def instructions(self):
+        return "\n".join(_plain(step) for step in self.case["instructions"])
+
+    def total_time(self):
+        return self.case.get("cook_time")
+
+    def yields(self):
+        return f"{self.case.get('portions') or 1} servings"
+
+    def image(self):
+        return self.fixtures.image_url_for(self.fixtures.cases.index(self.case))
+
+
+def _offline_get(fixtures):
+    def get(url, *args, **kwargs):
+        if f"://{BENCH_HOST}/image/" in str(url):
+            data = fixtures.images[int(str(url).rsplit("/", 1)[-1])][1]
+            return SimpleNamespace(status_code=200, content=data, raise_for_status=lambda: None)
+        raise requests.exceptions.ConnectionError(f"offline benchmark: refusing {url}")
+    return get
+
+
+def rembg_model_cached():
+    home = Path(os.getenv("U2NET_HOME", Path.home() / ".u2net"))
+    return (home / f"{data_acquisition.REMBG_MODEL}.onnx").exists()
+
+
+def _stub_remove(img, session=None, **kwargs):
+    return img.convert("RGBA")
+
+
+@contextmanager
+def offline_pipeline(fixtures, rembg="auto"):
+    """
+    Patch the pipeline's outside world (see module docstring) and point file
+    storage at a temp directory for the duration of the block. Yields a dict
+    describing what was stubbed.
+    """
+    use_real_rembg = rembg == "real" or (rembg == "auto" and rembg_model_cached())
+    media = tempfile.mkdtemp(prefix="bench-media-")
+    StubOpenAI.fixtures = StubScraper.fixtures = fixtures
+    with ExitStack() as stack:
+        stack.enter_context(override_settings(
+            STORAGES={**settings.STORAGES, "default": {
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": media, "base_url": "/bench-media/"},
+            }},
+            MEDIA_ROOT=media,
+            MEDIA_URL="/bench-media/",
+            LLM_CACHE={**getattr(settings, "LLM_CACHE", {}), "BACKEND": "off"},
+            METRICS={**getattr(settings, "METRICS", {}), "ENABLED": False},
+            OPENAI_KEY="offline-benchmark",
+        ))
+        stack.enter_context(mock.patch.dict(os.environ, {"OPENAI_KEY": "offline-benchmark"}))
+        reset_llm_cache()
+        stack.callback(reset_llm_cache)
+        stack.enter_context(mock.patch.object(data_acquisition.openai, "OpenAI", StubOpenAI))
+        stack.enter_context(mock.patch.object(data_acquisition, "scrape_me", StubScraper))
+        stack.enter_context(mock.patch.object(requests, "get", _offline_get(fixtures)))
+        if not use_real_rembg:
+            import rembg as rembg_module
+            stack.enter_context(mock.patch.object(rembg_module, "remove", _stub_remove))
+            stack.enter_context(mock.patch.object(data_acquisition, "rembg_session", lambda: None))
+        stack.callback(shutil.rmtree, media, True)
+        yield {"rembg": "real" if use_real_rembg else "stubbed", "media_root": media}
+
+##################### /STUBS #####################
+#endregion
+
+
+#region MEASUREMENT
+##################### MEASUREMENT #####################
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_meta(options):
+    """Provenance of a result file, so runs can be compared across commits and machines."""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD") or "unknown",
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": connections["default"].vendor,
+        "options": options,
+    }
+
+
+def write_results(report, output=None, prefix=""):
+    """Write report as JSON to output (default bench_results/<prefix><timestamp>-<commit>.json)."""
+    path = Path(output or Path(settings.BASE_DIR) / "bench_results"
+                / f"{prefix}{datetime.now():%Y%m%d-%H%M%S}-{report['meta']['commit']}.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return path
+
+
+def _maxrss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB on Linux
+
+
+def measure(run, iterations, warmup=1, setup=None):
+    """
+    Call run(*setup()) warmup + iterations times, each inside a savepoint that
+    is rolled back so every iteration sees the same database (so this must run
+    inside transaction.atomic). Only run() is timed. run() returns the number
+    of items it processed (recipes, images).
+    """
+    latencies, items, queries = [], 0, 0
+    connection = connections["default"]
+    for i in range(warmup + iterations):
+        sid = transaction.savepoint()
+        try:
+            args = setup() if setup else ()
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                n = run(*args)
+                elapsed = time.perf_counter() - t0
+        finally:
+            transaction.savepoint_rollback(sid)
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            items += n or 1
+            queries += len(ctx.captured_queries)
+
+    ordered = sorted(latencies)
+    total_s = sum(latencies) / 1000
+    return {
+        "iterations": iterations,
+        "items": items,
+        "throughput_per_s": round(items / total_s, 2) if total_s else None,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50), 2),
+            "p95": round(percentile(ordered, 95), 2),
+            "mean": round(sum(ordered) / len(ordered), 2),
+            "min": round(ordered[0], 2),
+            "max": round(ordered[-1], 2),
+        },
+        "queries_per_item": round(queries / items, 1) if items else 0,
+    }
+
+
+def run_isolated(func, isolate=True):
+    """
+    func() -> result dict, plus "peak_rss_mb" (and "rss_growth_mb" over the
+    RSS at the start). With isolate, func runs in a forked child so the peak
+    belongs to this scenario alone; DB connections are closed around the fork.
+    """
+    if not isolate or not hasattr(os, "fork"):
+        start = _maxrss_mb()
+        try:
+            result = func()
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        return {**result, "peak_rss_mb": round(_maxrss_mb(), 1), "rss_growth_mb": round(_maxrss_mb() - start, 1)}
+
+    connections.close_all()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # child
+        os.close(read_fd)
+        status = 0
+        try:
+            start = _maxrss_mb()
+            result = func()
+            result.update(peak_rss_mb=round(_maxrss_mb(), 1), rss_growth_mb=round(_maxrss_mb() - start, 1))
+        except BaseException as e:
+            result, status = {"error": f"{type(e).__name__}: {e}"}, 1
+        with os.fdopen(write_fd, "w") as out:
+            json.dump(result, out)
+        connections.close_all()
+        os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as inp:
+        payload = inp.read()
+    os.waitpid(pid, 0)
+    return json.loads(payload) if payload else {"error": "benchmark child exited without a result"}
+
+##################### /MEASUREMENT #####################
+#endregion
+
+
+#region SCENARIOS
+##################### SCENARIOS #####################
+
+class Bench:
+    """What a scenario gets: the fixtures, a throwaway user, and a case cycle."""
+
+    def __init__(self, fixtures, corpus_dir, image_dir):
+        from django.contrib.auth import get_user_model
+
+        self.fixtures = fixtures
+        self.corpus_dir = corpus_dir
+        self.image_dir = image_dir
+        self.user = get_user_model().objects.create_user(
+            username="bench_user", email="bench_user@bench.local", password=None, is_verified=True,
+        )
+        self._next = 0
+        self.tempdirs = []
+
+    def tempdir(self, prefix):
+        path = Path(tempfile.mkdtemp(prefix=prefix))
+        self.tempdirs.append(path)
+        return path
+
+    def next_case(self):
+        """Make the next corpus case current (for the stubs) and return (index, case)."""
+        index = self._next % len(self.fixtures.cases)
+        self._next += 1
+        self.fixtures.current = self.fixtures.cases[index]
+        return index, self.fixtures.current
+
+    @property
+    def photo(self):
+        return self.fixtures.images[0][1]
+
+    def saved_recipe(self, case, user=None, with_image=True):
+        from .pipelines import save_structured_recipe_to_db
+
+        return save_structured_recipe_to_db(
+            data={**case, "image_path": ""}, user=user or self.user,
+            image_bytes=self.photo if with_image else None,
+        )
+
+
+def _task_url(bench):
+    from recipes.tasks import process_recipe_from_url
+
+    def setup():
+        index, _ = bench.next_case()
+        return (bench.fixtures.url_for(index),)
+    return lambda url: process_recipe_from_url(bench.user.pk, url, False, "", "") and 1, setup
+
+
+def _task_image(bench):
+    from recipes.tasks import process_recipe_from_image
+
+    photos = [data for _, data in bench.fixtures.images]
+    def setup():
+        bench.next_case()
+        return ()
+    return lambda: process_recipe_from_image(bench.user.pk, photos, False, "", "") and 1, setup
+
+
+def _task_text(use_llm):
+    def scenario(bench):
+        from recipes.tasks import process_recipe_from_text
+
+        def setup():
+            return (recipe_text(bench.next_case()[1]),)
+        return lambda text: process_recipe_from_text(bench.user.pk, text, use_llm, "") and 1, setup
+    return scenario
+
+
+def _task_uploads(kind):
+    def scenario(bench):
+        from recipes.tasks import process_recipe_from_uploads
+
+        build, ctype = {
+            "pdf": (recipe_pdf, "application/pdf"),
+            "docx": (recipe_docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+        }[kind]
+        built = {}
+
+        def setup():
+            index, case = bench.next_case()
+            if index not in built:  # documents are built once per case, outside the timing
+                built[index] = build(case, bench.photo)
+            return ([{"name": f"recipe.{kind}", "content_type": ctype, "bytes": built[index]}],)
+        return lambda uploads: process_recipe_from_uploads(bench.user.pk, uploads) and 1, setup
+    return scenario
+
+
+def _task_manual_llm(bench):
+    from recipes.tasks import process_recipe_from_manual_llm
+
+    def setup():
+        _, case = bench.next_case()
+        base = {"title": case["title"], "cook_time": case.get("cook_time"), "portions": case.get("portions")}
+        steps = "\n".join(_plain(step) for step in case["instructions"])
+        return base, "\n".join(ingredient_lines(case)), steps
+    return (lambda base, ingredients, steps: process_recipe_from_manual_llm(
+        bench.user.pk, base, ingredients, steps, image_bytes=bench.photo) and 1), setup
+
+
+def _task_render_pdf(bench):
+    from recipes.tasks import render_recipe_pdf
+
+    recipe = bench.saved_recipe(bench.next_case()[1])
+    return lambda: render_recipe_pdf(recipe.pk) and 1, None
+
+
+def _task_image_variants(bench):
+    from recipes.tasks import process_image_variants
+
+    recipe = bench.saved_recipe(bench.next_case()[1])
+    return lambda: process_image_variants(recipe.pk) and 1, None
+
+
+def _shared_collection(bench, size=20):
+    """A public collection of `size` corpus recipes owned by a second user."""
+    from django.contrib.auth import get_user_model
+
+    owner = get_user_model().objects.create_user(
+        username="bench_owner", email="bench_owner@bench.local", password=None, is_verified=True,
+    )
+    recipes = [bench.saved_recipe(bench.next_case()[1], user=owner) for _ in range(size)]
+    type(recipes[0]).objects.filter(user=owner).update(visibility="public")
+    return owner, [r.pk for r in recipes]
+
+
+def _task_bulk_copy(bench):
+    from recipes.tasks import process_bulk_copy
+
+    owner, ids = _shared_collection(bench)
+    return lambda: process_bulk_copy(bench.user.pk, source_user_id=owner.pk)["copied"], None
+
+
+def _task_cookbook(fmt):
+    def scenario(bench):
+        from recipes.tasks import process_cookbook_export
+
+        _, ids = _shared_collection(bench)
+        return lambda: process_cookbook_export(bench.user.pk, ids, fmt)["recipes"], None
+    return scenario
+
+
+def _corpus_copy(bench):
+    """
+    The corpus with its users renamed bench_<name> (so real accounts are never
+    touched) and every image_path pointing at one of the sample images.
+    """
+    workdir = bench.tempdir("bench-corpus-")
+    samples = sorted(p for p in Path(bench.image_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    count = 0
+    for user_dir in sorted(p for p in Path(bench.corpus_dir).iterdir() if (p / "recipe_data.json").exists()):
+        records = json.loads((user_dir / "recipe_data.json").read_text(encoding="utf-8"))
+        for i, rec in enumerate(records):
+            rec["image_path"] = str(samples[i % len(samples)].resolve()) if samples else ""
+        target = workdir / f"bench_{user_dir.name}"
+        target.mkdir()
+        (target / "recipe_data.json").write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+        count += len(records)
+    return workdir, count
+
+
+def _command_import_recipes(fast):
+    def scenario(bench):
+        from django.core.management import call_command
+
+        workdir, count = _corpus_copy(bench)
+        args = [str(workdir), "--create-missing-users"] + (["--fast"] if fast else [])
+
+        def run():
+            call_command("import_recipes", *args, stdout=StringIO())
+            return count
+        return run, None
+    return scenario
+
+
+def _image_func(func):
+    def scenario(bench):
+        photos = [data for _, data in bench.fixtures.images]
+
+        def run():
+            for data in photos:
+                func(data)
+            return len(photos)
+        return run, None
+    return scenario
+
+
+def _crop(data):
+    return data_acquisition.crop_image_to_visible_area(data)
+
+
+def _downscale(data):
+    return data_acquisition._downscale_image_bytes(data)
+
+
+# name -> scenario(bench) returning (run, setup); see measure()
+SCENARIOS = {
+    "task.url": _task_url,
+    "task.image": _task_image,
+    "task.text_llm": _task_text(True),
+    "task.text_manual": _task_text(False),
+    "task.uploads_pdf": _task_uploads("pdf"),
+    "task.uploads_docx": _task_uploads("docx"),
+    "task.manual_llm": _task_manual_llm,
+    "task.render_pdf": _task_render_pdf,
+    "task.image_variants": _task_image_variants,
+    "task.bulk_copy": _task_bulk_copy,
+    "task.cookbook_pdf": _task_cookbook("pdf"),
+    "task.cookbook_zip": _task_cookbook("zip"),
+    "command.import_recipes": _command_import_recipes(False),
+    "command.import_recipes_fast": _command_import_recipes(True),
+    "image.crop": _image_func(_crop),
+    "image.downscale": _image_func(_downscale),
+}
+
+
+def run_scenario(name, corpus_dir, image_dir, iterations, warmup=1, llm_latency_ms=0, rembg="auto"):
+    """
+    One scenario end to end: stubs up, a bench user, the scenario's own
+    fixtures, then measure(). Everything it wrote to the database is rolled
+    back and its files are removed.
+    """
+    fixtures = Fixtures(load_cases(corpus_dir), load_sample_images(image_dir), llm_latency_ms=llm_latency_ms)
+    with offline_pipeline(fixtures, rembg=rembg) as env, transaction.atomic():
+        bench = Bench(fixtures, corpus_dir, image_dir)
+        try:
+            run, setup = SCENARIOS[name](bench)
+            fixtures.llm_calls = 0
+            result = measure(run, iterations, warmup=warmup, setup=setup)
+        finally:
+            transaction.set_rollback(True)
+            for path in bench.tempdirs:
+                shutil.rmtree(path, ignore_errors=True)
+    runs = iterations + warmup
+    return {**result, "llm_calls_per_run": round(fixtures.llm_calls / runs, 1), "rembg": env["rembg"]}
+
+##################### /SCENARIOS #####################
+#endregion
@@ -0,0 +1,269 @@
+"""
+Multi-recipe cookbook export (one combined PDF, or a ZIP that
+manage.py import_recipes can read back).
+
+Exports run as RQ jobs (recipes.tasks.export_cookbook) and are built
+incrementally on local disk: recipes are loaded CHUNK_SIZE at a time, images
+are fetched once into a per-export cache directory, and the finished file is
+streamed into the private artifact storage. The web worker only enqueues and serves
+the result.
+
+ZIP layout (same as recipe_data_import/):
+    <username>/recipe_data.json
+    <username>/recipe_images/<recipe_id>-<file>
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from recipes.models import Recipe
+from .metrics import STORAGE_BYTES, traced
+from .pdf_export import _link_callback, artifact_storage, render_recipe_pdf_bytes
+
+CHUNK_SIZE = 25
+EXPORT_PREFIX = "cookbook_exports"
+EXPORT_FORMATS = ("pdf", "zip")
+EXPORT_TTL_HOURS = 24  # matches the export job's result_ttl; purge_stale_exports removes older files
+
+
+#region IMAGE CACHE
+##################### IMAGE CACHE #####################
+
+class CachedImageResolver:
+    """
+    xhtml2pdf link_callback that resolves media images to files in a local
+    cache directory, so each image is downloaded at most once per export and
+    never fetched over HTTP by xhtml2pdf itself.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._resolved = {}
+
+    def local_path(self, name):
+        """Local copy of a stored media file (by storage name), or None."""
+        if not name:
+            return None
+        if name in self._resolved:
+            return self._resolved[name]
+        ext = os.path.splitext(name)[1]
+        target = os.path.join(self.cache_dir, hashlib.sha1(name.encode("utf-8")).hexdigest() + ext)
+        try:
+            with default_storage.open(name, "rb") as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        except Exception as e:
+            print(f"⚠️ Could not cache image {name}: {e}")
+            target = None
+        self._resolved[name] = target
+        return target
+
+    def __call__(self, uri, rel):
+        media_url = getattr(settings, "MEDIA_URL", "") or ""
+        if uri and media_url and uri.startswith(media_url):
+            name = uri[len(media_url):].split("?", 1)[0]
+            path = self.local_path(requests.utils.unquote(name))
+            if path:
+                return path
+        return _link_callback(uri, rel)
+
+##################### /IMAGE CACHE #####################
+#endregion
+
+
+def _iter_recipes(recipe_ids):
+    """Yield recipes in the given order, CHUNK_SIZE per query round."""
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        chunk = recipe_ids[start:start + CHUNK_SIZE]
+        by_id = (Recipe.objects.filter(pk__in=chunk)
+                 .select_related("user")
+                 .prefetch_related("ingredients", "instructions")
+                 .in_bulk())
+        for rid in chunk:
+            if rid in by_id:
+                yield by_id[rid]
+
+
+def recipe_to_import_dict(recipe, image_path=""):
+    """The recipe_data.json shape read by manage.py import_recipes."""
+    groups = {}
+    for ing in recipe.ingredients.all():
+        groups.setdefault(ing.category or "", []).append({
+            "name": ing.name,
+            "quantity": ing.quantity,
+            "unit": ing.unit or "",
+        })
+    return {
+        "title": recipe.title,
+        "cook_time": str(recipe.cook_time),
+        "portions": str(recipe.portions),
+        "notes": recipe.notes or "",
+        "ingredients": [{"category": cat, "items": items} for cat, items in groups.items()],
+        "instructions": [ins.description for ins in recipe.instructions.all()],
+        "image_path": image_path,
+    }
+
+
+#region WRITERS
+##################### WRITERS #####################
+
+def _write_pdf(recipe_ids, out_path, workdir, progress):
+    """
+    Render each recipe on its own and append it to the combined document on
+    disk. Only one chunk of CHUNK_SIZE rendered recipes is held in memory: each
+    full chunk is appended to out_path with an incremental save, and the book
+    is reopened from disk for the next one (MuPDF loads its objects lazily).
+    """
+    import fitz  # PyMuPDF
+
+    resolver = CachedImageResolver(os.path.join(workdir, "images"))
+    os.makedirs(resolver.cache_dir, exist_ok=True)
+    chunk = fitz.open()
+    pages = done = 0
+
+    def flush():
+        nonlocal chunk, pages
+        if chunk.page_count == 0:
+            return
+        pages += chunk.page_count
+        if not os.path.exists(out_path):
+            chunk.save(out_path, garbage=3, deflate=True)
+        else:
+            with fitz.open(out_path) as book:
+                book.insert_pdf(chunk)
+                book.saveIncr()
+        chunk.close()
+        chunk = fitz.open()
+
+    try:
+        for recipe in _iter_recipes(recipe_ids):
+            try:
+                pdf_bytes = render_recipe_pdf_bytes(recipe, link_callback=resolver)
+                with fitz.open(stream=pdf_bytes, filetype="pdf") as part:
+                    chunk.insert_pdf(part)
+            except Exception as e:
+                print(f"⚠️ Skipping recipe {recipe.pk} in cookbook: {e}")
+            done += 1
+            if done % CHUNK_SIZE == 0:
+                flush()
+                progress(done)
+        flush()
+    finally:
+        chunk.close()
+    if pages == 0:
+        raise ValueError("None of the selected recipes could be rendered.")
+    progress(done)
+
+
+def _write_zip(recipe_ids, out_path, workdir, progress):
+    """
+    One recipe_data.json per owner. Images go into the archive as they come;
+    each owner's JSON array is streamed to a scratch file on disk (ZipFile
+    allows only one open write handle) and added when the owner changes, so
+    nothing grows with the size of the export in memory.
+    """
+    owners = dict(Recipe.objects.filter(pk__in=recipe_ids).values_list("recipe_id", "user__username"))
+    position = {rid: i for i, rid in enumerate(recipe_ids)}
+    ordered = sorted((rid for rid in recipe_ids if rid in owners), key=lambda rid: (owners[rid], position[rid]))
+
+    done = 0
+    json_path = os.path.join(workdir, "recipe_data.json")
+    current_owner, json_fh = None, None
+
+    with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        def close_owner():
+            if json_fh:
+                json_fh.write("\n]\n")
+                json_fh.close()
+                zf.write(json_path, f"{current_owner}/recipe_data.json")
+
+        for recipe in _iter_recipes(ordered):
+            owner = recipe.user.username
+            if owner != current_owner:
+                close_owner()
+                current_owner = owner
+                json_fh = open(json_path, "w", encoding="utf-8")
+                json_fh.write("[\n")
+            else:
+                json_fh.write(",\n")
+
+            image_path = ""
+            if recipe.image:
+                image_path = f"recipe_images/{recipe.pk}-{os.path.basename(recipe.image.name)}"
+                try:
+                    with default_storage.open(recipe.image.name, "rb") as src, \
+                            zf.open(f"{owner}/{image_path}", "w") as dst:
+                        shutil.copyfileobj(src, dst)
+                except Exception as e:
+                    print(f"⚠️ Could not add image for recipe {recipe.pk}: {e}")
+                    image_path = ""
+
+            json_fh.write(json.dumps(recipe_to_import_dict(recipe, image_path), ensure_ascii=False, indent=2))
+
+            done += 1
+            if done % CHUNK_SIZE == 0:
+                progress(done)
+        close_owner()
+    progress(done)
+
+##################### /WRITERS #####################
+#endregion
+
+
+@traced("cookbook.export")
+def export_cookbook(recipe_ids, fmt, key_stem, progress=lambda done: None):
+    """
+    Build the export for recipe_ids (in order) and store it as
+    "<EXPORT_PREFIX>/<key_stem>.<fmt>" in the artifact storage. Returns the key.
+    progress(done) is called every CHUNK_SIZE recipes.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    recipe_ids = [int(r) for r in recipe_ids]
+
+    with tempfile.TemporaryDirectory(prefix="cookbook-") as workdir:
+        out_path = os.path.join(workdir, f"cookbook.{fmt}")
+        writer = _write_pdf if fmt == "pdf" else _write_zip
+        writer(recipe_ids, out_path, workdir, progress)
+
+        key = f"{EXPORT_PREFIX}/{key_stem}.{fmt}"
+        with open(out_path, "rb") as fh:
+            saved = artifact_storage().save(key, File(fh, name=os.path.basename(key)))
+        STORAGE_BYTES.inc(os.path.getsize(out_path), kind="cookbook")
+    print(f"📚 Stored cookbook export {saved} ({len(recipe_ids)} recipes)")
+    return saved
+
+
+def purge_stale_exports(max_age_hours=EXPORT_TTL_HOURS):
+    """
+    Delete stored exports older than max_age_hours. Their job (and with it the
+    download link) expires after EXPORT_TTL_HOURS, so nothing can reach them
+    any more. Returns the number of files removed.
+    """
+    storage = artifact_storage()
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    removed = 0
+    try:
+        owners, _ = storage.listdir(EXPORT_PREFIX)
+    except (FileNotFoundError, OSError):
+        return 0
+    for owner in owners:
+        _, files = storage.listdir(f"{EXPORT_PREFIX}/{owner}")
+        for name in files:
+            key = f"{EXPORT_PREFIX}/{owner}/{name}"
+            try:
+                if storage.get_modified_time(key) < cutoff:
+                    storage.delete(key)
+                    removed += 1
+            except Exception as e:
+                print(f"⚠️ Could not inspect cookbook export {key}: {e}")
+    return removed
@@ -0,0 +1,114 @@
+"""
+Copying recipes into a user's collection.
+
+copy_recipes() copies any number of recipes in one transaction with a fixed
+number of queries: the sources (with children) are loaded once, and the new
+recipes, ingredients and instructions are written with bulk_create. The work
+the Recipe/Ingredient signal handlers would otherwise do per row (ingredient
+suggestions, search documents) is done once for the batch.
+
+Image modes:
+    "reference" - the copy points at the source's stored image (and its
+                  variants); no bytes are copied. Stored images are never
+                  deleted when a recipe changes, so sharing them is safe.
+    "duplicate" - the image is copied to a new blob owned by the copy.
+"""
+from django.core.files.base import File
+from django.db import transaction
+
+from recipes.models import Recipe, Ingredient, Instruction
+from .image_variants import schedule_image_variants
+from .metrics import DB_ROWS, STORAGE_BYTES, traced
+from .permissions import SHARED_VISIBILITIES
+from .search import refresh_search_documents
+from .suggestions import apply_suggestion_deltas, ingredient_suggestion_deltas
+
+IMAGE_MODES = ("reference", "duplicate")
+
+
+def copyable_recipes(user, recipe_ids=None, source_user_id=None):
+    """
+    Recipes `user` may copy: visible to them and shared ('friends'/'public').
+    Either explicit recipe_ids, or everything source_user_id shares with them.
+    """
+    qs = Recipe.objects.visible_to(user).filter(visibility__in=SHARED_VISIBILITIES)
+    if recipe_ids is not None:
+        qs = qs.filter(pk__in=[int(r) for r in recipe_ids if str(r).isdigit()])
+    if source_user_id is not None:
+        qs = qs.filter(user_id=source_user_id)
+    return qs
+
+
+def _duplicate_image(image):
+    with image.storage.open(image.name, "rb") as fh:
+        name = image.storage.save(image.name, File(fh))
+        STORAGE_BYTES.inc(fh.tell(), kind="recipe_image")
+    return name
+
+
+@traced("recipes.copy")
+def copy_recipes(user, recipe_ids=None, source_user_id=None, image_mode="reference"):
+    """
+    Copy the given (or all of source_user_id's shared) recipes as private
+    recipes of `user`. Returns the new recipes, in source order.
+    """
+    if image_mode not in IMAGE_MODES:
+        raise ValueError(f"Unknown image mode: {image_mode}")
+
+    sources = list(
+        copyable_recipes(user, recipe_ids, source_user_id)
+        .order_by("recipe_id")
+        .prefetch_related("ingredients", "instructions")
+    )
+    if not sources:
+        return []
+
+    copies = []
+    for original in sources:
+        copy = Recipe(
+            title=original.title,
+            cook_time=original.cook_time,
+            portions=original.portions,
+            notes=original.notes,
+            user=user,
+            visibility='private',
+        )
+        if original.image:
+            if image_mode == "duplicate":
+                copy.image.name = _duplicate_image(original.image)
+            else:
+                copy.image.name = original.image.name
+                copy.image_variants = original.image_variants
+        copies.append(copy)
+
+    with transaction.atomic():
+        Recipe.objects.bulk_create(copies)
+
+        ingredients, instructions = [], []
+        for original, copy in zip(sources, copies):
+            for ing in original.ingredients.all():
+                ingredients.append(Ingredient(
+                    recipe=copy,
+                    name=ing.name,
+                    normalized_name=ing.normalized_name,
+                    quantity=ing.quantity,
+                    unit=ing.unit,
+                    category=ing.category,
+                ))
+            for inst in original.instructions.all():
+                instructions.append(Instruction(
+                    recipe_id=copy, description=inst.description, step_number=inst.step_number
+                ))
+        Ingredient.objects.bulk_create(ingredients)
+        Instruction.objects.bulk_create(instructions)
+        DB_ROWS.inc(len(copies), table="recipe")
+        DB_ROWS.inc(len(ingredients), table="ingredient")
+        DB_ROWS.inc(len(instructions), table="instruction")
+
+        apply_suggestion_deltas(ingredient_suggestion_deltas(ingredients))
+        refresh_search_documents([copy.pk for copy in copies])
+        if image_mode == "duplicate":
+            for copy in copies:
+                if copy.image:
+                    schedule_image_variants(copy.pk)
+    return copies
@@ -5,18 +5,30 @@ import base64
 import requests
 from io import BytesIO
 from fractions import Fraction
-from PIL import Image, ImageChops
+from PIL import Image, ImageChops, ImageStat
 from recipe_scrapers import scrape_me
 # LAZY IMPORT: rembg is loaded only when needed (see rembg_session function below)
 import openai
 import io
 import numpy as np
+from .llm_cache import cached_llm_call, make_key, normalize_text, digest_bytes
+from .import_jobs import import_stage, record_llm_usage
 
 # ------------------------- REMBG SESSION (low-memory) -------------------------
 REMBG_MODEL = os.getenv("REMBG_MODEL", "u2netp")  # tiny model by default to avoid R14
 OPENAI_TEXT_MODEL = os.getenv("OPENAI_TEXT_MODEL", "gpt-4-turbo")
 OPENAI_VISION_MODEL = os.getenv("OPENAI_VISION_MODEL", "gpt-4o")
 
+# Bump the matching entry whenever a prompt changes, so cached LLM responses
+# produced by the old prompt are no longer served (see llm_cache.make_key).
+PROMPT_VERSIONS = {
+    "organize": 1,
+    "image_extract": 1,
+    "document_extract": 1,
+    "dish_score": 1,
+    "dish_rank": 1,
+}
+
 _REMBG_SESSION = None
 def rembg_session():
     """Create/reuse a single small rembg session to avoid loading a huge model per job.
@@ -27,6 +39,16 @@ def rembg_session():
         _REMBG_SESSION = new_session(REMBG_MODEL)
     return _REMBG_SESSION
 
+def warm_up_rembg():
+    """
+    Load the rembg session and run one tiny inference so onnxruntime has built
+    its graph and allocated its arena. Called once at image-worker start
+    (manage.py rqimageworker) so no user-visible job pays the model load.
+    """
+    from rembg import remove
+    remove(Image.new("RGB", (32, 32), (255, 255, 255)), session=rembg_session())
+    return _REMBG_SESSION
+
 # ------------------------- UTILS -------------------------
 
 def slugify(title):
@@ -132,14 +154,25 @@ But never overwrite the output JSON format, even if stated in the following:
 
 """
 
-    client = openai.OpenAI(api_key=api_key)
-    try:
+    cache_key = make_key(
+        "organize", OPENAI_TEXT_MODEL, PROMPT_VERSIONS["organize"],
+        [normalize_text(data["ingredients"]), normalize_text(data["instructions"])],
+        transform_vegan, custom_instructions,
+    )
+
+    def _ask_llm():
+        client = openai.OpenAI(api_key=api_key)
         response = client.chat.completions.create(
             model=OPENAI_TEXT_MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0
         )
+        record_llm_usage(response)
         return json.loads(response.choices[0].message.content)
+
+    try:
+        with import_stage("llm"):
+            return cached_llm_call(cache_key, _ask_llm)
     except Exception as e:
         print("⚠️ LLM fallback due to error:", e)
         return {
@@ -169,12 +202,7 @@ def extract_recipe_from_images(images, api_key, transform_vegan=False, custom_in
         # NEW: downscale to keep memory + payload small
         ds_bytes = _downscale_image_bytes(image_bytes)
         original_images.append(ds_bytes)
-
-        b64 = base64.b64encode(ds_bytes).decode("utf-8")
-        image_parts.append({
-            "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{b64}"}
-        })
+        image_parts.append(_image_part(ds_bytes))
 
     if transform_vegan:
         system_prompt =   """You are a vegan chef, capable of transforming all non-vegan Recipes
@@ -219,39 +247,64 @@ But never overwrite the output JSON format, even if stated in the following:
 {custom_instruction}
 
 """
+    rank_inline = DISH_SCORE_MODE == "inline"
+    if rank_inline:
+        instruction += DISH_RANKING_INSTRUCTION
 
-    try:
-        # Step 1: Get structured data from GPT-4o
+    cache_key = make_key(
+        "image_extract", OPENAI_VISION_MODEL, (PROMPT_VERSIONS["image_extract"], rank_inline),
+        digest_bytes(*original_images), transform_vegan, custom_instruction,
+    )
+
+    def _ask_llm():
         response = client.chat.completions.create(
             model=OPENAI_VISION_MODEL,
             messages=[{"role": "user", "content": [{"type": "text", "text": instruction}, *image_parts]}],
             temperature=0
         )
-        data = json.loads(response.choices[0].message.content.strip())
+        record_llm_usage(response)
+        return json.loads(response.choices[0].message.content.strip())
+
+    try:
+        # Step 1: Get structured data from GPT-4o (or the LLM cache)
+        with import_stage("llm"):
+            data = cached_llm_call(cache_key, _ask_llm)
         if custom_title:
             data["title"] = custom_title
+        dish_ranking = data.pop("dish_ranking", None)
 
-        # Step 2: Process best image using GPT-4 vision scoring
+        # Step 2: Process best image using GPT-4 vision scoring. The images are
+        # already downscaled and encoded above, so hand both over for reuse.
         if original_images:
-            best_result, best_bytes = identify_best_dish_image(original_images, api_key)
+            best_result, best_bytes = None, None
+            with import_stage("vision"):
+                if rank_inline and isinstance(dish_ranking, list):
+                    candidates = _prefilter_dish_candidates(original_images, prepared=True)
+                    best_result, best_bytes = _best_from_ranking(dish_ranking, candidates)
+                else:
+                    best_result, best_bytes = identify_best_dish_image(
+                        original_images, api_key, image_parts=image_parts, prepared=True
+                    )
 
             if best_bytes:
                 # Step 3: Background removal (use shared small model session)
                 from rembg import remove  # LAZY IMPORT: Only load when processing images
-                raw_img = Image.open(BytesIO(best_bytes)).convert("RGBA")
-                fg_only = remove(raw_img, session=rembg_session())  # CHANGED
+                with import_stage("rembg"):
+                    raw_img = Image.open(BytesIO(best_bytes)).convert("RGBA")
+                    fg_only = remove(raw_img, session=rembg_session())  # CHANGED
 
                 # Step 4: Strict crop of transparent + white space
-                buffer = BytesIO()
-                fg_only.save(buffer, format="PNG")
-                buffer.seek(0)
-
-                cropped_bytes = crop_image_to_visible_area(
-                    image_bytes=buffer.getvalue(),
-                    white_threshold=240,
-                    alpha_threshold=10,
-                    margin=2
-                )
+                with import_stage("crop"):
+                    buffer = BytesIO()
+                    fg_only.save(buffer, format="PNG")
+                    buffer.seek(0)
+
+                    cropped_bytes = crop_image_to_visible_area(
+                        image_bytes=buffer.getvalue(),
+                        white_threshold=240,
+                        alpha_threshold=10,
+                        margin=2
+                    )
 
                 data["image_bytes"] = cropped_bytes
             else:
@@ -318,22 +371,49 @@ def download_image_from_url(image_url):
     
 
 
-def identify_best_dish_image(image_bytes_list, api_key):
-    import base64, json
-    import openai
-    from PIL import Image
-    from io import BytesIO
+DISH_SCORE_CONCURRENCY = int(os.getenv("DISH_SCORE_CONCURRENCY", "4"))  # per-job cap on parallel vision calls
+DISH_EARLY_EXIT_CONFIDENCE = float(os.getenv("DISH_EARLY_EXIT_CONFIDENCE", "0.9"))
+DISH_MIN_SIDE = int(os.getenv("DISH_MIN_SIDE", "128"))          # smaller images are icons/logos, not dishes
+DISH_BLANK_STDDEV = float(os.getenv("DISH_BLANK_STDDEV", "8"))  # near-uniform images carry no dish
+DISH_DUPLICATE_DISTANCE = int(os.getenv("DISH_DUPLICATE_DISTANCE", "6"))  # max dHash bit difference
+# "parallel": one call per candidate, run concurrently with early exit (default)
+# "batch":    one multi-image vision call ranks all candidates
+# "inline":   image extraction asks for the ranking in the extraction call
+#             itself (falls back to "batch" when the answer lacks it)
+DISH_SCORE_MODE = os.getenv("DISH_SCORE_MODE", "parallel")
+
+DISH_RANKING_INSTRUCTION = """
+Additionally, rank the images above by how clearly they show the finished, plated dish
+(not ingredients, packaging, text or step photos). Images are numbered from 0 in the order given.
+Add the ranking under the key "dish_ranking" as a list, best first:
+[{"index": int, "confidence": float, "bounding_box": [x, y, width, height] or null}]
+x, y, width, height must be relative percentages (0.0 - 1.0); use confidence 0 and
+bounding_box null for images without a clean dish.
+"""
 
-    client = openai.OpenAI(api_key=api_key)
-    best_result = None
-    best_confidence = -1
-    best_bytes = None
 
-    print(f"🧠 Evaluating {len(image_bytes_list)} image(s)...")
+def _dhash(img, size=8):
+    """64-bit difference hash; visually near-identical images differ in only a few bits."""
+    small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+    px = np.asarray(small, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).flatten()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def _prefilter_dish_candidates(image_bytes_list, prepared=False):
+    """
+    Cheap local pass before any API call: downscale each candidate once and
+    drop tiny, blank (near-uniform) and near-duplicate images. Pass
+    prepared=True when the bytes were already downscaled by the caller.
+    Returns a list of (idx, image_bytes, width, height).
+    """
+    candidates = []
+    seen_hashes = []
     for idx, image_bytes in enumerate(image_bytes_list):
         try:
             # NEW: ensure candidate is downscaled to control memory
-            image_bytes = _downscale_image_bytes(image_bytes)
+            if not prepared:
+                image_bytes = _downscale_image_bytes(image_bytes)
 
             img = Image.open(BytesIO(image_bytes)).convert("RGB")
             width, height = img.size
@@ -342,68 +422,251 @@ def identify_best_dish_image(image_bytes_list, api_key):
             print(f"❌ Failed to open image {idx}: {e}")
             continue
 
+        if min(width, height) < DISH_MIN_SIDE:
+            print(f"🗑️ Image {idx}: too small, skipped")
+            continue
+        if max(ImageStat.Stat(img.convert("L")).stddev) < DISH_BLANK_STDDEV:
+            print(f"🗑️ Image {idx}: blank, skipped")
+            continue
+        h = _dhash(img)
+        if any(bin(h ^ other).count("1") <= DISH_DUPLICATE_DISTANCE for other in seen_hashes):
+            print(f"🗑️ Image {idx}: near-duplicate, skipped")
+            continue
+        seen_hashes.append(h)
+        candidates.append((idx, image_bytes, width, height))
+    return candidates
+
+
+def _dish_choice(entry, width, height):
+    """
+    (confidence, bounding box in pixels) from one model answer, or None when
+    it has no usable box (missing, malformed or non-numeric values).
+    """
+    if not isinstance(entry, dict) or not entry.get("bounding_box"):
+        return None
+    try:
+        confidence = float(entry.get("confidence") or 0)
+        x, y, w, h = (float(v) for v in entry["bounding_box"])
+    except (TypeError, ValueError):
+        return None
+    return confidence, [int(x * width), int(y * height), int(w * width), int(h * height)]
+
+
+def _score_dish_image(client, idx, image_bytes):
+    """One vision call: {"confidence": float, "bounding_box": [x, y, w, h] relative or null}."""
+    def _ask_llm():
         b64 = base64.b64encode(image_bytes).decode("utf-8")
         image_url = f"data:image/png;base64,{b64}"
+        response = client.chat.completions.create(
+            model=OPENAI_VISION_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": (
+                                "You are a vision model trained to identify food images.\n"
+                                "Does this image show a clearly plated dish (not ingredients or packaging)? "
+                                "If yes, return bounding box of dish as JSON like:\n"
+                                '{"confidence": float, "bounding_box": [x, y, width, height]}.\n'
+                                "x, y, width, height must be relative percentages (0.0 - 1.0).\n"
+                                "If not a clean dish, return: {\"confidence\": 0, \"bounding_box\": null}"
+                            )
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": image_url}
+                        }
+                    ]
+                }
+            ]
+        )
+        record_llm_usage(response)
 
-        try:
-            response = client.chat.completions.create(
-                model=OPENAI_VISION_MODEL,
-                messages=[
+        content = _strip_json_fences(response.choices[0].message.content)
+        print(f"📨 Image {idx} model response:", content)
+        if not content:
+            raise ValueError("Empty content from API")
+        return json.loads(content)
+
+    cache_key = make_key("dish_score", OPENAI_VISION_MODEL, PROMPT_VERSIONS["dish_score"], digest_bytes(image_bytes))
+    return cached_llm_call(cache_key, _ask_llm)
+
+
+def _strip_json_fences(content):
+    content = (content or "").strip().strip("`").strip()
+    if content.startswith("json"):
+        content = content[len("json"):].strip()  # handles ```json
+    return content.strip("`")  # remove markdown ticks if any
+
+
+def _image_part(image_bytes):
+    b64 = base64.b64encode(image_bytes).decode("utf-8")
+    return {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}
+
+
+def _rank_dish_images_batch(client, candidates, image_parts=None):
+    """
+    One vision call for all candidates. image_parts (aligned with the original
+    candidate indices) are reused when given, so images already encoded for
+    extraction are not base64-encoded again. Returns the model's ranking as a
+    list of {"index", "confidence", "bounding_box"} with indices mapped back to
+    the original candidate positions.
+    """
+    parts = [image_parts[idx] if image_parts else _image_part(image_bytes)
+             for idx, image_bytes, _, _ in candidates]
+
+    def _ask_llm():
+        response = client.chat.completions.create(
+            model=OPENAI_VISION_MODEL,
+            messages=[{
+                "role": "user",
+                "content": [
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": (
-                                    "You are a vision model trained to identify food images.\n"
-                                    "Does this image show a clearly plated dish (not ingredients or packaging)? "
-                                    "If yes, return bounding box of dish as JSON like:\n"
-                                    '{"confidence": float, "bounding_box": [x, y, width, height]}.\n'
-                                    "x, y, width, height must be relative percentages (0.0 - 1.0).\n"
-                                    "If not a clean dish, return: {\"confidence\": 0, \"bounding_box\": null}"
-                                )
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_url}
-                            }
-                        ]
-                    }
-                ]
-            )
-
-            content = response.choices[0].message.content.strip().strip("`").strip()
-            if content.startswith("json"):
-                content = content[len("json"):].strip()  # handles ```json
-            print(f"📨 Image {idx} model response:", content)
-            if not content:
-                print(f"⚠️ Empty content from API for image {idx}")
-                continue
+                        "type": "text",
+                        "text": (
+                            "You are a vision model trained to identify food images.\n"
+                            + DISH_RANKING_INSTRUCTION
+                            + "Return only a JSON object: {\"dish_ranking\": [...]}"
+                        )
+                    },
+                    *parts,
+                ],
+            }],
+            temperature=0
+        )
+        record_llm_usage(response)
+        content = _strip_json_fences(response.choices[0].message.content)
+        print(f"📨 Batch ranking response for {len(parts)} image(s):", content)
+        if not content:
+            raise ValueError("Empty content from API")
+        parsed = json.loads(content)
+        ranking = parsed.get("dish_ranking") if isinstance(parsed, dict) else None
+        if not isinstance(ranking, list):
+            raise ValueError("No dish_ranking list in response")  # not cached; caller falls back
+        return ranking
+
+    cache_key = make_key(
+        "dish_rank", OPENAI_VISION_MODEL, PROMPT_VERSIONS["dish_rank"],
+        digest_bytes(*[image_bytes for _, image_bytes, _, _ in candidates]),
+    )
+    ranking = cached_llm_call(cache_key, _ask_llm)
+    # The model numbers the images it was shown; map back to candidate indices.
+    return [
+        {**entry, "index": candidates[entry["index"]][0]}
+        for entry in ranking
+        if _ranking_index(entry) is not None and 0 <= entry["index"] < len(candidates)
+    ]
+
+
+def _ranking_index(entry):
+    """The integer "index" of a ranking entry, or None (bools and strings don't count)."""
+    if not isinstance(entry, dict):
+        return None
+    idx = entry.get("index")
+    return idx if isinstance(idx, int) and not isinstance(idx, bool) else None
+
 
-            content = content.strip("`")  # remove markdown ticks if any
-            result = json.loads(content)
-
-            if result.get("confidence", 0) > best_confidence and result.get("bounding_box"):
-                # Convert relative bbox to absolute pixel coordinates
-                x, y, w, h = result["bounding_box"]
-                scaled_box = [
-                    int(x * width),
-                    int(y * height),
-                    int(w * width),
-                    int(h * height)
-                ]
-                result["bounding_box"] = scaled_box
-                best_result = result
-                best_bytes = image_bytes
-                best_confidence = result["confidence"]
-                print(f"🏆 Image {idx} selected with confidence {best_confidence}")
-
-        except json.JSONDecodeError as jde:
-            print(f"⚠️ Skipping image {idx}: Failed to parse JSON: {jde}")
+def _best_from_ranking(ranking, candidates):
+    """
+    Highest-confidence ranked candidate with a usable bounding box, scaled to
+    pixels. Entries for unknown indices or with malformed values are ignored;
+    a repeated index keeps its best entry. Returns (None, None) if none is left.
+    """
+    by_idx = {idx: (image_bytes, width, height) for idx, image_bytes, width, height in candidates}
+    best = None  # (confidence, -idx, result, image_bytes)
+    for entry in ranking if isinstance(ranking, list) else ():
+        idx = _ranking_index(entry)
+        if idx not in by_idx:
+            continue
+        image_bytes, width, height = by_idx[idx]
+        choice = _dish_choice(entry, width, height)
+        if choice is None or (best and (choice[0], -idx) <= best[:2]):
+            continue
+        confidence, box = choice
+        best = (confidence, -idx, {"index": idx, "confidence": confidence, "bounding_box": box}, image_bytes)
+
+    if best is None:
+        return None, None
+    print(f"🏆 Image {best[2]['index']} selected with confidence {best[0]}")
+    return best[2], best[3]
+
+
+def identify_best_dish_image(image_bytes_list, api_key, max_concurrency=None, early_exit_confidence=None,
+                             mode=None, image_parts=None, prepared=False):
+    """
+    Pick the candidate that most clearly shows a plated dish.
+
+    Candidates are pre-filtered locally (see _prefilter_dish_candidates). In
+    "parallel" mode (default, DISH_SCORE_MODE) each image is scored separately
+    with up to max_concurrency calls in flight; as soon as one reaches
+    early_exit_confidence, pending calls are cancelled and that image wins.
+    In "batch" mode all of them are ranked by a single multi-image vision call
+    (falling back to "parallel" if that call fails or its answer is not a
+    ranking); image_parts/prepared let callers hand in images they already
+    downscaled and encoded. Returns (result, image_bytes) with an absolute-pixel bounding
+    box, or (None, None).
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    import contextvars
+
+    mode = mode or DISH_SCORE_MODE
+    max_concurrency = max_concurrency or DISH_SCORE_CONCURRENCY
+    if early_exit_confidence is None:
+        early_exit_confidence = DISH_EARLY_EXIT_CONFIDENCE
+
+    print(f"🧠 Evaluating {len(image_bytes_list)} image(s)...")
+    candidates = _prefilter_dish_candidates(image_bytes_list, prepared=prepared)
+    if not candidates:
+        return None, None
+
+    client = openai.OpenAI(api_key=api_key)
+
+    if mode != "parallel" and len(candidates) > 1:
+        try:
+            return _best_from_ranking(_rank_dish_images_batch(client, candidates, image_parts), candidates)
         except Exception as e:
-            print(f"⚠️ Skipping image {idx}: {e}")
+            print(f"⚠️ Batch dish ranking failed, scoring images one by one: {e}")
+    best = None  # (confidence, -idx, result, image_bytes)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(candidates))))
+    try:
+        futures = {
+            # copy_context: the scoring threads report into the same import job
+            pool.submit(contextvars.copy_context().run, _score_dish_image, client, idx, image_bytes):
+                (idx, image_bytes, width, height)
+            for idx, image_bytes, width, height in candidates
+        }
+        for future in as_completed(futures):
+            idx, image_bytes, width, height = futures[future]
+            try:
+                result = future.result()
+            except json.JSONDecodeError as jde:
+                print(f"⚠️ Skipping image {idx}: Failed to parse JSON: {jde}")
+                continue
+            except Exception as e:
+                print(f"⚠️ Skipping image {idx}: {e}")
+                continue
+
+            # Convert relative bbox to absolute pixel coordinates
+            choice = _dish_choice(result, width, height)
+            if choice is None or (best and (choice[0], -idx) <= best[:2]):
+                continue
+            confidence, result["bounding_box"] = choice
+            best = (confidence, -idx, result, image_bytes)
+            print(f"🏆 Image {idx} selected with confidence {confidence}")
+
+            if confidence >= early_exit_confidence:
+                print(f"⏩ Confidence {confidence} >= {early_exit_confidence}, skipping remaining images")
+                break
+    finally:
+        # Don't wait for calls that are still in flight after an early exit.
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    return best_result, best_bytes
+    if best is None:
+        return None, None
+    return best[2], best[3]
 
 
 ##################### EXTRACT RECIPE FROM IMAGES #####################
@@ -526,13 +789,15 @@ def extract_recipe_from_documents(files, api_key, transform_vegan=False, custom_
 
         text = ""
         if "pdf" in ctype or name.endswith(".pdf"):
-            text = extract_text_from_pdf_bytes(blob)
-            # NEW: extract embedded images
-            gathered_images.extend(_images_from_pdf(blob))
+            with import_stage("scrape"):
+                text = extract_text_from_pdf_bytes(blob)
+                # NEW: extract embedded images
+                gathered_images.extend(_images_from_pdf(blob))
         elif "wordprocessingml" in ctype or name.endswith(".docx"):
-            text = extract_text_from_docx_bytes(blob)
-            # NEW: extract embedded images
-            gathered_images.extend(_images_from_docx(blob))
+            with import_stage("scrape"):
+                text = extract_text_from_docx_bytes(blob)
+                # NEW: extract embedded images
+                gathered_images.extend(_images_from_docx(blob))
         elif "msword" in ctype or name.endswith(".doc"):
             # Legacy .doc is not natively supported; recommend converting to .docx
             print("ℹ️ Legacy .doc detected (convert to .docx for best results).")
@@ -585,8 +850,13 @@ Here is one more custom instruction from the user (respect it without changing t
 {custom_instruction}
 """
 
-    client = openai.OpenAI(api_key=api_key)
-    try:
+    cache_key = make_key(
+        "document_extract", OPENAI_TEXT_MODEL, PROMPT_VERSIONS["document_extract"],
+        normalize_text(combined), transform_vegan, custom_instruction,
+    )
+
+    def _ask_llm():
+        client = openai.OpenAI(api_key=api_key)
         response = client.chat.completions.create(
             model=OPENAI_TEXT_MODEL,
             messages=[
@@ -597,29 +867,37 @@ Here is one more custom instruction from the user (respect it without changing t
             ],
             temperature=0
         )
-        data = json.loads(response.choices[0].message.content.strip())
+        record_llm_usage(response)
+        return json.loads(response.choices[0].message.content.strip())
+
+    try:
+        with import_stage("llm"):
+            data = cached_llm_call(cache_key, _ask_llm)
         if custom_title:
             data["title"] = custom_title
 
         # NEW: try to select + refine a hero image from the doc images
         if gathered_images:
-            best_result, best_bytes = identify_best_dish_image(gathered_images, api_key)  # your existing scorer
+            with import_stage("vision"):
+                best_result, best_bytes = identify_best_dish_image(gathered_images, api_key, prepared=True)  # already downscaled above
             if best_bytes:
                 # Background removal (same as image flow) — use shared small session
                 from rembg import remove  # LAZY IMPORT: Only load when processing images
-                raw_img = Image.open(BytesIO(best_bytes)).convert("RGBA")
-                fg_only = remove(raw_img, session=rembg_session())  # CHANGED
-
-                buf = BytesIO()
-                fg_only.save(buf, format="PNG")
-                buf.seek(0)
-
-                cropped = crop_image_to_visible_area(
-                    image_bytes=buf.getvalue(),
-                    white_threshold=240,
-                    alpha_threshold=10,
-                    margin=2
-                )
+                with import_stage("rembg"):
+                    raw_img = Image.open(BytesIO(best_bytes)).convert("RGBA")
+                    fg_only = remove(raw_img, session=rembg_session())  # CHANGED
+
+                with import_stage("crop"):
+                    buf = BytesIO()
+                    fg_only.save(buf, format="PNG")
+                    buf.seek(0)
+
+                    cropped = crop_image_to_visible_area(
+                        image_bytes=buf.getvalue(),
+                        white_threshold=240,
+                        alpha_threshold=10,
+                        margin=2
+                    )
                 data["image_bytes"] = cropped
             else:
                 print("ℹ️ No suitable dish image found inside the document.")
@@ -0,0 +1,167 @@
+"""
+Responsive derivatives of Recipe.image.
+
+For every original the subsystem stores resized WebP (and AVIF, when Pillow
+supports it) copies next to it, under deterministic keys:
+
+    recipe_images/recipe_ab12.png  ->  recipe_images/recipe_ab12__thumb.webp
+                                       recipe_images/recipe_ab12__card.avif ...
+
+Recipe.image_variants keeps a small manifest of what exists, so templates can
+pick a variant without asking the storage backend (an S3 HEAD per image):
+
+    {"v": 1, "source": "<image name>",
+     "sizes": {"thumb": {"w": 160, "h": 120, "webp": "<key>", "avif": "<key>"}, ...}}
+
+Variants are created after an image is saved (signal -> RQ job), during
+import_recipes --fast, and for existing images by
+manage.py backfill_image_variants.
+"""
+import os
+import threading
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from recipes.models import Recipe
+from .metrics import STORAGE_BYTES, traced
+
+VARIANTS_VERSION = 1  # bump when sizes/encoders change; backfill then regenerates
+VARIANT_WIDTHS = {      # largest first: each size is derived from the previous one
+    "large": 1200,      # recipe detail
+    "card": 480,        # home page cards
+    "thumb": 160,       # list rows (shown at 64x48 CSS px)
+}
+_WANTED_FORMATS = [f.strip() for f in os.getenv("IMAGE_VARIANT_FORMATS", "avif,webp").split(",") if f.strip()]
+VARIANT_FORMATS = [f for f in _WANTED_FORMATS if features.check(f)]
+ENCODER_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "avif": {"format": "AVIF", "quality": 55, "speed": 6},
+}
+MIME_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+_pending = threading.local()
+
+
+def variant_key(name, variant, fmt):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}__{variant}.{fmt}"
+
+
+def variants_current(recipe):
+    """True when the stored manifest matches the recipe's current image."""
+    manifest = recipe.image_variants or {}
+    return bool(recipe.image) and manifest.get("v") == VARIANTS_VERSION and manifest.get("source") == recipe.image.name
+
+
+def _save_exact(storage, key, data):
+    # Storages rename on collision; deterministic keys must be overwritten instead.
+    if storage.exists(key):
+        storage.delete(key)
+    STORAGE_BYTES.inc(len(data), kind="image_variant")
+    return storage.save(key, ContentFile(data))
+
+
+@traced("image_variants.create")
+def create_image_variants(storage, name, fileobj):
+    """
+    Decode the original once, write every size/format to storage and return
+    the manifest. fileobj is any binary file-like holding the original.
+    """
+    img = Image.open(fileobj)
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+
+    sizes = {}
+    current = img
+    for variant, width in VARIANT_WIDTHS.items():
+        if current.width > width:
+            current = current.resize((width, max(1, round(current.height * width / current.width))), Image.LANCZOS)
+        entry = {"w": current.width, "h": current.height}
+        for fmt in VARIANT_FORMATS:
+            buf = BytesIO()
+            current.save(buf, **ENCODER_OPTIONS[fmt])
+            entry[fmt] = _save_exact(storage, variant_key(name, variant, fmt), buf.getvalue())
+        sizes[variant] = entry
+    return {"v": VARIANTS_VERSION, "source": name, "sizes": sizes}
+
+
+def delete_image_variants(storage, manifest):
+    for entry in (manifest or {}).get("sizes", {}).values():
+        for fmt in MIME_TYPES:
+            if entry.get(fmt):
+                try:
+                    storage.delete(entry[fmt])
+                except Exception as e:
+                    print(f"⚠️ Could not delete image variant {entry[fmt]}: {e}")
+
+
+def generate_recipe_image_variants(recipe, force=False):
+    """
+    (Re)build the variants of one recipe's image and store the manifest with a
+    plain UPDATE (no save(), so no signals fire). Variants of a replaced image
+    are deleted unless a copied recipe still uses that image. Returns the
+    manifest, or None when the recipe has no image.
+    """
+    storage = recipe.image.storage
+    old = recipe.image_variants or {}
+    if not recipe.image:
+        manifest = {}
+    elif variants_current(recipe) and not force:
+        return old
+    else:
+        with storage.open(recipe.image.name, "rb") as fh:
+            manifest = create_image_variants(storage, recipe.image.name, fh)
+
+    old_source = old.get("source")
+    if old_source and old_source != manifest.get("source") \
+            and not Recipe.objects.filter(image=old_source).exclude(pk=recipe.pk).exists():
+        delete_image_variants(storage, old)
+    Recipe.objects.filter(pk=recipe.pk).update(image_variants=manifest)
+    recipe.image_variants = manifest
+    return manifest or None
+
+
+def schedule_image_variants(recipe_id):
+    """Build variants for the recipe after the current transaction commits (one job per recipe)."""
+    pending = getattr(_pending, "ids", None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.add(recipe_id)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    ids = getattr(_pending, "ids", None) or set()
+    if not ids:
+        return
+    _pending.ids = set()
+
+    from recipes.tasks import process_image_variants
+    try:
+        import django_rq
+        queue = django_rq.get_queue("default")
+        for recipe_id in ids:
+            queue.enqueue(process_image_variants, recipe_id)
+    except Exception as e:
+        # No queue (e.g. local dev without Redis): build them right here.
+        print("⚠️ Image variant queue unavailable, building inline:", e)
+        for recipe in Recipe.objects.filter(pk__in=ids):
+            try:
+                generate_recipe_image_variants(recipe)
+            except Exception as ie:
+                print(f"⚠️ Could not build image variants for recipe {recipe.pk}: {ie}")
+
+
+def variant_url(recipe, variant, fmt=None):
+    """URL of the best stored variant (first configured format), or the original's URL."""
+    if not recipe.image:
+        return ""
+    if variants_current(recipe):
+        entry = recipe.image_variants["sizes"].get(variant) or {}
+        for candidate in ([fmt] if fmt else []) + ["webp"] + VARIANT_FORMATS:
+            if entry.get(candidate):
+                return recipe.image.storage.url(entry[candidate])
+    return recipe.image.url
@@ -0,0 +1,327 @@
+"""
+Durable import records and per-stage timings.
+
+Every import task runs under @records_import_job(source), which opens an
+ImportJob row when the job starts and completes it with the outcome. While
+the task runs, the pipeline reports into the job's recorder:
+
+    with import_stage("llm"): ...      adds the block's wall time to a stage
+    record_llm_usage(response)         token usage of one OpenAI response
+    record_llm_cache_hit()             an LLM call answered by llm_cache
+    record_input(*parts, size=None)    input hash + size (bytes or str parts)
+    record_payload(image_bytes=n)      sizes of what the import produced
+
+All of these are no-ops outside an import job, so the pipeline functions can
+be called from views, commands and the shell unchanged (stages are still
+traced and the LLM counters still count, see metrics.py). The recorder lives in
+a ContextVar; code that fans out to threads must submit through
+contextvars.copy_context().run to keep reporting into the same job.
+
+import_latency_report() turns the recent rows into per-stage percentiles for
+the admin report (ImportJobAdmin).
+"""
+import contextvars
+import functools
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from rq import get_current_job
+
+from recipes.models import ImportJob
+from .llm_cache import digest_bytes
+from .metrics import (
+    IMPORT_INPUT_BYTES, IMPORT_SECONDS, IMPORT_STAGE_SECONDS,
+    LLM_CACHE_HITS, LLM_REQUESTS, LLM_TOKENS, span,
+)
+
+# Pipeline stages, in pipeline order:
+#   scrape  - fetching the page / image downloads / reading document text
+#   llm     - recipe extraction and organizing calls
+#   vision  - picking the dish photo (prefilter + scoring calls)
+#   rembg   - background removal
+#   crop    - trimming the photo to its visible area
+#   upload  - writing the image to storage
+#   db      - the recipe transaction
+STAGES = ("scrape", "llm", "vision", "rembg", "crop", "upload", "db")
+REPORT_MAX_JOBS = 5000
+PERCENTILES = (50, 90, 95, 99)
+
+_current = contextvars.ContextVar("import_recorder", default=None)
+
+
+class ImportRecorder:
+    """Measurements of one running import; shared by the threads it fans out to."""
+
+    def __init__(self, source=""):
+        self._lock = threading.Lock()
+        self.source = source
+        self.stage_ms = defaultdict(float)
+        self.llm_calls = 0
+        self.llm_cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.input_hash = ""
+        self.input_bytes = 0
+        self.image_bytes = 0
+
+    def add_stage(self, stage, ms):
+        with self._lock:
+            self.stage_ms[stage] += ms
+
+    def add_usage(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def add_cache_hit(self):
+        with self._lock:
+            self.llm_cache_hits += 1
+
+
+#region RECORDING
+##################### RECORDING #####################
+
+@contextmanager
+def import_stage(stage):
+    recorder = _current.get()
+    t0 = time.perf_counter()
+    try:
+        with span("import." + stage):
+            yield
+    finally:
+        if recorder is not None:
+            recorder.add_stage(stage, (time.perf_counter() - t0) * 1000)
+
+
+def record_llm_usage(response):
+    usage = getattr(response, "usage", None)
+    model = getattr(response, "model", None) or "unknown"
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_REQUESTS.inc(model=model)
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add_usage(prompt_tokens, completion_tokens)
+
+
+def record_llm_cache_hit():
+    LLM_CACHE_HITS.inc()
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add_cache_hit()
+
+
+def record_input(*parts, size=None):
+    """
+    Hash and size of the import's input; str parts are UTF-8 encoded, None is
+    skipped. Pass size when the parts stand in for the content (e.g. hashes).
+    """
+    recorder = _current.get()
+    if recorder is None:
+        return
+    blobs = [p.encode("utf-8") if isinstance(p, str) else bytes(p) for p in parts if p is not None]
+    recorder.input_hash = digest_bytes(*blobs)
+    recorder.input_bytes = size if size is not None else sum(len(b) for b in blobs)
+
+
+def record_payload(image_bytes=None):
+    recorder = _current.get()
+    if recorder is not None and image_bytes is not None:
+        recorder.image_bytes = image_bytes
+
+##################### /RECORDING #####################
+#endregion
+
+
+#region IMPORT JOB ROWS
+##################### IMPORT JOB ROWS #####################
+
+def _open_record(job, user_id, source):
+    enqueued_at = getattr(job, "enqueued_at", None)
+    if enqueued_at and timezone.is_naive(enqueued_at):  # RQ stores naive UTC timestamps
+        enqueued_at = timezone.make_aware(enqueued_at, dt_timezone.utc)
+    fields = {
+        "user_id": user_id,
+        "source": source,
+        "status": "started",
+        "started_at": timezone.now(),
+        "enqueued_at": enqueued_at,
+    }
+    try:
+        if job is None:
+            return ImportJob.objects.create(**fields)
+        # a retried job reuses its id: start the row over
+        record, _ = ImportJob.objects.update_or_create(job_id=job.id, defaults=fields)
+        return record
+    except Exception as e:
+        print("⚠️ Could not create ImportJob record:", e)
+        return None
+
+
+def _close_record(record, recorder, started, status, recipe_id=None, error_code="", error_message=""):
+    if record is None:
+        return
+    now = timezone.now()
+    queue_ms = None
+    if record.enqueued_at:
+        queue_ms = round(max((record.started_at - record.enqueued_at).total_seconds(), 0) * 1000, 1)
+    try:
+        ImportJob.objects.filter(pk=record.pk).update(
+            status=status,
+            recipe_id=recipe_id,
+            error_code=error_code,
+            error_message=error_message[:2000],
+            input_hash=recorder.input_hash,
+            stage_ms={stage: round(ms, 1) for stage, ms in recorder.stage_ms.items()},
+            queue_ms=queue_ms,
+            total_ms=round((time.perf_counter() - started) * 1000, 1),
+            llm_calls=recorder.llm_calls,
+            llm_cache_hits=recorder.llm_cache_hits,
+            prompt_tokens=recorder.prompt_tokens,
+            completion_tokens=recorder.completion_tokens,
+            input_bytes=recorder.input_bytes,
+            image_bytes=recorder.image_bytes,
+            finished_at=now,
+        )
+    except Exception as e:
+        print(f"⚠️ Could not complete ImportJob record {record.pk}:", e)
+
+
+def _observe(recorder, status, seconds):
+    IMPORT_SECONDS.observe(seconds, source=recorder.source, status=status)
+    for stage, ms in recorder.stage_ms.items():
+        IMPORT_STAGE_SECONDS.observe(ms / 1000, source=recorder.source, stage=stage)
+    IMPORT_INPUT_BYTES.inc(recorder.input_bytes, source=recorder.source)
+
+
+def _failure_details(job, exc):
+    """error_code/message from the exception (_fail_job) or, failing that, the job's meta."""
+    error_code = getattr(exc, "error_code", None)
+    if error_code:
+        return error_code, str(exc)
+    meta = {}
+    if job:
+        try:
+            meta = job.get_meta(refresh=True) or {}
+        except Exception:
+            meta = job.meta or {}
+    return meta.get("error_code", "unknown"), meta.get("error_message", str(exc))
+
+
+def records_import_job(source):
+    """
+    Decorator for import tasks whose first argument is user_id: keeps an
+    ImportJob row for the run and collects the stage timings into it.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(user_id, *args, **kwargs):
+            job = get_current_job()
+            recorder = ImportRecorder(source)
+            token = _current.set(recorder)
+            started = time.perf_counter()
+            record = _open_record(job, user_id, source)
+            try:
+                result = func(user_id, *args, **kwargs)
+            except Exception as e:
+                error_code, error_message = _failure_details(job, e)
+                _close_record(record, recorder, started, "failed",
+                              error_code=error_code, error_message=error_message)
+                _observe(recorder, "failed", time.perf_counter() - started)
+                raise
+            finally:
+                _current.reset(token)
+            result_data = result if isinstance(result, dict) else {}
+            _close_record(record, recorder, started, "finished", recipe_id=result_data.get("recipe_id"))
+            _observe(recorder, "finished", time.perf_counter() - started)
+            return result
+        return wrapper
+    return decorate
+
+##################### /IMPORT JOB ROWS #####################
+#endregion
+
+
+#region REPORT
+##################### REPORT #####################
+
+def percentile(sorted_values, pct):
+    """Linear interpolation between closest ranks (sorted_values must be non-empty)."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _summary(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    row = {"count": len(values), "mean": round(sum(values) / len(values), 1)}
+    for pct in PERCENTILES:
+        row[f"p{pct}"] = round(percentile(values, pct), 1)
+    return row
+
+
+def import_latency_report(days=7, source=None):
+    """
+    Per-stage latency percentiles (ms) over the finished imports of the last
+    `days` days (at most REPORT_MAX_JOBS rows), plus outcome and token counts.
+    Stages a job never entered are left out of that stage's sample.
+    """
+    qs = ImportJob.objects.filter(started_at__gte=timezone.now() - timedelta(days=days))
+    if source:
+        qs = qs.filter(source=source)
+    rows = list(qs.values(
+        "status", "error_code", "stage_ms", "queue_ms", "total_ms",
+        "prompt_tokens", "completion_tokens", "llm_calls", "llm_cache_hits", "input_bytes", "image_bytes",
+    )[:REPORT_MAX_JOBS])
+
+    finished = [r for r in rows if r["status"] == "finished"]
+    samples = defaultdict(list)
+    for r in finished:
+        for stage, ms in (r["stage_ms"] or {}).items():
+            samples[stage].append(ms)
+        if r["queue_ms"] is not None:
+            samples["queue"].append(r["queue_ms"])
+        if r["total_ms"] is not None:
+            samples["total"].append(r["total_ms"])
+
+    stage_names = list(STAGES) + sorted(set(samples) - set(STAGES) - {"queue", "total"})
+    errors = defaultdict(int)
+    for r in rows:
+        if r["status"] == "failed":
+            errors[r["error_code"] or "unknown"] += 1
+
+    def mean_of(key):
+        return round(sum(r[key] for r in finished) / len(finished), 1) if finished else 0
+
+    return {
+        "days": days,
+        "source": source,
+        "jobs": len(rows),
+        "finished": len(finished),
+        "failed": sum(errors.values()),
+        "running": len(rows) - len(finished) - sum(errors.values()),
+        "truncated": len(rows) >= REPORT_MAX_JOBS,
+        "percentiles": PERCENTILES,
+        "stages": [{"stage": s, **_summary(samples[s])} for s in stage_names if samples[s]],
+        "queue": _summary(samples["queue"]),
+        "total": _summary(samples["total"]),
+        "errors": sorted(errors.items(), key=lambda e: -e[1]),
+        "means": {key: mean_of(key) for key in (
+            "prompt_tokens", "completion_tokens", "llm_calls", "llm_cache_hits", "input_bytes", "image_bytes",
+        )},
+    }
+
+##################### /REPORT #####################
+#endregion
@@ -0,0 +1,165 @@
+"""
+Push notifications for background import jobs.
+
+Tasks publish lifecycle events to Redis pub/sub, one channel per job:
+
+    queued   - published by the view right after enqueueing
+    started  - the worker picked the job up
+    stage    - progress inside the job ({"stage": "fetching" | "extracting" | ...})
+    finished - {"recipe_id", "title"}
+    failed   - {"error_code", "error_message"}
+
+The latest event of every job is also kept under a key for EVENT_TTL seconds,
+so a browser that subscribes late (page navigation, reconnect) still gets the
+current state. The async view job_events (served through config/asgi.py)
+streams these events to the browser as Server-Sent Events; base.html falls
+back to polling job_status when the stream is not available.
+"""
+import functools
+import json
+import threading
+import time
+
+from django.conf import settings
+from rq import get_current_job
+
+CHANNEL_PREFIX = "jobevents:"
+LAST_PREFIX = "jobevents:last:"
+EVENT_TTL = 900            # same lifetime as the last_import_job cookie
+TERMINAL_EVENTS = ("finished", "failed")
+
+_local = threading.local()
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        ssl_opts = getattr(settings, "REDIS_SSL_OPTIONS", {})
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2, **ssl_opts)
+    return _client
+
+
+def publish_job_event(job_id, event, user_id=None, **data):
+    """Publish one event for job_id. Never raises: notifications are best effort."""
+    if not job_id:
+        return
+    payload = json.dumps({"job_id": job_id, "event": event, "user_id": user_id, "ts": time.time(), **data})
+    try:
+        pipe = _redis().pipeline()
+        pipe.set(LAST_PREFIX + job_id, payload, ex=EVENT_TTL)
+        pipe.publish(CHANNEL_PREFIX + job_id, payload)
+        pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Could not publish job event {event} for {job_id}:", e)
+
+
+def emit_stage(stage, **data):
+    """Publish a 'stage' event for the job running in this worker (no-op outside a job)."""
+    current = getattr(_local, "current", None)
+    if current:
+        publish_job_event(current[0], "stage", user_id=current[1], stage=stage, **data)
+
+
+def publishes_job_events(func):
+    """
+    Decorator for import tasks whose first argument is user_id: publishes
+    started/finished/failed around the task body.
+    """
+    @functools.wraps(func)
+    def wrapper(user_id, *args, **kwargs):
+        job = get_current_job()
+        job_id = job.id if job else None
+        _local.current = (job_id, user_id)
+        publish_job_event(job_id, "started", user_id=user_id)
+        try:
+            result = func(user_id, *args, **kwargs)
+        except Exception as e:
+            meta = {}
+            if getattr(e, "error_code", None):  # raised by tasks._fail_job
+                meta = {"error_code": e.error_code, "error_message": str(e)}
+            elif job:
+                try:
+                    meta = job.get_meta(refresh=True) or {}
+                except Exception:
+                    meta = job.meta or {}
+            publish_job_event(
+                job_id, "failed", user_id=user_id,
+                error_code=meta.get("error_code", "unknown"),
+                error_message=meta.get("error_message", str(e)),
+            )
+            raise
+        finally:
+            _local.current = None
+        result_data = result if isinstance(result, dict) else {}
+        publish_job_event(
+            job_id, "finished", user_id=user_id,
+            recipe_id=result_data.get("recipe_id"), title=result_data.get("title"),
+        )
+        return result
+    return wrapper
+
+
+#region SSE STREAM
+##################### SSE STREAM #####################
+
+def _sse(payload):
+    event = json.loads(payload)
+    return event, f"event: {event['event']}\ndata: {payload}\n\n"
+
+
+def _belongs_to(event, user_id):
+    # events without an owner are dropped, never broadcast: job ids can be guessed
+    return user_id is not None and event.get("user_id") == user_id
+
+
+async def stream_job_events(job_ids, user_id, max_seconds=900, heartbeat=15):
+    """
+    Async generator of SSE frames for the given jobs (only events published
+    with user_id are forwarded). Ends once every job reached a terminal event, or
+    after max_seconds.
+    """
+    import redis.asyncio as aioredis
+
+    ssl_opts = getattr(settings, "REDIS_SSL_OPTIONS", {})
+    client = aioredis.Redis.from_url(settings.REDIS_URL, **ssl_opts)
+    pubsub = client.pubsub()
+    pending = set(job_ids)
+    try:
+        # Subscribe first, then replay the last known state: no event can fall in between.
+        await pubsub.subscribe(*[CHANNEL_PREFIX + jid for jid in job_ids])
+        yield "retry: 5000\n\n"
+        for jid in job_ids:
+            raw = await client.get(LAST_PREFIX + jid)
+            if raw is None:
+                continue
+            event, frame = _sse(raw.decode() if isinstance(raw, bytes) else raw)
+            if not _belongs_to(event, user_id):
+                pending.discard(jid)
+                continue
+            yield frame
+            if event["event"] in TERMINAL_EVENTS:
+                pending.discard(jid)
+
+        deadline = time.monotonic() + max_seconds
+        while pending and time.monotonic() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                yield ": ping\n\n"
+                continue
+            data = message["data"]
+            event, frame = _sse(data.decode() if isinstance(data, bytes) else data)
+            if not _belongs_to(event, user_id):
+                continue
+            yield frame
+            if event["event"] in TERMINAL_EVENTS:
+                pending.discard(event["job_id"])
+        yield "event: end\ndata: {}\n\n"
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
+
+##################### /SSE STREAM #####################
+#endregion
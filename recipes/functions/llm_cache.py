@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from django.conf import settings
+
+#region LLM RESPONSE CACHE
+##################### LLM RESPONSE CACHE #####################
+#
+# Content-addressed cache for parsed OpenAI responses. The key is a hash of
+# everything that can change the answer: the model, the prompt template
+# version, the normalized input (text or image bytes), the vegan flag and the
+# user's custom instruction. Identical imports (another user importing the same
+# URL a minute later, or an RQ retry of the same job) are served from the cache
+# instead of spending another round trip and tokens.
+#
+# Backends (settings.LLM_CACHE["BACKEND"]):
+#   "redis" - shared between web and workers; per-entry TTL plus an LRU cap
+#             on the number of entries (tracked in a sorted set of last use).
+#   "file"  - one JSON file per entry under LLM_CACHE["PATH"]; used for tests
+#             and local development without Redis.
+#   "off"   - no caching.
+
+CACHE_PREFIX = "llmcache:"
+LRU_KEY = CACHE_PREFIX + "lru"
+
+
+def _config():
+    return getattr(settings, "LLM_CACHE", {})
+
+
+def normalize_text(text):
+    """
+    Whitespace-insensitive form of prompt input so trivial formatting changes still hit.
+    List parts are normalized one by one and joined with a newline, which no
+    normalized part contains, so ["a b"] and ["a", "b"] stay distinct.
+    """
+    if isinstance(text, (list, tuple)):
+        return "\n".join(normalize_text(t) for t in text)
+    return " ".join(str(text or "").split())
+
+
+def digest_bytes(*blobs):
+    h = hashlib.sha256()
+    for blob in blobs:
+        h.update(hashlib.sha256(blob or b"").digest())
+    return h.hexdigest()
+
+
+def make_key(kind, model, template_version, normalized_input, transform_vegan=False, custom_instruction=""):
+    """
+    Build the cache key for one LLM call. normalized_input is text (normalized
+    with normalize_text), a list of such texts, or a digest from digest_bytes.
+    """
+    payload = json.dumps({
+        "kind": kind,
+        "model": model,
+        "v": template_version,
+        "input": normalized_input,
+        "vegan": bool(transform_vegan),
+        "custom": normalize_text(custom_instruction),
+    }, sort_keys=True, ensure_ascii=False)
+    return f"{kind}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class RedisLLMCache:
+    def __init__(self, url, ttl, max_entries):
+        import redis
+        ssl_opts = getattr(settings, "REDIS_SSL_OPTIONS", {})
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2, **ssl_opts)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, key):
+        raw = self.client.get(CACHE_PREFIX + key)
+        if raw is None:
+            self.client.zrem(LRU_KEY, key)
+            return None
+        self.client.zadd(LRU_KEY, {key: time.time()})
+        return json.loads(raw)
+
+    def set(self, key, value):
+        pipe = self.client.pipeline()
+        pipe.set(CACHE_PREFIX + key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+        pipe.zadd(LRU_KEY, {key: time.time()})
+        pipe.zcard(LRU_KEY)
+        size = pipe.execute()[-1]
+        if self.max_entries and size > self.max_entries:
+            evicted = self.client.zpopmin(LRU_KEY, size - self.max_entries)
+            if evicted:
+                self.client.delete(*[CACHE_PREFIX + k.decode() for k, _ in evicted])
+
+
+class FileLLMCache:
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key.replace(":", "_") + ".json")
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, encoding="utf-8") as fh:
+                value = json.load(fh)
+            os.utime(path)  # mtime doubles as last-use for LRU eviction
+            return value
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set(self, key, value):
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(value, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+
+        if self.max_entries:
+            entries = [os.path.join(self.path, f) for f in os.listdir(self.path) if f.endswith(".json")]
+            if len(entries) > self.max_entries:
+                entries.sort(key=os.path.getmtime)
+                for old in entries[:len(entries) - self.max_entries]:
+                    try:
+                        os.remove(old)
+                    except FileNotFoundError:
+                        pass
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide cache backend, or None when caching is off or unavailable."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                cfg = _config()
+                kind = cfg.get("BACKEND", "off")
+                ttl = cfg.get("TTL", 7 * 24 * 3600)
+                max_entries = cfg.get("MAX_ENTRIES", 5000)
+                try:
+                    if kind == "redis":
+                        _backend = RedisLLMCache(cfg.get("URL") or settings.REDIS_URL, ttl, max_entries)
+                    elif kind == "file":
+                        _backend = FileLLMCache(cfg.get("PATH") or os.path.join(settings.BASE_DIR, ".llm_cache"), ttl, max_entries)
+                    else:
+                        _backend = False
+                except Exception as e:
+                    print("⚠️ LLM cache disabled:", e)
+                    _backend = False
+    return _backend or None
+
+
+def reset_llm_cache():
+    """Forget the configured backend (e.g. after changing settings in tests)."""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def cached_llm_call(key, compute):
+    """
+    Return the cached value for key, or run compute() and store its result.
+    compute() should raise on failure; exceptions and None results are never
+    cached, so fallbacks and transient errors are retried next time. Cache
+    errors only cost the lookup, never the import.
+    """
+    cache = get_llm_cache()
+    if cache:
+        try:
+            hit = cache.get(key)
+            if hit is not None:
+                print(f"⚡ LLM cache hit ({key.split(':')[0]})")
+                from .import_jobs import record_llm_cache_hit  # import_jobs imports this module
+                record_llm_cache_hit()
+                return hit
+        except Exception as e:
+            print("⚠️ LLM cache read failed:", e)
+
+    value = compute()
+
+    if cache and value is not None:
+        try:
+            cache.set(key, value)
+        except Exception as e:
+            print("⚠️ LLM cache write failed:", e)
+    return value
+
+##################### LLM RESPONSE CACHE #####################
+#endregion
@@ -0,0 +1,153 @@
+"""
+Load-test scenarios for the list/detail views (manage.py loadtest_views).
+
+Each scenario is one GET against a main view, issued through the Django test
+client as a synthetic user (recipes/functions/synthetic.py). No server or
+network is involved, so the numbers are the view + ORM + template cost
+per request: requests per second, latency percentiles and queries per
+request. run_at_scale() grows the synthetic dataset to a given recipe count
+first, so the same scenarios can be compared at 1k, 10k and 100k recipes.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from recipes.models import Ingredient, Recipe
+from .import_jobs import percentile
+from .synthetic import USERNAME_PREFIX, generate_dataset, synthetic_users
+
+RECIPES_PER_USER = 10  # users generated alongside the recipes of each scale
+
+
+#region SCENARIOS
+##################### SCENARIOS #####################
+
+class Subjects:
+    """
+    The rows the scenarios point at, picked once per scale: the viewer is the
+    best-connected synthetic user, `friend` their friend with most recipes.
+    """
+
+    def __init__(self):
+        from accounts.friend_graph import friend_ids
+
+        users = synthetic_users().annotate(n_friends=Count("friends", distinct=True))
+        self.viewer = users.order_by("-n_friends", "id").first()
+        friends = friend_ids(self.viewer.pk)
+        self.friend_id = (
+            Recipe.objects.filter(user_id__in=friends).values("user_id")
+            .annotate(n=Count("pk")).order_by("-n").values_list("user_id", flat=True).first()
+        ) or next(iter(friends), self.viewer.pk)
+        self.public_recipe_id = (
+            Recipe.objects.filter(visibility="public", user__username__startswith=USERNAME_PREFIX)
+            .exclude(user=self.viewer).order_by("-recipe_id").values_list("pk", flat=True).first()
+        )
+        self.ingredient = (
+            Ingredient.objects.filter(recipe__visibility="public").values("normalized_name")
+            .annotate(n=Count("pk")).order_by("-n").values_list("normalized_name", flat=True).first()
+        ) or ""
+        n_own = Recipe.objects.filter(user=self.viewer).count()
+        n_public = Recipe.objects.filter(visibility="public").exclude(user=self.viewer).count()
+        self.own_last_page = max(1, -(-n_own // 10))
+        self.public_deep_page = max(1, -(-n_public // 10) // 2)
+
+
+def scenarios(s):
+    """name -> URL, for the given Subjects."""
+    ing = f"ing={s.ingredient}"
+    return {
+        "home": reverse("recipes:home"),
+        "recipe_list": reverse("recipes:recipe_list"),
+        "recipe_list.last_page": f"{reverse('recipes:recipe_list')}?page={s.own_last_page}",
+        "recipe_list.sort_title": f"{reverse('recipes:recipe_list')}?sort=title&dir=asc",
+        "recipe_list.ingredient": f"{reverse('recipes:recipe_list')}?{ing}",
+        "public_recipes": reverse("recipes:public_recipes"),
+        "public_recipes.deep_page": f"{reverse('recipes:public_recipes')}?page={s.public_deep_page}",
+        "public_recipes.ingredient": f"{reverse('recipes:public_recipes')}?{ing}",
+        "friends_recipes": reverse("recipes:friends_recipes", args=[s.friend_id]),
+        "recipe_detail": reverse("recipes:recipe_detail", args=[s.public_recipe_id or 0]),
+        "search_recipes": f"{reverse('recipes:search_recipes')}?q={s.ingredient[:4]}",
+        "ingredient_suggestions": f"{reverse('recipes:ingredient_suggestions')}?scope=public&q={s.ingredient[:2]}",
+    }
+
+##################### /SCENARIOS #####################
+#endregion
+
+
+#region RUN
+##################### RUN #####################
+
+def hit(client, url, requests, warmup=1):
+    """GET url warmup + requests times; latency, req/s and queries/request of the measured ones."""
+    for _ in range(warmup):
+        client.get(url)
+    latencies, queries, statuses = [], 0, Counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        queries += len(ctx.captured_queries)
+        statuses[response.status_code] += 1
+    ordered = sorted(latencies)
+    total_s = sum(latencies) / 1000
+    return {
+        "url": url,
+        "requests": requests,
+        "req_per_s": round(requests / total_s, 1) if total_s else None,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50), 2),
+            "p95": round(percentile(ordered, 95), 2),
+            "mean": round(sum(ordered) / len(ordered), 2),
+        },
+        "queries_per_request": round(queries / requests, 1),
+        "statuses": {str(code): n for code, n in statuses.items()},
+    }
+
+
+def grow_dataset(recipes, contents=None, avg_friends=8, seed=None, log=print, allow_live=False):
+    """Add synthetic users/recipes until there are `recipes` synthetic recipes (never removes any)."""
+    have = Recipe.objects.filter(user__username__startswith=USERNAME_PREFIX).count()
+    users_needed = max(0, recipes // RECIPES_PER_USER - synthetic_users().count())
+    if users_needed or recipes > have:
+        generate_dataset(
+            users=max(users_needed, 0 if synthetic_users().exists() else 1),
+            recipes=max(0, recipes - have), avg_friends=avg_friends, contents=contents, seed=seed, log=log,
+            allow_live=allow_live,
+        )
+    return max(have, recipes)
+
+
+def run_at_scale(recipes, requests=20, warmup=1, only=(), contents=None, seed=None, log=print, allow_live=False):
+    """Grow the dataset to `recipes` synthetic recipes and run every scenario against it."""
+    grow_dataset(recipes, contents=contents, seed=seed, log=log, allow_live=allow_live)
+    subjects = Subjects()
+    client = Client()
+    results = {}
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        METRICS={**getattr(settings, "METRICS", {}), "ENABLED": False},
+    ):
+        client.force_login(subjects.viewer)
+        for name, url in scenarios(subjects).items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            results[name] = hit(client, url, requests, warmup=warmup)
+            log(f"   {name}: {results[name]['req_per_s']} req/s · p95 {results[name]['latency_ms']['p95']} ms · "
+                f"{results[name]['queries_per_request']} queries/request")
+    return {
+        "recipes": Recipe.objects.count(),
+        "synthetic_recipes": Recipe.objects.filter(user__username__startswith=USERNAME_PREFIX).count(),
+        "users": synthetic_users().count(),
+        "viewer": subjects.viewer.username,
+        "scenarios": results,
+    }
+
+##################### /RUN #####################
+#endregion
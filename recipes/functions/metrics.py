@@ -0,0 +1,306 @@
+"""
+Lightweight tracing and metrics, exported in the Prometheus text format.
+
+Metrics are declared once below (Counter / Histogram) and updated with
+    LLM_TOKENS.inc(n, model="gpt-4o", kind="prompt")
+    HTTP_SECONDS.observe(0.12, view="recipes:home", method="GET", status="2xx")
+
+Updates go into a per-process buffer that is flushed to Redis (one hash per
+metric, HINCRBYFLOAT per series) every METRICS["FLUSH_SECONDS"] and at the
+end of every RQ job. Web dynos and workers therefore all report into the same
+series, and the /metrics endpoint (views.metrics) renders the aggregate no
+matter which process serves the scrape. Without Redis the endpoint falls back
+to this process's own totals.
+
+Tracing: span(name) times a block and records it in span_duration_seconds;
+spans nest per context (threads/tasks started with contextvars.copy_context()
+keep their parent). With METRICS["TRACE_LOG"] on, every finished span is also
+printed with its trace id (the RQ job id, or a short id per web request).
+"""
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from rq import get_current_job
+
+KEY_PREFIX = "metrics:"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REGISTRY = {}
+
+_lock = threading.Lock()
+_pending = defaultdict(lambda: defaultdict(float))   # name -> series field -> delta (not yet in Redis)
+_totals = defaultdict(lambda: defaultdict(float))    # name -> series field -> value (this process)
+_last_flush = time.monotonic()
+_flush_warned = False
+_client = None
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_span_path = contextvars.ContextVar("span_path", default=())
+
+
+def _config():
+    return getattr(settings, "METRICS", {})
+
+
+def process_role():
+    """web / worker / imageworker on Heroku (from $DYNO), "local" elsewhere."""
+    return os.getenv("DYNO", "local").split(".")[0]
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        ssl_opts = getattr(settings, "REDIS_SSL_OPTIONS", {})
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2, **ssl_opts)
+    return _client
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(labels):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+
+
+def _add(name, field, amount):
+    global _last_flush
+    if not _config().get("ENABLED", True):
+        return
+    with _lock:
+        _pending[name][field] += amount
+        _totals[name][field] += amount
+        due = time.monotonic() - _last_flush >= _config().get("FLUSH_SECONDS", 10)
+    if due:
+        flush_metrics()
+
+
+#region METRIC TYPES
+##################### METRIC TYPES #####################
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        REGISTRY[name] = self
+
+    def inc(self, amount=1, **labels):
+        if amount:
+            _add(self.name, _series(labels), amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.buckets = name, help_text, tuple(buckets)
+        REGISTRY[name] = self
+
+    def observe(self, value, **labels):
+        series = _series(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        bound = self.buckets[i] if i < len(self.buckets) else "+Inf"
+        _add(self.name, f"{series}|{bound}", 1)   # stored per bucket, made cumulative on render
+        _add(self.name, f"{series}|sum", value)
+        _add(self.name, f"{series}|count", 1)
+
+##################### /METRIC TYPES #####################
+#endregion
+
+
+#region METRICS
+##################### METRICS #####################
+
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "Web request latency by view, method and status class.")
+SPAN_SECONDS = Histogram("span_duration_seconds", "Duration of traced spans.")
+RQ_JOBS = Counter("rq_jobs_total", "Background jobs run, by task and outcome.")
+RQ_JOB_SECONDS = Histogram("rq_job_duration_seconds", "Background job run time by task.")
+IMPORT_SECONDS = Histogram("recipe_import_duration_seconds", "Recipe import run time by source and outcome.")
+IMPORT_STAGE_SECONDS = Histogram("recipe_import_stage_duration_seconds", "Time per import spent in each pipeline stage.")
+IMPORT_INPUT_BYTES = Counter("recipe_import_input_bytes_total", "Bytes of import input (URLs, text, files) by source.")
+LLM_REQUESTS = Counter("llm_requests_total", "OpenAI requests by model.")
+LLM_TOKENS = Counter("llm_tokens_total", "OpenAI tokens by model and kind (prompt/completion).")
+LLM_CACHE_HITS = Counter("llm_cache_hits_total", "LLM calls answered from the response cache.")
+STORAGE_BYTES = Counter("storage_bytes_written_total", "Bytes written to file storage by kind.")
+DB_ROWS = Counter("db_rows_written_total", "Rows inserted by the import and copy paths, by table.")
+DB_QUERIES = Histogram("http_request_db_queries", "SQL queries per web request by view.",
+                       buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+N_PLUS_ONE = Counter("http_n_plus_one_total", "Requests that repeated one SQL shape N+1-style, by view.")
+DB_CONNECT_SECONDS = Histogram("db_connection_setup_seconds",
+                               "Time to open (or check out from the pool) a database connection, by process role.",
+                               buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+##################### /METRICS #####################
+#endregion
+
+
+#region FLUSH + RENDER
+##################### FLUSH + RENDER #####################
+
+def flush_metrics():
+    """Push this process's buffered deltas to Redis. Never raises."""
+    global _pending, _last_flush, _flush_warned
+    with _lock:
+        pending, _pending = _pending, defaultdict(lambda: defaultdict(float))
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for name, fields in pending.items():
+            for field, amount in fields.items():
+                pipe.hincrbyfloat(KEY_PREFIX + name, field, amount)
+        pipe.execute()
+    except Exception as e:
+        if not _flush_warned:  # once per process: local dev usually runs without Redis
+            print("⚠️ Could not flush metrics (kept in this process only):", e)
+            _flush_warned = True
+
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _render_metric(metric, fields):
+    lines = [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+    if metric.kind == "counter":
+        for series, value in sorted(fields.items()):
+            lines.append(f"{metric.name}{{{series}}} {_format(value)}" if series else f"{metric.name} {_format(value)}")
+        return lines
+
+    by_series = defaultdict(dict)
+    for field, value in fields.items():
+        series, _, part = field.rpartition("|")
+        by_series[series][part] = value
+    for series, parts in sorted(by_series.items()):
+        prefix = f"{series}," if series else ""
+        cumulative = 0
+        for bound in list(metric.buckets) + ["+Inf"]:
+            cumulative += parts.get(str(bound), 0)
+            lines.append(f'{metric.name}_bucket{{{prefix}le="{bound}"}} {_format(cumulative)}')
+        label_block = f"{{{series}}}" if series else ""
+        lines.append(f"{metric.name}_sum{label_block} {_format(parts.get('sum', 0))}")
+        lines.append(f"{metric.name}_count{label_block} {_format(parts.get('count', 0))}")
+    return lines
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format."""
+    flush_metrics()
+    header = []
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for name in REGISTRY:
+            pipe.hgetall(KEY_PREFIX + name)
+        data = {
+            name: {k.decode(): float(v) for k, v in raw.items()}
+            for name, raw in zip(REGISTRY, pipe.execute())
+        }
+    except Exception as e:
+        print("⚠️ Metrics store unavailable, rendering this process only:", e)
+        header = ["# Redis unavailable: metrics of this process only"]
+        with _lock:
+            data = {name: dict(fields) for name, fields in _totals.items()}
+
+    lines = list(header)
+    for name, metric in REGISTRY.items():
+        lines.extend(_render_metric(metric, data.get(name, {})))
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    """Drop all stored series (Redis and this process)."""
+    global _pending, _totals
+    with _lock:
+        _pending = defaultdict(lambda: defaultdict(float))
+        _totals = defaultdict(lambda: defaultdict(float))
+    try:
+        _redis().delete(*[KEY_PREFIX + name for name in REGISTRY])
+    except Exception as e:
+        print("⚠️ Could not reset metrics:", e)
+
+##################### /FLUSH + RENDER #####################
+#endregion
+
+
+#region TRACING
+##################### TRACING #####################
+
+@contextmanager
+def trace_context(trace_id=None):
+    """Run the block as one trace (new id unless given); spans inside log under it."""
+    token = _trace_id.set(trace_id or uuid.uuid4().hex[:12])
+    path_token = _span_path.set(())
+    try:
+        yield
+    finally:
+        _span_path.reset(path_token)
+        _trace_id.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the block as span `name`; nested spans are logged indented under it."""
+    parent = _span_path.get()
+    token = _span_path.set(parent + (name,))
+    status = "ok"
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _span_path.reset(token)
+        seconds = time.perf_counter() - t0
+        SPAN_SECONDS.observe(seconds, span=name, status=status)
+        if _config().get("TRACE_LOG"):
+            details = " ".join(f"{k}={v}" for k, v in attrs.items())
+            print(f"🔎 [{_trace_id.get() or '-'}] {'  ' * len(parent)}{name} {seconds * 1000:.1f} ms {status} {details}".rstrip())
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_task(func):
+    """
+    Outermost decorator for RQ tasks: one trace per job (id = RQ job id), the
+    job's run time and outcome, and a flush at the end, because RQ's work
+    horse exits without running atexit hooks.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        job = get_current_job()
+        status = "failed"
+        t0 = time.perf_counter()
+        try:
+            with trace_context(job.id if job else None), span("task." + func.__name__):
+                result = func(*args, **kwargs)
+            status = "finished"
+            return result
+        finally:
+            RQ_JOBS.inc(task=func.__name__, status=status)
+            RQ_JOB_SECONDS.observe(time.perf_counter() - t0, task=func.__name__)
+            flush_metrics()
+    return wrapper
+
+##################### /TRACING #####################
+#endregion
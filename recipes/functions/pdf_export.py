@@ -0,0 +1,204 @@
+"""
+Recipe PDF rendering and the PDF artifact store.
+
+Rendering (xhtml2pdf) happens in an RQ job, not in the web request. The
+result is stored in the private "artifacts" storage (see artifact_storage)
+under a key derived from (recipe_id, updated_at, PDF_TEMPLATE_VERSION), so:
+
+- a repeat download is a storage lookup, not a render;
+- editing the recipe changes updated_at and therefore the key; the signal
+  handlers in recipes/signals.py also delete the stale artifacts (including
+  after ingredient/instruction-only edits);
+- changing the template only needs a PDF_TEMPLATE_VERSION bump.
+
+Artifacts of private and friends-only recipes must never be readable without
+the view's permission check, so keys also carry a token derived from
+SECRET_KEY: even a misconfigured public bucket does not expose guessable URLs.
+"""
+import os
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils.crypto import salted_hmac
+from xhtml2pdf import pisa
+
+from .metrics import STORAGE_BYTES, traced
+
+PDF_TEMPLATE = "recipes/recipe_pdf_xhtml2pdf.html"
+PDF_TEMPLATE_VERSION = 1  # bump whenever the PDF template or its assets change
+ARTIFACT_PREFIX = "pdf_artifacts"
+
+_pending = threading.local()
+
+
+class PdfRenderError(Exception):
+    pass
+
+
+#region LINK CALLBACK
+##################### LINK CALLBACK #####################
+
+def _is_abs(url: str) -> bool:
+    return url.startswith("http://") or url.startswith("https://")
+
+def _strip_prefix(s: str, prefix: str) -> str:
+    return s[len(prefix):] if s.startswith(prefix) else s
+
+
+def _link_callback(uri: str, rel: str | None):
+    """
+    Resolve URIs in HTML so xhtml2pdf can load assets.
+
+    - If the URI is absolute (http/https), return it unchanged (let xhtml2pdf fetch it).
+    - If MEDIA_URL/STATIC_URL are absolute (CDN/S3) and the URI starts with them, return the URI unchanged.
+    - If MEDIA_URL/STATIC_URL are relative, map to MEDIA_ROOT/STATIC_ROOT or use staticfiles finders.
+    - For other relative paths, resolve against 'rel' (the current template directory).
+    - Never raise FileNotFoundError; fall back to returning the original URI so xhtml2pdf can try.
+    """
+    if not uri:
+        return uri
+
+    # 1) Fully-qualified external URL?
+    if _is_abs(uri):
+        return uri
+
+    # 2) MEDIA_URL handling (S3/CDN vs local)
+    media_url = getattr(settings, "MEDIA_URL", "") or ""
+    if media_url:
+        if _is_abs(media_url) and uri.startswith(media_url):
+            # S3/CDN media → leave as is
+            return uri
+        if uri.startswith(media_url):
+            candidate = os.path.join(settings.MEDIA_ROOT, _strip_prefix(uri, media_url))
+            if os.path.isfile(candidate):
+                return candidate
+
+    # 3) STATIC_URL handling (CDN vs local)
+    static_url = getattr(settings, "STATIC_URL", "") or ""
+    if static_url:
+        if _is_abs(static_url) and uri.startswith(static_url):
+            # CDN static → leave as is
+            return uri
+        if uri.startswith(static_url):
+            # Try collectstatic path
+            found = finders.find(_strip_prefix(uri, static_url))
+            if found:
+                return found
+            candidate = os.path.join(getattr(settings, "STATIC_ROOT", "") or "", _strip_prefix(uri, static_url))
+            if candidate and os.path.isfile(candidate):
+                return candidate
+
+    # 4) Relative path: resolve against template directory if provided
+    if rel and not os.path.isabs(uri):
+        base_dir = os.path.dirname(rel)
+        candidate = os.path.normpath(os.path.join(base_dir, uri))
+        if os.path.isfile(candidate):
+            return candidate
+
+    # 5) Last resort: return the original string and let xhtml2pdf try
+    return uri
+
+##################### /LINK CALLBACK #####################
+#endregion
+
+
+#region RENDERING
+##################### RENDERING #####################
+
+def render_recipe_pdf_bytes(recipe, link_callback=_link_callback):
+    """Render one recipe (with ingredients/instructions prefetched) to PDF bytes."""
+    # Optional: convenience attribute if your template wants it
+    recipe.ingredients_csv = ", ".join(i.name for i in recipe.ingredients.all())
+
+    html = get_template(PDF_TEMPLATE).render({"recipe": recipe})
+    result = BytesIO()
+    pdf_status = pisa.CreatePDF(html, dest=result, link_callback=link_callback)
+    if pdf_status.err:
+        raise PdfRenderError(f"xhtml2pdf reported {pdf_status.err} error(s) for recipe {recipe.pk}")
+    return result.getvalue()
+
+##################### /RENDERING #####################
+#endregion
+
+
+#region ARTIFACT STORE
+##################### ARTIFACT STORE #####################
+
+def artifact_storage():
+    """Private storage for generated files (PDFs, cookbook exports); never served publicly."""
+    return storages["artifacts"]
+
+
+def pdf_artifact_key(recipe):
+    stamp = int(recipe.updated_at.timestamp() * 1_000_000) if recipe.updated_at else 0
+    version = f"{stamp}-v{PDF_TEMPLATE_VERSION}"
+    token = salted_hmac("recipes.pdf_artifact", f"{recipe.pk}:{version}").hexdigest()[:20]
+    return f"{ARTIFACT_PREFIX}/{recipe.pk}/{version}-{token}.pdf"
+
+
+def get_pdf_artifact(recipe):
+    """Storage key of the current artifact for this recipe, or None if it has to be rendered."""
+    key = pdf_artifact_key(recipe)
+    return key if artifact_storage().exists(key) else None
+
+
+@traced("pdf.build")
+def build_pdf_artifact(recipe):
+    """Render and store the artifact for the recipe's current state; returns its key."""
+    storage = artifact_storage()
+    key = pdf_artifact_key(recipe)
+    if storage.exists(key):
+        return key
+    pdf_bytes = render_recipe_pdf_bytes(recipe)
+    saved = storage.save(key, ContentFile(pdf_bytes))
+    STORAGE_BYTES.inc(len(pdf_bytes), kind="pdf")
+    if saved != key:
+        # Someone else stored the same artifact while we rendered; keep theirs.
+        storage.delete(saved)
+    print(f"📄 Stored PDF artifact {key} ({len(pdf_bytes)} bytes)")
+    return key
+
+
+def delete_pdf_artifacts(recipe_ids):
+    storage = artifact_storage()
+    for recipe_id in recipe_ids:
+        prefix = f"{ARTIFACT_PREFIX}/{recipe_id}"
+        try:
+            _, files = storage.listdir(prefix)
+        except (FileNotFoundError, OSError):
+            continue
+        for name in files:
+            storage.delete(f"{prefix}/{name}")
+
+
+def schedule_pdf_invalidation(recipe_id):
+    """
+    Drop the recipe's artifacts once the current transaction commits. Several
+    child saves in one atomic block collapse into one storage listing.
+    """
+    if not recipe_id:
+        return
+    pending = getattr(_pending, "ids", None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.add(recipe_id)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    ids = getattr(_pending, "ids", None) or set()
+    if ids:
+        _pending.ids = set()
+        try:
+            delete_pdf_artifacts(ids)
+        except Exception as e:
+            print("⚠️ Could not invalidate PDF artifacts:", e)
+
+##################### /ARTIFACT STORE #####################
+#endregion
@@ -0,0 +1,59 @@
+"""
+Recipe access rules, in one place.
+
+    view: the owner, anyone for 'public', friends of the owner for 'friends'
+    copy: may view, and the recipe is shared ('friends' or 'public')
+    edit/delete: the owner
+
+Querysets use Recipe.objects.visible_to(user) (same rules as SQL). For
+recipes that are already loaded, the functions below decide from the row's
+user_id/visibility plus the cached friend-id set, so checking a whole page
+of recipes costs no queries.
+"""
+from accounts.friend_graph import friend_ids
+
+SHARED_VISIBILITIES = ("friends", "public")
+
+
+def _friends_of(user):
+    return friend_ids(user.pk) if getattr(user, "is_authenticated", False) else frozenset()
+
+
+def _can_view(user, recipe, friends):
+    if recipe.visibility == "public":
+        return True
+    if not getattr(user, "is_authenticated", False):
+        return False
+    if recipe.user_id == user.pk:
+        return True
+    return recipe.visibility == "friends" and recipe.user_id in friends
+
+
+def can_view(user, recipe):
+    return _can_view(user, recipe, _friends_of(user))
+
+
+def can_copy(user, recipe):
+    return (getattr(user, "is_authenticated", False)
+            and recipe.visibility in SHARED_VISIBILITIES
+            and can_view(user, recipe))
+
+
+def can_edit(user, recipe):
+    return getattr(user, "is_authenticated", False) and recipe.user_id == user.pk
+
+
+def recipe_permissions(user, recipes):
+    """{recipe_id: {"view", "copy", "edit"}} for loaded recipes; one friend-set lookup in total."""
+    friends = _friends_of(user)
+    authenticated = getattr(user, "is_authenticated", False)
+    result = {}
+    for recipe in recipes:
+        view = _can_view(user, recipe, friends)
+        result[recipe.pk] = {
+            "view": view,
+            "copy": bool(authenticated and view and recipe.visibility in SHARED_VISIBILITIES),
+            "edit": bool(authenticated and recipe.user_id == user.pk),
+        }
+    return result
+
@@ -5,7 +5,8 @@ import uuid
 ##################### GET DATA FROM URL / IMAGE FUNCTIONS #####################
 
 def get_data_from_url(url, api_key, transform_vegan=False, custom_instructions=""):
-    raw_data = fetch_recipe_from_url(url)
+    with import_stage("scrape"):
+        raw_data = fetch_recipe_from_url(url)
     structured_data = organize_with_llm(raw_data, api_key, transform_vegan, custom_instructions)
 
     # Get image
@@ -14,10 +15,12 @@ def get_data_from_url(url, api_key, transform_vegan=False, custom_instructions="
 
     if image_path:
         try:
-            response = requests.get(image_path)
+            with import_stage("scrape"):
+                response = requests.get(image_path)
             if response.status_code == 200:
                 original = response.content
-                image_bytes = crop_image_to_visible_area(original)
+                with import_stage("crop"):
+                    image_bytes = crop_image_to_visible_area(original)
         except Exception as e:
             print(f"⚠️ Failed to download image from URL: {e}")
 
@@ -54,7 +57,8 @@ def get_data_from_image(images, api_key, transform_vegan, custom_instruction, cu
         # If result only contains image path/url, re-fetch bytes:
         if return_image_bytes and not best_image_bytes and result.get("image_url"):
             try:
-                resp = requests.get(result["image_url"])
+                with import_stage("scrape"):
+                    resp = requests.get(result["image_url"])
                 if resp.status_code == 200:
                     best_image_bytes = resp.content
             except Exception as e:
@@ -91,10 +95,15 @@ def get_data_from_documents(documents, api_key, transform_vegan, custom_instruct
 ##################### GET DATA FROM URL / IMAGE FUNCTIONS #####################
 
 
-from recipes.models import Recipe, Ingredient, Instruction
+from recipes.models import Recipe, Ingredient, Instruction, normalize_ingredient_name
+from .suggestions import add_recipe_suggestions
+from .import_jobs import import_stage, record_payload
+from .metrics import DB_ROWS, STORAGE_BYTES
 from django.core.files.base import ContentFile
 from django.conf import settings
+from django.db import transaction
 import os
+import time
 
 #region STR DATA TO DB
 ##################### SAVE STRUCTURED DATA TO DB FUNCTION #####################
@@ -143,10 +152,46 @@ def clean_quantity(value):
     except:
         return None
 
-def save_structured_recipe_to_db(data, user, image_bytes=None):
+def build_recipe_children(recipe, data):
+    """
+    Build (but do not save) the Ingredient and Instruction rows for a structured
+    recipe dictionary, so they can be written with one bulk_create per table.
+    """
+    ingredients = []
+    for group in data.get("ingredients", []):
+        category = group.get("category", "")
+        for item in group.get("items", []):
+            name = item.get("name", "").strip()
+            ingredients.append(Ingredient(
+                recipe=recipe,
+                category=category,
+                name=name,
+                normalized_name=normalize_ingredient_name(name),
+                quantity=clean_quantity(item.get("quantity")),
+                unit=(item.get("unit") or "").strip()
+            ))
+
+    instructions = [
+        Instruction(recipe_id=recipe, step_number=idx, description=step.strip())
+        for idx, step in enumerate(data.get("instructions", []), start=1)
+    ]
+    return ingredients, instructions
+
+
+def save_structured_recipe_to_db(data, user, image_bytes=None, return_stats=False):
     """
     Save a structured recipe dictionary to the Django database.
+
+    The recipe and all of its ingredients/instructions are written inside one
+    transaction with a single bulk INSERT per child table (3 round trips instead
+    of 1 + one per row). The image is uploaded to storage *before* the
+    transaction opens, so a slow S3 upload never holds a DB transaction; it is
+    deleted again if the transaction fails.
+
+    With return_stats=True, returns (recipe, stats) where stats holds row counts
+    and timings in milliseconds.
     """
+    t_start = time.perf_counter()
     recipe = Recipe(
         title=data.get("title", "Untitled"),
         cook_time=clean_int_from_string(data.get("cook_time")),
@@ -155,33 +200,45 @@ def save_structured_recipe_to_db(data, user, image_bytes=None):
         user=user,
     )
 
-    # Optionally attach image
+    # Optionally attach image (uploads to the storage backend, no DB access)
     if image_bytes:
+        with import_stage("upload"):
             filename = f"recipe_{uuid.uuid4().hex}.png"
             recipe.image.save(filename, ContentFile(image_bytes), save=False)
+    t_image = time.perf_counter()
 
-    recipe.save()
-
-    # Save ingredients
-    for group in data.get("ingredients", []):
-        category = group.get("category", "")
-        for item in group.get("items", []):
-            Ingredient.objects.create(
-                recipe=recipe,
-                category=category,
-                name=item.get("name", "").strip(),
-                quantity=clean_quantity(item.get("quantity")),
-                unit=(item.get("unit") or "").strip()
-            )
-
-    # Save instructions
-    for idx, step in enumerate(data.get("instructions", []), start=1):
-        Instruction.objects.create(
-            recipe_id=recipe,
-            step_number=idx,
-            description=step.strip()
-        )
+    try:
+        with import_stage("db"), transaction.atomic():
+            recipe.save()
+            ingredients, instructions = build_recipe_children(recipe, data)
+            Ingredient.objects.bulk_create(ingredients)
+            Instruction.objects.bulk_create(instructions)
+            add_recipe_suggestions(recipe, ingredients)
+    except Exception:
+        # the rows rolled back; don't leave the uploaded image behind without a recipe
+        if recipe.image:
+            recipe.image.delete(save=False)
+        raise
+    t_db = time.perf_counter()
+    record_payload(image_bytes=len(image_bytes) if image_bytes else 0)
+    STORAGE_BYTES.inc(len(image_bytes) if image_bytes else 0, kind="recipe_image")
+    DB_ROWS.inc(table="recipe")
+    DB_ROWS.inc(len(ingredients), table="ingredient")
+    DB_ROWS.inc(len(instructions), table="instruction")
+
+    stats = {
+        "ingredients": len(ingredients),
+        "instructions": len(instructions),
+        "image_bytes": len(image_bytes) if image_bytes else 0,
+        "image_upload_ms": round((t_image - t_start) * 1000, 1),
+        "db_ms": round((t_db - t_image) * 1000, 1),
+        "total_ms": round((t_db - t_start) * 1000, 1),
+    }
+    print(f"💾 Saved recipe {recipe.recipe_id}: {stats['ingredients']} ingredients, "
+          f"{stats['instructions']} steps in {stats['db_ms']} ms (image {stats['image_upload_ms']} ms)")
 
+    if return_stats:
+        return recipe, stats
     return recipe
 
 ##################### Save Structured Recipe to DB #####################
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Per-request SQL instrumentation: query counts, time, N+1 detection and
+per-view query budgets.
+
+    with inspect_queries() as q:         counts every query on the default
+        ...                              connection (DEBUG not required)
+    q.count, q.time_ms, q.repeated()     repeated() = SQL shapes run at least
+                                         N_PLUS_ONE_THRESHOLD times
+
+A shape is the SQL with its parameters, numbers and IN-lists folded, so
+"SELECT ... WHERE id = %s" run once per row of a page shows up as one shape
+with a high count: the usual N+1 from a template touching recipe.user or a
+related manager per row.
+
+Views declare their budget with @query_budget(n) as the innermost decorator
+(the attribute survives login_required & co. through functools.wraps):
+
+    @login_required
+    @query_budget(8)
+    def public_recipes(request): ...
+
+QueryInspectorMiddleware checks every request against its view's budget and
+logs overruns and N+1 shapes; recipes/tests.py asserts the budgets, so a
+change that adds a query per row fails the test suite.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def _config():
+    return getattr(settings, "QUERY_INSPECTOR", {})
+
+
+def inspector_enabled():
+    return _config().get("ENABLED", False)
+
+
+def n_plus_one_threshold():
+    return _config().get("N_PLUS_ONE_THRESHOLD", 5)
+
+
+def sql_shape(sql):
+    """SQL with literals and parameter lists folded, so per-row repeats compare equal."""
+    sql = _STRING.sub("'?'", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _NUMBER.sub("?", sql)
+
+
+class QueryLog:
+    """Queries seen inside one inspect_queries() block."""
+
+    def __init__(self):
+        self.count = 0
+        self.time_ms = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # django.db connection execute_wrapper hook
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time_ms += (time.perf_counter() - t0) * 1000
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def repeated(self, threshold=None):
+        """[(shape, times)] of shapes run at least `threshold` times, most frequent first."""
+        threshold = threshold or n_plus_one_threshold()
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def summary(self, limit=3):
+        return "; ".join(f"{n}× {shape[:160]}" for shape, n in self.repeated()[:limit])
+
+
+@contextmanager
+def inspect_queries(using="default"):
+    log = QueryLog()
+    with connections[using].execute_wrapper(log):
+        yield log
+
+
+def query_budget(max_queries):
+    """Declare the most queries one request to this view may run (see module docstring)."""
+    def decorate(view):
+        view.query_budget = max_queries
+        return view
+    return decorate
+
+
+def budget_for(view):
+    """The view's declared budget, or None."""
+    return getattr(view, "query_budget", None)
+
+
+def check_request(view_name, view, log):
+    """Problems of one request as log lines: budget overrun and N+1 shapes."""
+    problems = []
+    budget = budget_for(view)
+    if budget is not None and log.count > budget:
+        problems.append(f"{view_name} ran {log.count} queries (budget {budget})")
+    if log.repeated():
+        problems.append(f"{view_name} N+1 suspected: {log.summary()}")
+    return problems
@@ -0,0 +1,201 @@
+"""
+Full-text recipe search.
+
+Every recipe has a RecipeSearchDocument holding its title, ingredient names,
+instruction text and notes. The backend depends on the database vendor:
+
+- PostgreSQL: RecipeSearchDocument.vector (tsvector, GIN index) with weights
+  A/B/C/D, ranked with ts_rank.
+- SQLite: the FTS5 table recipes_search_fts (rowid = recipe_id), ranked with
+  bm25() using the same relative weights. Used for local runs.
+- Anything else: a plain icontains over the document (no ranking).
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q, Value
+from django.utils.html import strip_tags
+
+from recipes.models import Recipe, Ingredient, Instruction, RecipeSearchDocument
+
+
+SEARCH_CONFIG = getattr(settings, "SEARCH_CONFIG", "german")
+FTS_TABLE = "recipes_search_fts"
+# bm25() weights per FTS5 column, mirroring the A > B > C > D tsvector weights
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+_pending = threading.local()
+
+
+def _vendor():
+    return connection.vendor
+
+
+#region DOCUMENT SYNC
+##################### DOCUMENT SYNC #####################
+
+def refresh_search_documents(recipe_ids):
+    """
+    Rebuild the search documents for the given recipes in a constant number of
+    queries (recipes, ingredients, instructions, one upsert, one index update).
+    """
+    recipe_ids = list({int(r) for r in recipe_ids if r})
+    if not recipe_ids:
+        return 0
+
+    recipes = {
+        rid: (title, notes)
+        for rid, title, notes in Recipe.objects.filter(pk__in=recipe_ids).values_list("recipe_id", "title", "notes")
+    }
+    ingredients, instructions = {}, {}
+    for rid, name in Ingredient.objects.filter(recipe_id__in=recipes).values_list("recipe_id", "name"):
+        ingredients.setdefault(rid, []).append(name or "")
+    for rid, text in (Instruction.objects.filter(recipe_id__in=recipes)
+                      .order_by("step_number").values_list("recipe_id", "description")):
+        instructions.setdefault(rid, []).append(strip_tags(text or ""))
+
+    docs = [
+        RecipeSearchDocument(
+            recipe_id=rid,
+            title=title or "",
+            ingredients="\n".join(ingredients.get(rid, [])),
+            instructions="\n".join(instructions.get(rid, [])),
+            notes=notes or "",
+        )
+        for rid, (title, notes) in recipes.items()
+    ]
+
+    with transaction.atomic():
+        RecipeSearchDocument.objects.bulk_create(
+            docs,
+            update_conflicts=True,
+            unique_fields=["recipe"],
+            update_fields=["title", "ingredients", "instructions", "notes", "updated_at"],
+        )
+        if _vendor() == "postgresql":
+            RecipeSearchDocument.objects.filter(recipe_id__in=recipes).update(
+                vector=(
+                    SearchVector("title", weight="A", config=SEARCH_CONFIG)
+                    + SearchVector("ingredients", weight="B", config=SEARCH_CONFIG)
+                    + SearchVector("instructions", weight="C", config=SEARCH_CONFIG)
+                    + SearchVector("notes", weight="D", config=SEARCH_CONFIG)
+                )
+            )
+        elif _vendor() == "sqlite" and _fts_available():
+            with connection.cursor() as cursor:
+                placeholders = ",".join(["%s"] * len(recipe_ids))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", recipe_ids)
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, ingredients, instructions, notes) "
+                    f"VALUES (%s, %s, %s, %s, %s)",
+                    [(d.recipe_id, d.title, d.ingredients, d.instructions, d.notes) for d in docs],
+                )
+    return len(docs)
+
+
+def delete_search_documents(recipe_ids):
+    """The document rows cascade with the recipe; only the FTS5 mirror needs cleanup."""
+    recipe_ids = [int(r) for r in recipe_ids if r]
+    if recipe_ids and _vendor() == "sqlite" and _fts_available():
+        with connection.cursor() as cursor:
+            placeholders = ",".join(["%s"] * len(recipe_ids))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", recipe_ids)
+
+
+def schedule_search_refresh(recipe_id):
+    """
+    Queue a document rebuild for when the current transaction commits.
+    Several saves of one recipe inside the same atomic block (e.g. the edit
+    formsets) collapse into a single rebuild.
+    """
+    if not recipe_id:
+        return
+    pending = getattr(_pending, "ids", None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.add(recipe_id)
+    # every save registers a callback; the first one to run drains the set
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    ids = getattr(_pending, "ids", None) or set()
+    if ids:
+        _pending.ids = set()
+        refresh_search_documents(ids)
+
+
+def _fts_available():
+    # the table only appears through migration 0008: once found, remember it on the connection
+    if getattr(connection, "recipes_fts_available", False):
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        connection.recipes_fts_available = cursor.fetchone() is not None
+    return connection.recipes_fts_available
+
+##################### /DOCUMENT SYNC #####################
+#endregion
+
+
+#region QUERY
+##################### QUERY #####################
+
+def _fts_match_expression(query):
+    """Quote every token (FTS5 syntax is not user-safe) and allow prefix matches."""
+    tokens = [t.replace('"', '""') for t in query.split() if t.strip()]
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def search_recipes(user, query):
+    """
+    Return (recipe_id, rank) pairs visible to `user`, best match first.
+    On PostgreSQL this is a lazy queryset, so a Paginator only fetches one
+    page (COUNT + LIMIT/OFFSET). Only ids are returned so callers can
+    paginate before loading Recipe rows.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+    visible = Recipe.objects.visible_to(user).values("recipe_id")
+
+    if _vendor() == "postgresql":
+        ts_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        rows = (
+            RecipeSearchDocument.objects
+            .filter(vector=ts_query, recipe_id__in=visible)
+            .annotate(rank=SearchRank(F("vector"), ts_query))
+            .order_by("-rank", "-recipe_id")
+            .values_list("recipe_id", "rank")
+        )
+        return rows
+
+    if _vendor() == "sqlite" and _fts_available():
+        match = _fts_match_expression(query)
+        if not match:
+            return []
+        # the visibility filter runs inside the MATCH statement: one query
+        visible_sql, visible_params = visible.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({FTS_TABLE}, %s, %s, %s, %s) AS score "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({visible_sql}) ORDER BY score",
+                [*FTS_WEIGHTS, match, *visible_params],
+            )
+            return [(rid, -score) for rid, score in cursor.fetchall()]  # bm25: lower is better
+
+    # Fallback: unranked substring match on the denormalized document
+    return (
+        RecipeSearchDocument.objects
+        .filter(recipe_id__in=visible)
+        .filter(Q(title__icontains=query) | Q(ingredients__icontains=query)
+                | Q(instructions__icontains=query) | Q(notes__icontains=query))
+        .annotate(rank=Value(0.0, output_field=FloatField()))
+        .order_by("-recipe_id")
+        .values_list("recipe_id", "rank")
+    )
+
+##################### /QUERY #####################
+#endregion
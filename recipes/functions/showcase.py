@@ -0,0 +1,164 @@
+"""
+Home-page showcase pool.
+
+Instead of ORDER BY random() over all public recipes on every home-page load,
+a sample of up to SHOWCASE["POOL_SIZE"] eligible recipes (public, with an
+image) lives in the ShowcaseSlot table with dense slot numbers 0..n-1. The
+home page draws random slot numbers and loads those rows by primary key.
+
+- refresh_showcase_pool() resamples the whole pool (manage.py refresh_showcase,
+  run periodically, e.g. Heroku Scheduler);
+- sync_showcase(recipe_ids) adds/removes recipes whose eligibility changed, in
+  a fixed number of queries whatever the number of ids. Holes left by removed
+  recipes are refilled from the end of the pool so the numbering stays dense.
+- schedule_showcase_sync(recipe_ids) runs that after the current transaction
+  commits (Recipe signals, bulk visibility updates). Errors are only logged:
+  the showcase must never fail the save that triggered it.
+
+Writers serialize on a transaction-level advisory lock (PostgreSQL; SQLite
+already serializes writers), since slot numbers are computed from the pool.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, Max, Value, When
+
+from recipes.models import Recipe, ShowcaseSlot
+
+LOCK_ID = 7_315_001  # pg_advisory_xact_lock key of the showcase pool
+
+_pending = threading.local()
+
+
+def _pool_size():
+    return getattr(settings, "SHOWCASE", {}).get("POOL_SIZE", 500)
+
+
+def eligible_recipes():
+    return Recipe.objects.filter(visibility="public").exclude(image="").exclude(image__isnull=True)
+
+
+def _lock_pool():
+    """Hold the pool lock until the surrounding transaction ends."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_ID])
+
+
+def refresh_showcase_pool():
+    """Replace the pool with a fresh random sample; returns its size."""
+    ids = list(eligible_recipes().values_list("pk", flat=True))
+    sample = random.sample(ids, min(len(ids), _pool_size()))
+    with transaction.atomic():
+        _lock_pool()
+        ShowcaseSlot.objects.all().delete()
+        ShowcaseSlot.objects.bulk_create(
+            [ShowcaseSlot(slot=i, recipe_id=rid) for i, rid in enumerate(sample)]
+        )
+    return len(sample)
+
+
+def _compact(slots):
+    """Move the slots beyond len(slots) into the holes below it (one UPDATE)."""
+    n = len(slots)
+    taken = set(slots)
+    holes = [s for s in range(n) if s not in taken]
+    movers = [s for s in slots if s >= n]
+    if movers:
+        ShowcaseSlot.objects.filter(slot__in=movers).update(
+            slot=Case(*[When(slot=old, then=Value(new)) for old, new in zip(movers, holes)])
+        )
+
+
+def _add(recipe_ids, n):
+    """
+    Append to a dense pool of n slots; once it is full, the rest replace
+    random existing slots (keeps the sample fresh). One query each.
+    """
+    free = max(0, _pool_size() - n)
+    appended, overflow = recipe_ids[:free], recipe_ids[free:]
+    if appended:
+        ShowcaseSlot.objects.bulk_create(
+            [ShowcaseSlot(slot=n + i, recipe_id=rid) for i, rid in enumerate(appended)]
+        )
+    k = min(len(overflow), n)
+    if k:
+        replacements = dict(zip(random.sample(range(n), k), random.sample(overflow, k)))
+        ShowcaseSlot.objects.filter(slot__in=replacements).update(
+            recipe_id=Case(*[When(slot=slot, then=Value(rid)) for slot, rid in replacements.items()])
+        )
+
+
+def sync_showcase(recipe_ids, deleting=False):
+    """
+    Bring the pool in line with the current state of recipe_ids (one batch of
+    queries, whatever the number of ids). deleting=True removes them outright
+    and closes holes left by cascaded slot deletes.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    # common case (private/unchanged recipes, deleted recipes outside the pool): reads only, no lock
+    in_pool = set(ShowcaseSlot.objects.filter(recipe_id__in=recipe_ids).values_list("recipe_id", flat=True))
+    if deleting:
+        stats = ShowcaseSlot.objects.aggregate(n=Count("slot"), top=Max("slot"))
+        if not in_pool and stats["n"] == (-1 if stats["top"] is None else stats["top"]) + 1:
+            return
+    elif in_pool == set(eligible_recipes().filter(pk__in=recipe_ids).values_list("pk", flat=True)):
+        return
+
+    with transaction.atomic():
+        _lock_pool()
+        slots = dict(ShowcaseSlot.objects.values_list("recipe_id", "slot"))
+        eligible = set() if deleting else set(eligible_recipes().filter(pk__in=recipe_ids).values_list("pk", flat=True))
+        removed = {rid for rid in recipe_ids if rid in slots and rid not in eligible}
+        if removed:
+            ShowcaseSlot.objects.filter(recipe_id__in=removed).delete()
+        remaining = sorted(slot for rid, slot in slots.items() if rid not in removed)
+        _compact(remaining)
+        _add(sorted(eligible - slots.keys()), len(remaining))
+
+
+def schedule_showcase_sync(recipe_ids, deleting=False):
+    """
+    sync_showcase() once the current transaction commits. Several saves in
+    one atomic block collapse into one sync.
+    """
+    key = "deleted" if deleting else "ids"
+    pending = getattr(_pending, key, None)
+    if pending is None:
+        pending = set()
+        setattr(_pending, key, pending)
+    pending.update(rid for rid in recipe_ids if rid)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    ids = getattr(_pending, "ids", None) or set()
+    deleted = getattr(_pending, "deleted", None) or set()
+    _pending.ids, _pending.deleted = set(), set()
+    for batch, deleting in ((ids - deleted, False), (deleted, True)):
+        if not batch:
+            continue
+        try:
+            sync_showcase(batch, deleting=deleting)
+        except Exception as e:
+            print("⚠️ Could not update the showcase pool:", e)
+
+
+def draw_showcase(count=12):
+    """Up to `count` random showcase recipes (with owners), by primary key."""
+    top = ShowcaseSlot.objects.aggregate(m=Max("slot"))["m"]
+    if top is None:
+        # First use (fresh deploy): build the pool once, if there is anything to show.
+        if not eligible_recipes().exists() or not refresh_showcase_pool():
+            return []
+        top = ShowcaseSlot.objects.aggregate(m=Max("slot"))["m"]
+    slots = random.sample(range(top + 1), min(count, top + 1))
+    recipes = list(
+        eligible_recipes().filter(showcase_slot__slot__in=slots).select_related("user")
+    )
+    random.shuffle(recipes)
+    return recipes
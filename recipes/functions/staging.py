@@ -0,0 +1,152 @@
+import os
+import uuid
+import hashlib
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils import timezone
+
+#region UPLOAD STAGING
+##################### UPLOAD STAGING #####################
+#
+# Uploads for background imports are streamed to a staging store by the web
+# request and only small references are enqueued, instead of pickling the raw
+# bytes into the Redis job payload. The worker opens each blob lazily when it
+# needs it and deletes the whole batch when the job finishes or fails.
+#
+# settings.UPLOAD_STAGING["BACKEND"]:
+#   "storage" - the default file storage (S3 in production, MEDIA_ROOT locally),
+#               under the "staging/" prefix. Works across web and worker dynos.
+#   "local"   - a directory on local disk (UPLOAD_STAGING["PATH"]); only valid
+#               when web and worker share a filesystem.
+#
+# A reference looks like:
+#   {"key": "staging/<batch>/<sha256>", "sha256": str, "size": int,
+#    "name": str, "content_type": str}
+
+STAGING_PREFIX = "staging"
+CHUNK_SIZE = 1024 * 1024
+
+
+def _config():
+    return getattr(settings, "UPLOAD_STAGING", {})
+
+
+def staging_storage():
+    cfg = _config()
+    if cfg.get("BACKEND", "storage") == "local":
+        return FileSystemStorage(location=cfg.get("PATH") or os.path.join(tempfile.gettempdir(), "recipe_staging"))
+    return default_storage
+
+
+def new_batch_id():
+    """Blobs are grouped per job so one job's cleanup never removes another job's files."""
+    return uuid.uuid4().hex
+
+
+def stage_upload(uploaded_file, batch_id, name=None, content_type=None):
+    """
+    Stream one uploaded file (anything with .chunks() or .read()) into the
+    staging store and return its reference, or None for empty files. The key
+    is the SHA-256 of the content, so identical files in one batch are stored once.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.TemporaryFile() as tmp:
+        chunks = uploaded_file.chunks(CHUNK_SIZE) if hasattr(uploaded_file, "chunks") else iter(lambda: uploaded_file.read(CHUNK_SIZE), b"")
+        for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+            tmp.write(chunk)
+        if not size:
+            return None
+
+        storage = staging_storage()
+        key = f"{STAGING_PREFIX}/{batch_id}/{digest.hexdigest()}"
+        if not storage.exists(key):
+            tmp.seek(0)
+            saved = storage.save(key, File(tmp))
+            if saved != key:  # storage renamed it; keep whatever it actually wrote
+                key = saved
+
+    return {
+        "key": key,
+        "sha256": digest.hexdigest(),
+        "size": size,
+        "name": name if name is not None else getattr(uploaded_file, "name", "") or "",
+        "content_type": content_type if content_type is not None else getattr(uploaded_file, "content_type", "") or "",
+    }
+
+
+def stage_uploads(uploaded_files, batch_id=None):
+    """Stage a list of uploads for one job. Returns (batch_id, [refs])."""
+    batch_id = batch_id or new_batch_id()
+    refs = [ref for ref in (stage_upload(f, batch_id) for f in uploaded_files) if ref]
+    return batch_id, refs
+
+
+def read_staged(ref):
+    """Read a staged blob back into memory (only called when a job actually needs it)."""
+    with staging_storage().open(ref["key"], "rb") as fh:
+        data = fh.read()
+    if ref.get("sha256") and hashlib.sha256(data).hexdigest() != ref["sha256"]:
+        raise ValueError(f"Staged upload {ref['key']} is corrupt (checksum mismatch).")
+    return data
+
+
+class StagedFile:
+    """File-like wrapper that fetches a staged blob on first read()."""
+
+    def __init__(self, ref):
+        self.ref = ref
+        self.name = ref.get("name", "")
+        self.content_type = ref.get("content_type", "")
+
+    def read(self):
+        return read_staged(self.ref)
+
+
+def delete_staged(refs):
+    storage = staging_storage()
+    for ref in refs or []:
+        try:
+            storage.delete(ref["key"])
+        except Exception as e:
+            print(f"⚠️ Could not delete staged upload {ref.get('key')}: {e}")
+
+
+def purge_stale_staging(max_age_hours=24):
+    """
+    Delete staged blobs older than max_age_hours (jobs that never ran, e.g.
+    lost when Redis was flushed). Returns the number of files removed.
+    """
+    storage = staging_storage()
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    removed = 0
+    try:
+        batches, _ = storage.listdir(STAGING_PREFIX)
+    except (FileNotFoundError, OSError):
+        return 0
+    for batch in batches:
+        _, files = storage.listdir(f"{STAGING_PREFIX}/{batch}")
+        if not files and isinstance(storage, FileSystemStorage):
+            # Local disk keeps empty batch directories around after cleanup
+            try:
+                os.rmdir(storage.path(f"{STAGING_PREFIX}/{batch}"))
+            except OSError:
+                pass
+            continue
+        for name in files:
+            key = f"{STAGING_PREFIX}/{batch}/{name}"
+            try:
+                if storage.get_modified_time(key) < cutoff:
+                    storage.delete(key)
+                    removed += 1
+            except Exception as e:
+                print(f"⚠️ Could not inspect staged upload {key}: {e}")
+    return removed
+
+##################### UPLOAD STAGING #####################
+#endregion
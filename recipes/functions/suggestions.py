@@ -0,0 +1,182 @@
+"""
+Ingredient suggestion index (IngredientSuggestion rows per owner + visibility).
+
+All writes go through apply_suggestion_deltas(), which takes a dict of
+(user_id, visibility, normalized_name) -> +/- occurrences and applies it with
+one upsert for all additions plus two queries per (user, visibility) scope
+with removals. Signals in recipes.signals call it for single rows; bulk
+paths (imports, copies) call it once per batch.
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import Recipe, Ingredient, IngredientSuggestion, normalize_ingredient_name
+
+
+SUGGESTION_LIMIT = 20
+UPSERT_BATCH = 500  # rows per INSERT statement (4 parameters each)
+
+# Recipes whose child rows are being removed in bulk: the per-row Ingredient /
+# Instruction signals skip them and the caller applies one batched update.
+_skip = threading.local()
+
+
+def skipped_recipe_ids():
+    if not hasattr(_skip, "ids"):
+        _skip.ids = set()
+    return _skip.ids
+
+
+@contextmanager
+def skip_child_signals(recipe_ids):
+    ids = set(recipe_ids) - skipped_recipe_ids()
+    skipped_recipe_ids().update(ids)
+    try:
+        yield
+    finally:
+        skipped_recipe_ids().difference_update(ids)
+
+
+def apply_suggestion_deltas(deltas):
+    """
+    deltas: {(user_id, visibility, normalized_name): int}
+    Positive values add occurrences, negative values remove them; rows that
+    drop to zero are deleted.
+
+    Nothing is read first: additions are one INSERT ... ON CONFLICT DO UPDATE
+    that adds to the stored count (two transactions adding the same new name
+    both count), removals update the count in place.
+    """
+    added = {key: delta for key, delta in deltas.items() if delta > 0 and key[0] and key[2]}
+    removed = defaultdict(dict)
+    for (user_id, visibility, name), delta in deltas.items():
+        if delta < 0 and user_id and name:
+            removed[(user_id, visibility)][name] = -delta
+
+    with transaction.atomic():
+        if added:
+            _add_occurrences(added)
+        for (user_id, visibility), names in removed.items():
+            scope = IngredientSuggestion.objects.filter(user_id=user_id, visibility=visibility, name__in=list(names))
+            scope.update(occurrences=Greatest(
+                F("occurrences") - Case(*[When(name=name, then=Value(n)) for name, n in names.items()]),
+                Value(0),
+            ))
+            scope.filter(occurrences=0).delete()
+
+
+def _add_occurrences(added):
+    """Upsert {(user_id, visibility, name): n}, adding n to rows that already exist."""
+    qn = connection.ops.quote_name
+    table = qn(IngredientSuggestion._meta.db_table)
+    rows = [(user_id, visibility, name, n) for (user_id, visibility, name), n in added.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH):
+            batch = rows[start:start + UPSERT_BATCH]
+            cursor.execute(
+                f"INSERT INTO {table} ({qn('user_id')}, {qn('visibility')}, {qn('name')}, {qn('occurrences')}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({qn('user_id')}, {qn('visibility')}, {qn('name')}) "
+                f"DO UPDATE SET {qn('occurrences')} = {table}.{qn('occurrences')} + EXCLUDED.{qn('occurrences')}",
+                [value for row in batch for value in row],
+            )
+
+
+def suggestion_deltas_for(user_id, visibility, names, sign=1):
+    """Count normalized names into a deltas dict for one scope."""
+    counts = Counter(normalize_ingredient_name(n) for n in names)
+    return {(user_id, visibility, name): sign * n for name, n in counts.items() if name}
+
+
+def ingredient_suggestion_deltas(ingredients, sign=1):
+    """Deltas for unsaved/bulk-created Ingredient instances (uses their cached recipe)."""
+    counts = Counter()
+    for ing in ingredients:
+        name = normalize_ingredient_name(ing.name)
+        if name and ing.recipe is not None:
+            counts[(ing.recipe.user_id, ing.recipe.visibility, name)] += sign
+    return dict(counts)
+
+
+def add_recipe_suggestions(recipe, ingredients):
+    """Register freshly bulk-created ingredients (bulk_create does not send signals)."""
+    apply_suggestion_deltas(ingredient_suggestion_deltas(ingredients))
+
+
+def recipe_suggestion_deltas(recipe_ids, sign=1):
+    """Deltas for the ingredients currently stored on the given recipes (one query)."""
+    counts = Counter()
+    rows = Ingredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+        "recipe__user_id", "recipe__visibility", "name"
+    )
+    for user_id, visibility, name in rows:
+        name = normalize_ingredient_name(name)
+        if name:
+            counts[(user_id, visibility, name)] += sign
+    return dict(counts)
+
+
+def merge_deltas(*deltas):
+    merged = Counter()
+    for d in deltas:
+        merged.update(d)
+    return dict(merged)
+
+
+def move_recipe_suggestions(recipe, old_visibility, new_visibility):
+    """Move a recipe's ingredient names from one visibility scope to another."""
+    if old_visibility == new_visibility:
+        return
+    names = list(Ingredient.objects.filter(recipe=recipe).values_list("name", flat=True))
+    apply_suggestion_deltas(merge_deltas(
+        suggestion_deltas_for(recipe.user_id, old_visibility, names, sign=-1),
+        suggestion_deltas_for(recipe.user_id, new_visibility, names),
+    ))
+
+
+def rebuild_ingredient_suggestions(user_id=None):
+    """
+    Recompute the index from scratch (for one user, or everybody).
+    Normalization happens in Python so it matches the incremental path exactly
+    (SQLite's LOWER() only folds ASCII).
+    """
+    rows = Ingredient.objects.filter(recipe__isnull=False)
+    existing = IngredientSuggestion.objects.all()
+    if user_id is not None:
+        rows = rows.filter(recipe__user_id=user_id)
+        existing = existing.filter(user_id=user_id)
+
+    counts = Counter()
+    for owner_id, visibility, name in rows.values_list("recipe__user_id", "recipe__visibility", "name").iterator():
+        name = normalize_ingredient_name(name)
+        if name:
+            counts[(owner_id, visibility, name)] += 1
+
+    with transaction.atomic():
+        existing.delete()
+        IngredientSuggestion.objects.bulk_create(
+            [IngredientSuggestion(user_id=u, visibility=v, name=n, occurrences=c)
+             for (u, v, n), c in counts.items()],
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def suggest_ingredients(prefix, user_ids=None, visibilities=None, exclude_user_id=None, limit=SUGGESTION_LIMIT):
+    """Distinct normalized names starting with `prefix`, alphabetically, within a scope."""
+    prefix = normalize_ingredient_name(prefix)
+    if not prefix:
+        return []
+    qs = IngredientSuggestion.objects.filter(name__startswith=prefix)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    if visibilities is not None:
+        qs = qs.filter(visibility__in=visibilities)
+    if exclude_user_id is not None:
+        qs = qs.exclude(user_id=exclude_user_id)
+    return list(qs.order_by("name").values_list("name", flat=True).distinct()[:limit])
@@ -0,0 +1,302 @@
+"""
+Synthetic datasets for load testing (manage.py generate_dataset / loadtest_views).
+
+generate_dataset() adds users, a friendship graph and recipes with
+ingredients and instructions, written with bulk queries in batches. The
+denormalized tables the views read (ingredient suggestions, search
+documents, showcase pool, friend-graph cache) are maintained the same way
+the bulk import path does it, so list pages behave as they would on real data.
+
+Shape of the data:
+- Friendships by preferential attachment: every new user befriends a few
+  users, favouring those who already have many friends. That gives a handful
+  of well-connected users and a long tail, as in real social graphs.
+- Recipes per user follow a Pareto distribution (most users have a few,
+  some have hundreds).
+- Visibility is split VISIBILITY_MIX; public recipes reuse the stored image
+  of an existing recipe (if there is one) with probability PUBLIC_IMAGE_SHARE,
+  as copied recipes do, so the showcase pool has candidates.
+- Content is sampled from the recipe_data_import/ corpus when given, otherwise
+  from a small built-in vocabulary.
+
+All synthetic users are named USERNAME_PREFIX + number; purge_dataset()
+removes them with everything they own.
+
+generate_dataset() refuses to write unless the default database is a scratch
+one (SQLite, a test_* database, or a server on this machine): without
+DATABASE_URL the settings fall back to the production database, and public
+synthetic recipes would show up on the live site. allow_live=True (the
+commands' --i-know flag) overrides this.
+"""
+import random
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from accounts.friend_graph import invalidate_friend_graph
+from accounts.models import Friendship
+from recipes.models import (
+    ImportJob, Ingredient, IngredientSuggestion, Instruction, Recipe, RecipeSearchDocument, ShowcaseSlot,
+    normalize_ingredient_name,
+)
+from .search import delete_search_documents, refresh_search_documents
+from .showcase import refresh_showcase_pool
+from .suggestions import apply_suggestion_deltas, ingredient_suggestion_deltas
+
+USERNAME_PREFIX = "synth_"
+PASSWORD = "synthetic"
+VISIBILITY_MIX = (("private", 0.5), ("friends", 0.3), ("public", 0.2))
+PUBLIC_IMAGE_SHARE = 0.3
+PARETO_ALPHA = 1.2
+
+_DISHES = ("Curry", "Eintopf", "Salat", "Auflauf", "Suppe", "Bowl", "Pasta", "Risotto", "Kuchen", "Brot")
+_STYLES = ("Schneller", "Cremiger", "Scharfer", "Herbstlicher", "Veganer", "Omas", "Mediterraner", "Knuspriger")
+_INGREDIENTS = (
+    "Zwiebel", "Knoblauch", "Tomaten", "Kichererbsen", "Linsen", "Reis", "Spinat", "Karotten",
+    "Kokosmilch", "Olivenöl", "Salz", "Pfeffer", "Paprika", "Zucchini", "Mehl", "Hefe",
+    "Kartoffeln", "Sojasauce", "Ingwer", "Koriander", "Zitrone", "Haferflocken", "Tofu", "Nudeln",
+)
+_UNITS = ("g", "ml", "EL", "TL", "Stück", "Prise", "")
+LOCAL_HOSTS = ("", "localhost", "127.0.0.1", "::1")
+
+
+class LiveDatabaseError(ValueError):
+    pass
+
+
+#region CONTENT
+##################### CONTENT #####################
+
+def _vocabulary_recipe(rng):
+    names = rng.sample(_INGREDIENTS, rng.randint(5, 12))
+    return {
+        "title": f"{rng.choice(_STYLES)} {rng.choice(_DISHES)}",
+        "cook_time": rng.choice((10, 20, 30, 45, 60, 90)),
+        "portions": rng.randint(1, 6),
+        "ingredients": [{"category": "Zutaten", "items": [
+            {"name": n, "quantity": rng.choice((None, 0.5, 1, 2, 100, 250, 400)), "unit": rng.choice(_UNITS)}
+            for n in names
+        ]}],
+        "instructions": [f"<b>{n}</b> vorbereiten und dazugeben." for n in names[:rng.randint(3, 8)]],
+    }
+
+
+def _quantity(value):
+    try:
+        return float(str(value).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+def _children(recipe, content):
+    ingredients = [
+        Ingredient(
+            recipe=recipe,
+            category=block.get("category") or None,
+            name=item["name"].strip(),
+            normalized_name=normalize_ingredient_name(item["name"]),
+            quantity=_quantity(item.get("quantity")),
+            unit=item.get("unit") or None,
+        )
+        for block in content.get("ingredients") or []
+        for item in block.get("items") or []
+        if (item.get("name") or "").strip()
+    ]
+    instructions = [
+        Instruction(recipe_id=recipe, step_number=i, description=str(step))
+        for i, step in enumerate(content.get("instructions") or [], start=1)
+    ]
+    return ingredients, instructions
+
+##################### /CONTENT #####################
+#endregion
+
+
+#region GENERATE
+##################### GENERATE #####################
+
+def is_scratch_database(alias=DEFAULT_DB_ALIAS):
+    """SQLite, a test database, or a server on this machine (TCP loopback or unix socket)."""
+    connection = connections[alias]
+    if connection.vendor == "sqlite":
+        return True
+    name = str(connection.settings_dict.get("NAME") or "")
+    host = str(connection.settings_dict.get("HOST") or "")
+    return name.startswith("test_") or host in LOCAL_HOSTS or host.startswith("/")
+
+
+def ensure_scratch_database(allow_live=False, alias=DEFAULT_DB_ALIAS):
+    if allow_live or is_scratch_database(alias):
+        return
+    db = connections[alias].settings_dict
+    raise LiveDatabaseError(
+        f"Refusing to write synthetic data into {db.get('NAME')} on {db.get('HOST')}: not a local or test "
+        f"database. Point DATABASE_URL at a scratch database, or pass --i-know if this really is one."
+    )
+
+
+def synthetic_users():
+    return get_user_model().objects.filter(username__startswith=USERNAME_PREFIX)
+
+
+def _create_users(count, log):
+    User = get_user_model()
+    start = synthetic_users().count()
+    password = make_password(PASSWORD)  # hashed once: hashing per user would dominate the run
+    users = [
+        User(
+            username=f"{USERNAME_PREFIX}{start + i:06d}",
+            email=f"{USERNAME_PREFIX}{start + i:06d}@synthetic.local",
+            password=password,
+            is_verified=True,
+            verification_code=None,
+        )
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=1000)
+    ids = list(User.objects.filter(username__in=[u.username for u in users]).values_list("id", flat=True))
+    log(f"👥 {len(ids)} users created")
+    return ids
+
+
+def _befriend(new_ids, avg_friends, rng, log):
+    """Preferential attachment over all synthetic users; returns the number of friendships."""
+    existing = list(Friendship.objects.filter(
+        user__username__startswith=USERNAME_PREFIX, friend__username__startswith=USERNAME_PREFIX,
+    ).values_list("user_id", "friend_id"))
+    endpoints = [uid for pair in existing for uid in pair]   # a user appears once per friendship end
+    members = list(synthetic_users().exclude(id__in=new_ids).values_list("id", flat=True))
+    edges = {tuple(sorted(pair)) for pair in existing}
+    new_edges = set()
+
+    per_user = max(1, avg_friends // 2)  # each edge adds a friend to both sides
+    for uid in new_ids:
+        if members:
+            for _ in range(min(per_user, len(members))):
+                other = rng.choice(endpoints) if endpoints and rng.random() < 0.8 else rng.choice(members)
+                edge = tuple(sorted((uid, other)))
+                if other != uid and edge not in edges:
+                    edges.add(edge)
+                    new_edges.add(edge)
+                    endpoints.extend(edge)
+        members.append(uid)
+
+    Friendship.objects.bulk_create(
+        [Friendship(user_id=a, friend_id=b) for a, b in new_edges]
+        + [Friendship(user_id=b, friend_id=a) for a, b in new_edges],
+        batch_size=1000, ignore_conflicts=True,
+    )
+    # bulk_create sends no signals: drop the cached friend sets ourselves
+    invalidate_friend_graph(*{uid for edge in new_edges for uid in edge})
+    log(f"🤝 {len(new_edges)} friendships created")
+    return len(new_edges)
+
+
+def _owners(user_ids, count, rng):
+    weights = [rng.paretovariate(PARETO_ALPHA) for _ in user_ids]
+    return rng.choices(user_ids, weights=weights, k=count)
+
+
+def _write_recipes(owners, contents, images, rng):
+    recipes, plan = [], []
+    visibilities, shares = zip(*VISIBILITY_MIX)
+    for owner_id in owners:
+        content = rng.choice(contents) if contents else _vocabulary_recipe(rng)
+        recipe = Recipe(
+            user_id=owner_id,
+            title=(content.get("title") or "Rezept")[:255],
+            cook_time=int(_quantity(content.get("cook_time")) or 30),
+            portions=int(_quantity(content.get("portions")) or 2),
+            visibility=rng.choices(visibilities, weights=shares)[0],
+        )
+        if images and recipe.visibility == "public" and rng.random() < PUBLIC_IMAGE_SHARE:
+            recipe.image.name, recipe.image_variants = rng.choice(images)
+        recipes.append(recipe)
+        plan.append(content)
+
+    with transaction.atomic():
+        Recipe.objects.bulk_create(recipes)
+        ingredients, instructions = [], []
+        for recipe, content in zip(recipes, plan):
+            ings, steps = _children(recipe, content)
+            ingredients.extend(ings)
+            instructions.extend(steps)
+        Ingredient.objects.bulk_create(ingredients, batch_size=2000)
+        Instruction.objects.bulk_create(instructions, batch_size=2000)
+        apply_suggestion_deltas(ingredient_suggestion_deltas(ingredients))
+        refresh_search_documents([r.pk for r in recipes])
+    return len(ingredients), len(instructions)
+
+
+def generate_dataset(users=100, recipes=1000, avg_friends=8, contents=None, seed=None, batch_size=1000,
+                     log=print, allow_live=False):
+    """
+    Add `users` synthetic users (befriended among all synthetic users) and
+    `recipes` recipes spread over all synthetic users. contents: list of
+    recipe dicts in the import format to sample from (None: built-in words).
+    Returns counts of what was written. Raises LiveDatabaseError unless the
+    database is a scratch one or allow_live is set.
+    """
+    ensure_scratch_database(allow_live)
+    rng = random.Random(seed)
+    new_ids = _create_users(users, log) if users else []
+    friendships = _befriend(new_ids, avg_friends, rng, log) if new_ids else 0
+
+    user_ids = list(synthetic_users().values_list("id", flat=True))
+    if recipes and not user_ids:
+        raise ValueError("No synthetic users to own the recipes: generate users first.")
+    images = list(
+        Recipe.objects.exclude(image="").exclude(image__isnull=True)
+        .exclude(user__username__startswith=USERNAME_PREFIX)
+        .values_list("image", "image_variants").distinct()[:200]
+    )
+    owners = _owners(user_ids, recipes, rng)
+    totals = Counter()
+    for start in range(0, recipes, batch_size):
+        n_ings, n_steps = _write_recipes(owners[start:start + batch_size], contents, images, rng)
+        totals.update(recipes=len(owners[start:start + batch_size]), ingredients=n_ings, instructions=n_steps)
+        log(f"🍲 {totals['recipes']}/{recipes} recipes")
+
+    if images and recipes:
+        refresh_showcase_pool()
+    return {"users": len(new_ids), "friendships": friendships, **totals}
+
+##################### /GENERATE #####################
+#endregion
+
+
+#region PURGE
+##################### PURGE #####################
+
+def purge_dataset(batch_size=5000, log=print):
+    """
+    Delete all synthetic users and everything they own. Child rows go with
+    raw DELETEs: the per-row delete signals would cost several queries per
+    recipe, and the denormalized rows they maintain are removed here directly.
+    """
+    user_ids = list(synthetic_users().values_list("id", flat=True))
+    recipe_ids = list(Recipe.objects.filter(user_id__in=user_ids).values_list("pk", flat=True))
+    for start in range(0, len(recipe_ids), batch_size):
+        chunk = recipe_ids[start:start + batch_size]
+        with transaction.atomic():
+            Ingredient.objects.filter(linked_recipe_id__in=chunk).update(linked_recipe=None)
+            ImportJob.objects.filter(recipe_id__in=chunk).update(recipe=None)
+            for qs in (
+                ShowcaseSlot.objects.filter(recipe_id__in=chunk),
+                Ingredient.objects.filter(recipe_id__in=chunk),
+                Instruction.objects.filter(recipe_id__in=chunk),
+                RecipeSearchDocument.objects.filter(recipe_id__in=chunk),
+                Recipe.objects.filter(pk__in=chunk),
+            ):
+                qs._raw_delete(DEFAULT_DB_ALIAS)
+            delete_search_documents(chunk)
+        log(f"🧹 {min(start + batch_size, len(recipe_ids))}/{len(recipe_ids)} recipes removed")
+    IngredientSuggestion.objects.filter(user_id__in=user_ids).delete()
+    deleted = synthetic_users().delete()[1].get(get_user_model()._meta.label, 0)
+    invalidate_friend_graph(*user_ids)
+    return {"users": deleted, "recipes": len(recipe_ids)}
+
+##################### /PURGE #####################
+#endregion
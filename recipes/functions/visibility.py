@@ -0,0 +1,75 @@
+"""
+Set-based recipe visibility changes.
+
+bulk_set_visibility() replaces the get()+save() per recipe of the list page
+and the AJAX endpoint: the requested changes are grouped by target value and
+applied as one UPDATE ... WHERE user_id = ... AND recipe_id IN (...) per
+value. UPDATE does not send signals, so the work the Recipe signal handlers
+would do per save (ingredient-suggestion scopes, home showcase pool) runs
+here once for the whole batch.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from recipes.models import Recipe
+from .showcase import schedule_showcase_sync
+from .suggestions import apply_suggestion_deltas, merge_deltas, recipe_suggestion_deltas
+
+VISIBILITIES = {value for value, _ in Recipe.VISIBILITY_CHOICES}
+
+# per-id outcomes returned to the caller
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+NOT_FOUND = "not_found"      # no such recipe, or not owned by the user
+INVALID = "invalid"          # unknown visibility value or malformed id
+
+
+def bulk_set_visibility(user, changes):
+    """
+    Apply {recipe_id: visibility} for recipes owned by `user`.
+    Returns {recipe_id: outcome} with one entry per requested id.
+    """
+    outcomes, wanted = {}, {}
+    for raw_id, visibility in changes.items():
+        try:
+            rid = int(raw_id)
+        except (TypeError, ValueError):
+            outcomes[str(raw_id)] = INVALID
+            continue
+        if visibility not in VISIBILITIES:
+            outcomes[rid] = INVALID
+        else:
+            wanted[rid] = visibility
+    if not wanted:
+        return outcomes
+
+    with transaction.atomic():
+        current = dict(
+            Recipe.objects.select_for_update()
+            .filter(user=user, pk__in=wanted)
+            .values_list("pk", "visibility")
+        )
+        by_target = defaultdict(list)
+        for rid, visibility in wanted.items():
+            if rid not in current:
+                outcomes[rid] = NOT_FOUND
+            elif current[rid] == visibility:
+                outcomes[rid] = UNCHANGED
+            else:
+                by_target[visibility].append(rid)
+                outcomes[rid] = UPDATED
+
+        changed = [rid for ids in by_target.values() for rid in ids]
+        if changed:
+            removed = recipe_suggestion_deltas(changed, sign=-1)
+            for visibility, ids in by_target.items():
+                Recipe.objects.filter(user=user, pk__in=ids).update(visibility=visibility)
+            apply_suggestion_deltas(merge_deltas(removed, recipe_suggestion_deltas(changed)))
+            schedule_showcase_sync(changed)  # after commit, one batched sync
+    return outcomes
+
+
+def set_all_visibility(user, recipe_ids, visibility):
+    """'Set all selected to X' form of bulk_set_visibility()."""
+    return bulk_set_visibility(user, {rid: visibility for rid in recipe_ids})
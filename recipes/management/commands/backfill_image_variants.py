@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.models import Recipe
+from recipes.functions.image_variants import generate_recipe_image_variants, variants_current
+
+
+def _build(recipe, force):
+    try:
+        generate_recipe_image_variants(recipe, force=force)
+        return None
+    except Exception as e:
+        return str(e)
+    finally:
+        connections.close_all()  # thread-local connections of the pool threads
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the resized WebP/AVIF variants for existing recipe images. "
+        "Resumable: recipes whose variants are already current are skipped, so an "
+        "interrupted run can simply be started again (or continued with --after-id)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="Recipes loaded per query (default 100).")
+        parser.add_argument("--threads", type=int, default=4,
+                            help="Images processed concurrently (default 4).")
+        parser.add_argument("--after-id", type=int, default=0,
+                            help="Start after this recipe_id (printed as a checkpoint after every batch).")
+        parser.add_argument("--limit", type=int, default=0,
+                            help="Stop after this many recipes were processed (0 = no limit).")
+        parser.add_argument("--force", action="store_true",
+                            help="Rebuild variants even when they are current.")
+
+    def handle(self, *args, **opts):
+        last_id = opts["after_id"]
+        force = opts["force"]
+        built = skipped = failed = 0
+
+        base = Recipe.objects.exclude(image="").exclude(image__isnull=True).order_by("recipe_id")
+        with ThreadPoolExecutor(max_workers=max(1, opts["threads"])) as pool:
+            while True:
+                batch = list(base.filter(recipe_id__gt=last_id)[:opts["batch_size"]])
+                if not batch:
+                    break
+                todo = [r for r in batch if force or not variants_current(r)]
+                skipped += len(batch) - len(todo)
+                remaining = opts["limit"] - built - failed if opts["limit"] else None
+                reached_limit = remaining is not None and len(todo) >= remaining
+                if reached_limit:
+                    todo = todo[:remaining]
+
+                for recipe, error in zip(todo, pool.map(lambda r: _build(r, force), todo)):
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"⚠️ Recipe {recipe.pk}: {error}")
+                    else:
+                        built += 1
+
+                last_id = todo[-1].pk if reached_limit and todo else batch[-1].pk
+                self.stdout.write(f"🖼️ checkpoint --after-id {last_id}: built={built} skipped={skipped} failed={failed}")
+                if reached_limit:
+                    break
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Image variants: built {built}, already current {skipped}, failed {failed}."
+        ))
@@ -0,0 +1,93 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.functions.benchmark import SCENARIOS, run_isolated, run_meta, run_scenario, write_results
+
+COMPARED = (("latency_ms", "p50"), ("latency_ms", "p95"), ("throughput_per_s",), ("peak_rss_mb",), ("queries_per_item",))
+
+
+def _get(result, path):
+    for key in path:
+        result = (result or {}).get(key)
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the import pipeline offline: replays the recipe_data_import/ corpus through stubbed "
+        "OpenAI/scraper/HTTP clients and writes latency, throughput and peak RSS per entry point as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", default=str(Path(settings.BASE_DIR) / "recipe_data_import"),
+                            help="Folder of per-user recipe_data.json files (the recorded LLM output).")
+        parser.add_argument("--images", default=str(Path(settings.BASE_DIR) / "recipe_images"),
+                            help="Folder of sample photos used as uploads, scraped images and PDF/DOCX figures.")
+        parser.add_argument("--iterations", type=int, default=5, help="Measured runs per scenario.")
+        parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs per scenario before timing.")
+        parser.add_argument("--only", action="append", default=[],
+                            help="Run scenarios whose name starts with this prefix (repeatable), e.g. --only task. --only image.crop")
+        parser.add_argument("--output", default=None,
+                            help="Result file (default: bench_results/<timestamp>-<commit>.json).")
+        parser.add_argument("--llm-latency-ms", type=int, default=0,
+                            help="Simulated latency per stubbed OpenAI call (0 = measure our own overhead only).")
+        parser.add_argument("--rembg", choices=("auto", "real", "stub"), default="auto",
+                            help="auto: real rembg if its model is already downloaded, else a pass-through stub.")
+        parser.add_argument("--no-isolate", action="store_true",
+                            help="Run scenarios in this process (peak RSS then accumulates across scenarios).")
+        parser.add_argument("--compare", default=None, help="Earlier result file to print deltas against.")
+
+    def handle(self, *args, **opts):
+        for folder in (opts["corpus"], opts["images"]):
+            if not Path(folder).is_dir():
+                raise CommandError(f"Folder not found: {folder}")
+        names = [n for n in SCENARIOS if not opts["only"] or any(n.startswith(p) for p in opts["only"])]
+        if not names:
+            raise CommandError(f"No scenario matches {opts['only']}. Known: {', '.join(SCENARIOS)}")
+
+        results = {}
+        for name in names:
+            self.stdout.write(f"⏱️ {name} ...")
+            result = run_isolated(lambda: run_scenario(
+                name, opts["corpus"], opts["images"], max(1, opts["iterations"]), max(0, opts["warmup"]),
+                llm_latency_ms=opts["llm_latency_ms"], rembg=opts["rembg"],
+            ), isolate=not opts["no_isolate"])
+            results[name] = result
+            if "error" in result:
+                self.stdout.write(self.style.ERROR(f"   ❌ {result['error']}"))
+            else:
+                lat = result["latency_ms"]
+                self.stdout.write(
+                    f"   p50 {lat['p50']} ms · p95 {lat['p95']} ms · {result['throughput_per_s']}/s · "
+                    f"{result['queries_per_item']} queries/item · peak RSS {result['peak_rss_mb']} MB"
+                )
+
+        report = {
+            "meta": run_meta({k: opts[k] for k in ("iterations", "warmup", "llm_latency_ms", "rembg", "no_isolate")}),
+            "scenarios": results,
+        }
+        output = write_results(report, opts["output"])
+        self.stdout.write(self.style.SUCCESS(f"📊 Results written to {output}"))
+
+        if opts["compare"]:
+            self._compare(opts["compare"], report)
+
+    def _compare(self, path, report):
+        try:
+            old = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        self.stdout.write(f"\nΔ against {old['meta'].get('commit')} ({path}):")
+        for name, result in report["scenarios"].items():
+            before = old.get("scenarios", {}).get(name)
+            if not before or "error" in result or "error" in before:
+                continue
+            parts = []
+            for metric in COMPARED:
+                a, b = _get(before, metric), _get(result, metric)
+                if a and b is not None:
+                    parts.append(f"{'.'.join(metric)} {a} → {b} ({(b - a) / a * 100:+.1f}%)")
+            self.stdout.write(f"  {name}: " + " · ".join(parts))
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.functions.benchmark import load_cases
+from recipes.functions.synthetic import USERNAME_PREFIX, generate_dataset, purge_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        f"Generate synthetic users ({USERNAME_PREFIX}*), friendships and recipes with bulk inserts for load "
+        "testing. Runs against the configured database, which must be local or a test database unless --i-know "
+        "is given; --purge removes them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100, help="Users to add.")
+        parser.add_argument("--recipes", type=int, default=1000, help="Recipes to add, spread over all synthetic users.")
+        parser.add_argument("--avg-friends", type=int, default=8, help="Average number of friends per new user.")
+        parser.add_argument("--corpus", nargs="?", const=str(Path(settings.BASE_DIR) / "recipe_data_import"),
+                            default=None,
+                            help="Sample recipe content from this recipe_data_import/-style folder "
+                                 "(default folder if given without a value; built-in words otherwise).")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for a reproducible dataset.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Recipes written per transaction.")
+        parser.add_argument("--purge", action="store_true", help="Delete all synthetic users and their recipes instead.")
+        parser.add_argument("--i-know", action="store_true",
+                            help="Write even though the database is not local or a test database.")
+
+    def handle(self, *args, **opts):
+        log = self.stdout.write
+        if opts["purge"]:
+            removed = purge_dataset(log=log)
+            self.stdout.write(self.style.SUCCESS(
+                f"🧹 Removed {removed['users']} synthetic user(s) and {removed['recipes']} recipe(s)."
+            ))
+            return
+
+        contents = None
+        if opts["corpus"]:
+            if not Path(opts["corpus"]).is_dir():
+                raise CommandError(f"Corpus folder not found: {opts['corpus']}")
+            contents = load_cases(opts["corpus"])
+
+        try:
+            written = generate_dataset(
+                users=max(0, opts["users"]), recipes=max(0, opts["recipes"]), avg_friends=max(0, opts["avg_friends"]),
+                contents=contents, seed=opts["seed"], batch_size=max(1, opts["batch_size"]), log=log,
+                allow_live=opts["i_know"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {written['users']} users, {written['friendships']} friendships, {written.get('recipes', 0)} recipes, "
+            f"{written.get('ingredients', 0)} ingredients, {written.get('instructions', 0)} instructions written."
+        ))
@@ -1,16 +1,30 @@
 # yourapp/management/commands/import_recipes.py
 import json
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from django.core.files import File
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import connections, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 
 
-from recipes.models import Recipe, Ingredient, Instruction
+from recipes.models import Recipe, Ingredient, Instruction, normalize_ingredient_name
+from recipes.functions.suggestions import (
+    apply_suggestion_deltas,
+    ingredient_suggestion_deltas,
+    merge_deltas,
+    recipe_suggestion_deltas,
+    skip_child_signals,
+)
+from recipes.functions.search import refresh_search_documents
+from recipes.functions.pdf_export import schedule_pdf_invalidation
+from recipes.functions.image_variants import create_image_variants
  
 
 INT_RE = re.compile(r"\d+")
@@ -34,6 +48,341 @@ def parse_float_or_none(value):
         return None
     return float(m.group(0).replace(",", "."))
 
+
+#region FAST IMPORT HELPERS
+##################### FAST IMPORT HELPERS #####################
+
+def iter_json_array(path, chunk_size=64 * 1024):
+    """
+    Stream the elements of a top-level JSON array one at a time, so a large
+    recipe_data.json never has to be held in memory as a whole.
+    Only the current element (plus one read chunk) is buffered.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        eof = False
+        started = False
+
+        def fill():
+            nonlocal buf, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf += chunk
+
+        while True:
+            buf = buf.lstrip()
+            if not buf:
+                if eof:
+                    raise json.JSONDecodeError("Unexpected end of file", "", 0)
+                fill()
+                continue
+
+            if not started:
+                if buf[0] != "[":
+                    raise json.JSONDecodeError("Expected a JSON array", buf, 0)
+                buf = buf[1:]
+                started = True
+                continue
+
+            if buf[0] == "]":
+                return
+            if buf[0] == ",":
+                buf = buf[1:]
+                continue
+
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # a bare scalar at the very end of the buffer may still be incomplete
+            if end == len(buf) and not eof:
+                fill()
+                continue
+            buf = buf[end:]
+            yield obj
+
+
+class ImportCheckpoint:
+    """
+    Append-only JSON-lines log of committed batches: {"user": ..., "next": n, "done": bool}.
+    Lines are tiny and written with O_APPEND, so parallel worker processes can
+    share one file. On restart the highest `next` index per user wins.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path) if path else None
+        self.state = {}
+        if self.path and self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+                    prev = self.state.get(entry["user"], {"next": 0, "done": False})
+                    self.state[entry["user"]] = {
+                        "next": max(prev["next"], entry.get("next", 0)),
+                        "done": prev["done"] or entry.get("done", False),
+                    }
+
+    def resume_index(self, username):
+        return self.state.get(username, {}).get("next", 0)
+
+    def is_done(self, username):
+        return self.state.get(username, {}).get("done", False)
+
+    def record(self, username, next_index, done=False):
+        if not self.path:
+            return
+        line = json.dumps({"user": username, "next": next_index, "done": done}) + "\n"
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+def _resolve_image_path(user_dir, image_path):
+    """Local path preferred: absolute first, then relative to the user's folder."""
+    if not image_path:
+        return None
+    p = Path(image_path)
+    if not p.exists():
+        rel_try = user_dir / Path(image_path.strip("/"))
+        if rel_try.exists():
+            p = rel_try
+    if p.exists() and p.is_file():
+        return p
+    return None
+
+
+def _upload_image(image_file):
+    """
+    Store one image through the Recipe.image storage and build its resized
+    variants from the local file; returns (stored name, variants manifest).
+    """
+    field = Recipe._meta.get_field("image")
+    name = field.generate_filename(None, image_file.name.split("/")[-1])
+    with image_file.open("rb") as fp:
+        name = field.storage.save(name, File(fp), max_length=field.max_length)
+    try:
+        with image_file.open("rb") as fp:
+            variants = create_image_variants(field.storage, name, fp)
+    except Exception as e:
+        print(f"⚠️ Could not build image variants for {image_file}: {e}")
+        variants = {}
+    return name, variants
+
+
+def _build_children(recipe, rec):
+    """Same mapping as the row-by-row path, but returns unsaved model instances."""
+    ingredients = []
+    for block in rec.get("ingredients", []) or []:
+        category = block.get("category")
+        for item in block.get("items", []) or []:
+            name = (item.get("name") or "").strip()
+            if not name:
+                continue
+            ingredients.append(Ingredient(
+                recipe=recipe,
+                category=category or None,
+                name=name,
+                normalized_name=normalize_ingredient_name(name),
+                quantity=parse_float_or_none(item.get("quantity")),
+                unit=(item.get("unit") or None) or None,
+            ))
+
+    instructions = [
+        Instruction(recipe_id=recipe, step_number=idx, description=str(step))
+        for idx, step in enumerate(rec.get("instructions", []) or [], start=1)
+        if step is not None
+    ]
+    return ingredients, instructions
+
+
+def _write_batch(user, batch, existing, image_pool):
+    """
+    Persist one batch of parsed recipes: images are uploaded concurrently first,
+    then recipes and children are written with bulk queries in one transaction.
+    Returns (created, updated).
+    """
+    uploads = {
+        image_pool.submit(_upload_image, image_file): idx
+        for idx, (_, _, image_file) in enumerate(batch) if image_file
+    }
+    stored_images = {}
+    for future in as_completed(uploads):
+        stored_images[uploads[future]] = future.result()
+
+    to_update = [existing[title] for title, _, _ in batch if title in existing]
+    current = Recipe.objects.in_bulk(to_update) if to_update else {}
+
+    new_recipes, updated_recipes, children = [], [], []
+    now = timezone.now()
+    with transaction.atomic():
+        for idx, (title, rec, _) in enumerate(batch):
+            fields = {
+                "cook_time": parse_int(rec.get("cook_time"), default=0),
+                "portions": parse_int(rec.get("portions"), default=0),
+                "notes": rec.get("notes") or None,
+            }
+            if title in existing:
+                recipe = current[existing[title]]
+                for key, value in fields.items():
+                    setattr(recipe, key, value)
+                recipe.updated_at = now  # bulk_update skips auto_now; the PDF artifact key depends on it
+                if idx in stored_images:
+                    recipe.image.name, recipe.image_variants = stored_images[idx]
+                updated_recipes.append(recipe)
+            else:
+                recipe = Recipe(user=user, title=title, **fields)
+                if idx in stored_images:
+                    recipe.image.name, recipe.image_variants = stored_images[idx]
+                new_recipes.append(recipe)
+            children.append((recipe, rec))
+
+        removed = {}
+        if updated_recipes:
+            Recipe.objects.bulk_update(
+                updated_recipes, ["cook_time", "portions", "notes", "image", "image_variants", "updated_at"]
+            )
+            for recipe in updated_recipes:
+                schedule_pdf_invalidation(recipe.pk)
+            # clear children to re-sync (suggestion index updated once below)
+            removed = recipe_suggestion_deltas([r.pk for r in updated_recipes], sign=-1)
+            with skip_child_signals([r.pk for r in updated_recipes]):
+                Ingredient.objects.filter(recipe__in=updated_recipes).delete()
+                Instruction.objects.filter(recipe_id__in=updated_recipes).delete()
+        Recipe.objects.bulk_create(new_recipes)
+
+        ingredients, instructions = [], []
+        for recipe, rec in children:
+            ings, steps = _build_children(recipe, rec)
+            ingredients.extend(ings)
+            instructions.extend(steps)
+        Ingredient.objects.bulk_create(ingredients)
+        Instruction.objects.bulk_create(instructions)
+
+        apply_suggestion_deltas(merge_deltas(removed, ingredient_suggestion_deltas(ingredients)))
+        refresh_search_documents([recipe.pk for recipe, _ in children])
+
+    for recipe in new_recipes:
+        existing[recipe.title] = recipe.recipe_id
+    return len(new_recipes), len(updated_recipes)
+
+
+def _worker_init():
+    """Run in each worker process: make sure Django is ready and drop inherited DB connections."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def import_user_folder(user_dir, options):
+    """
+    Fast-path import of one user folder. Runs in the parent or in a worker
+    process and returns a summary dict (plus log lines for the parent to print).
+    """
+    user_dir = Path(user_dir)
+    username = user_dir.name
+    json_path = user_dir / "recipe_data.json"
+    summary = {"user": username, "created": 0, "updated": 0, "skipped": 0, "log": []}
+    log = summary["log"]
+
+    checkpoint = ImportCheckpoint(options["checkpoint"])
+    if checkpoint.is_done(username):
+        log.append(("NOTICE", f"[{username}] already imported (checkpoint), skipping"))
+        return summary
+    start_at = checkpoint.resume_index(username)
+
+    User = get_user_model()
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        if not options["create_missing_users"]:
+            log.append(("ERROR", f"[{username}] user not found. Use --create-missing-users to auto-create."))
+            return summary
+        fake_email = f"{username.lower()}@import.local"
+        temp_password = "1234"
+        user = User.objects.create_user(
+            username=username,
+            email=fake_email,
+            password=temp_password,
+            is_verified=True,
+            verification_code=None,
+        )
+        log.append(("SUCCESS", f"[{username}] created user | email: {fake_email} | password: {temp_password}"))
+
+    # one query instead of one filter(user, title).first() per recipe
+    existing = dict(Recipe.objects.filter(user=user).values_list("title", "recipe_id"))
+
+    if start_at:
+        log.append(("NOTICE", f"[{username}] resuming at recipe #{start_at}"))
+
+    batch_size = options["batch_size"]
+    batch = []
+    index = -1
+    with ThreadPoolExecutor(max_workers=options["image_threads"]) as image_pool:
+        def flush(next_index):
+            if not batch:
+                return
+            created, updated = _write_batch(user, batch, existing, image_pool)
+            summary["created"] += created
+            summary["updated"] += updated
+            checkpoint.record(username, next_index)
+            batch.clear()
+
+        try:
+            for index, rec in enumerate(iter_json_array(json_path)):
+                if index < start_at:
+                    continue
+                title = (rec.get("title") or "").strip()
+                if not title:
+                    log.append(("WARNING", f"[{username}] recipe missing title, skipping"))
+                    summary["skipped"] += 1
+                    continue
+                queued = any(title == t for t, _, _ in batch)
+                if (title in existing or queued) and not options["update"]:
+                    summary["skipped"] += 1
+                    continue
+                if queued:
+                    # duplicate title within the same batch: write what we have first
+                    flush(index)
+                if options["dry_run"]:
+                    log.append(("", f"[DRY] {username} :: {title} (+ingredients +instructions)"))
+                    continue
+                batch.append((title, rec, _resolve_image_path(user_dir, rec.get("image_path") or "")))
+                if len(batch) >= batch_size:
+                    flush(index + 1)
+            flush(index + 1)
+        except json.JSONDecodeError as e:
+            log.append(("ERROR", f"[{username}] JSON error: {e}"))
+            return summary
+
+    if not options["dry_run"]:
+        checkpoint.record(username, index + 1, done=True)
+    log.append(("SUCCESS", f"[{username}] done ({summary['created']} created, "
+                           f"{summary['updated']} updated, {summary['skipped']} skipped)"))
+    return summary
+
+
+def _import_user_folder_in_worker(user_dir, options):
+    try:
+        return import_user_folder(user_dir, options)
+    finally:
+        connections.close_all()
+
+##################### /FAST IMPORT HELPERS #####################
+#endregion
+
+
 class Command(BaseCommand):
     help = "Import recipes from legacy JSON per-user folders into Django models."
 
@@ -54,12 +403,51 @@ class Command(BaseCommand):
             action="store_true",
             help="Parse and report what would be imported without writing to DB.",
         )
+        parser.add_argument(
+            "--fast",
+            action="store_true",
+            help="High-throughput mode: streaming JSON, bulk inserts, concurrent image uploads.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="(--fast) Number of worker processes; user folders are imported in parallel.",
+        )
+        parser.add_argument(
+            "--image-threads",
+            type=int,
+            default=8,
+            help="(--fast) Threads per worker used to upload images to storage.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="(--fast) Recipes written per transaction / checkpoint step.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=None,
+            help="(--fast) Checkpoint file; an interrupted import resumes from it on the next run.",
+        )
 
     def handle(self, base_folder, update, create_missing_users, dry_run, *args, **opts):
         base = Path(base_folder).expanduser().resolve()
         if not base.exists():
             raise CommandError(f"Base folder not found: {base}")
 
+        if opts.get("fast"):
+            return self.handle_fast(base, {
+                "update": update,
+                "create_missing_users": create_missing_users,
+                "dry_run": dry_run,
+                "image_threads": max(1, opts["image_threads"]),
+                "batch_size": max(1, opts["batch_size"]),
+                "checkpoint": opts["checkpoint"],
+            }, workers=max(1, opts["workers"]))
+
         User = get_user_model()
         total_created = total_updated = total_skipped = 0
 
@@ -204,3 +592,47 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(
             f"Created: {total_created}, Updated: {total_updated}, Skipped: {total_skipped}"
         ))
+
+    def _write_log(self, summary):
+        for level, message in summary["log"]:
+            style = getattr(self.style, level, None) if level else None
+            self.stdout.write(style(message) if style else message)
+
+    def handle_fast(self, base, options, workers=1):
+        started = time.perf_counter()
+        user_dirs = sorted(
+            str(p) for p in base.iterdir()
+            if p.is_dir() and (p / "recipe_data.json").exists()
+        )
+        summaries = []
+
+        if workers == 1 or len(user_dirs) <= 1:
+            for user_dir in user_dirs:
+                summary = import_user_folder(user_dir, options)
+                self._write_log(summary)
+                summaries.append(summary)
+        else:
+            # child processes must open their own DB connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+                futures = {
+                    pool.submit(_import_user_folder_in_worker, user_dir, options): user_dir
+                    for user_dir in user_dirs
+                }
+                for future in as_completed(futures):
+                    try:
+                        summary = future.result()
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f"[{Path(futures[future]).name}] failed: {e}"))
+                        continue
+                    self._write_log(summary)
+                    summaries.append(summary)
+
+        elapsed = time.perf_counter() - started
+        created = sum(s["created"] for s in summaries)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created: {created}, "
+            f"Updated: {sum(s['updated'] for s in summaries)}, "
+            f"Skipped: {sum(s['skipped'] for s in summaries)} "
+            f"in {elapsed:.1f}s ({created / elapsed if elapsed else 0:.1f} recipes/s)"
+        ))
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.functions.benchmark import load_cases, run_meta, write_results
+from recipes.functions.loadtest import run_at_scale
+from recipes.functions.synthetic import LiveDatabaseError, ensure_scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test home, recipe_list, public_recipes, friends_recipes, recipe_detail and search with the test "
+        "client at growing synthetic dataset sizes; reports req/s and queries/request as JSON. Adds synthetic "
+        "data to the configured database, which must be local or a test database unless --i-know is given "
+        "(remove the data with generate_dataset --purge)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="1000,10000,100000",
+                            help="Comma-separated synthetic recipe counts to test at, smallest first.")
+        parser.add_argument("--requests", type=int, default=20, help="Measured requests per scenario and scale.")
+        parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests per scenario first.")
+        parser.add_argument("--only", action="append", default=[], help="Scenario name prefix to run (repeatable).")
+        parser.add_argument("--corpus", nargs="?", const=str(Path(settings.BASE_DIR) / "recipe_data_import"),
+                            default=None, help="Sample recipe content from this corpus folder (see generate_dataset).")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for the generated data.")
+        parser.add_argument("--i-know", action="store_true",
+                            help="Write synthetic data even though the database is not local or a test database.")
+        parser.add_argument("--output", default=None,
+                            help="Result file (default: bench_results/loadtest-<timestamp>-<commit>.json).")
+
+    def handle(self, *args, **opts):
+        try:
+            scales = sorted({int(s) for s in opts["scales"].split(",") if s.strip()})
+        except ValueError:
+            raise CommandError(f"--scales must be comma-separated integers, got {opts['scales']!r}")
+        try:
+            ensure_scratch_database(opts["i_know"])
+        except LiveDatabaseError as e:
+            raise CommandError(str(e))
+        contents = load_cases(opts["corpus"]) if opts["corpus"] else None
+
+        results = {}
+        for scale in scales:
+            self.stdout.write(f"📈 {scale} recipes")
+            results[str(scale)] = run_at_scale(
+                scale, requests=max(1, opts["requests"]), warmup=max(0, opts["warmup"]), only=opts["only"],
+                contents=contents, seed=opts["seed"], log=self.stdout.write, allow_live=opts["i_know"],
+            )
+
+        report = {
+            "meta": run_meta({k: opts[k] for k in ("scales", "requests", "warmup", "only", "seed")}),
+            "scales": results,
+        }
+        output = write_results(report, opts["output"], prefix="loadtest-")
+        self.stdout.write(self.style.SUCCESS(f"📊 Results written to {output}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.functions.cookbook import EXPORT_TTL_HOURS, purge_stale_exports
+
+
+class Command(BaseCommand):
+    help = "Delete cookbook exports whose download has expired (run periodically, e.g. Heroku Scheduler)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age-hours", type=int, default=EXPORT_TTL_HOURS,
+                            help=f"Only delete exports older than this many hours (default {EXPORT_TTL_HOURS}).")
+
+    def handle(self, *args, **opts):
+        removed = purge_stale_exports(opts["max_age_hours"])
+        self.stdout.write(self.style.SUCCESS(f"🧹 Removed {removed} expired cookbook export(s)."))
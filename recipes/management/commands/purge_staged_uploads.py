@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.functions.staging import purge_stale_staging
+
+
+class Command(BaseCommand):
+    help = "Delete staged import uploads whose job never picked them up (run periodically, e.g. Heroku Scheduler)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age-hours", type=int, default=24,
+                            help="Only delete staged files older than this many hours (default 24).")
+
+    def handle(self, *args, **opts):
+        removed = purge_stale_staging(opts["max_age_hours"])
+        self.stdout.write(self.style.SUCCESS(f"🧹 Removed {removed} stale staged upload(s)."))
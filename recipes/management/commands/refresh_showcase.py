@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.functions.showcase import refresh_showcase_pool
+
+
+class Command(BaseCommand):
+    help = "Resample the home-page showcase pool from all public recipes with an image (run periodically, e.g. Heroku Scheduler)."
+
+    def handle(self, *args, **opts):
+        size = refresh_showcase_pool()
+        self.stdout.write(self.style.SUCCESS(f"🎲 Showcase pool refreshed with {size} recipe(s)."))
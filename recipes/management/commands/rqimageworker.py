@@ -0,0 +1,108 @@
+import os
+import signal
+import time
+
+import django_rq
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.functions.data_acquisition import warm_up_rembg, REMBG_MODEL
+
+RESPAWN_DELAY = 1  # seconds before replacing a crashed child, so a crash loop doesn't spin
+
+
+class Command(BaseCommand):
+    help = (
+        "RQ worker for image/document imports. Loads the rembg model once at start, "
+        "then (optionally) forks several workers that share the loaded model pages "
+        "copy-on-write and are restarted if they crash. Text/URL imports stay on the "
+        "plain `rqworker default`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("queues", nargs="*",
+                            help="Queues to listen on (default: settings.IMAGE_QUEUE_NAME).")
+        parser.add_argument("--processes", type=int, default=int(os.getenv("IMAGE_WORKER_PROCESSES", "1")),
+                            help="Worker processes to fork after the model is loaded (default 1, no fork).")
+        parser.add_argument("--worker-class", default="rq.Worker",
+                            help="RQ worker class. rq.Worker forks a work horse per job, which also "
+                                 "inherits the preloaded model; rq.SimpleWorker runs jobs in-process; "
+                                 "recipes.workers.ConnectionReusingWorker runs them in-process and keeps "
+                                 "the database connection between jobs.")
+        parser.add_argument("--no-preload", action="store_true",
+                            help="Skip loading rembg at start (jobs load it lazily as before).")
+        parser.add_argument("--burst", action="store_true",
+                            help="Exit once the queues are empty.")
+
+    def handle(self, *args, **opts):
+        queues = opts["queues"] or [settings.IMAGE_QUEUE_NAME]
+
+        if not opts["no_preload"]:
+            t0 = time.perf_counter()
+            warm_up_rembg()
+            self.stdout.write(f"🔥 rembg '{REMBG_MODEL}' preloaded in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        # Never hand an open DB socket to forked children.
+        connections.close_all()
+
+        processes = max(1, opts["processes"])
+        if processes == 1:
+            self._work(queues, opts)
+            return
+
+        children = set()
+        stopping = False
+
+        def _forward(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for pid in children:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGTERM, _forward)
+        signal.signal(signal.SIGINT, _forward)
+
+        for _ in range(processes):
+            children.add(self._spawn(queues, opts))
+        self.stdout.write(f"👷 Forked {processes} image workers on {', '.join(queues)}: {sorted(children)}")
+
+        # A child that crashes (or is OOM-killed) is replaced so the group keeps
+        # its size; clean exits (--burst, or a stop signal) are not.
+        while children:
+            try:
+                pid, status = os.wait()
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if code == 0 or stopping:
+                continue
+            self.stderr.write(f"💥 Image worker {pid} exited with {code}; restarting in {RESPAWN_DELAY}s")
+            time.sleep(RESPAWN_DELAY)
+            if not stopping:
+                children.add(self._spawn(queues, opts))
+
+    def _spawn(self, queues, opts):
+        pid = os.fork()
+        if pid == 0:
+            # drop the parent's forwarding handlers; the RQ worker installs its own
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                self._work(queues, opts)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        return pid
+
+    def _work(self, queues, opts):
+        worker = django_rq.get_worker(*queues, worker_class=opts["worker_class"])
+        worker.work(burst=opts["burst"], with_scheduler=False)
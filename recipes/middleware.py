@@ -0,0 +1,88 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .functions.metrics import DB_QUERIES, HTTP_SECONDS, N_PLUS_ONE, span, trace_context
+from .functions.query_budget import check_request, inspect_queries, inspector_enabled
+
+
+class MetricsMiddleware:
+    """
+    Times every request into http_request_duration_seconds (labelled by URL
+    name, not path, to keep the series count bounded) and runs it as one
+    trace, so spans opened by views show up under it in the trace log.
+    Works under WSGI and ASGI without an extra sync/async hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _observe(self, request, response, t0):
+        match = getattr(request, "resolver_match", None)
+        HTTP_SECONDS.observe(
+            time.perf_counter() - t0,
+            view=(match.view_name if match else "unmatched"),
+            method=request.method,
+            status=f"{response.status_code // 100}xx",
+        )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        t0 = time.perf_counter()
+        with trace_context(), span("http " + request.method):
+            response = self.get_response(request)
+        self._observe(request, response, t0)
+        return response
+
+    async def __acall__(self, request):
+        t0 = time.perf_counter()
+        with trace_context(), span("http " + request.method):
+            response = await self.get_response(request)
+        self._observe(request, response, t0)
+        return response
+
+
+class QueryInspectorMiddleware:
+    """
+    Counts the SQL queries and their time per request (X-DB-Queries and
+    X-DB-Time-ms response headers, http_request_db_queries metric) and logs
+    requests that exceed their view's @query_budget or repeat one SQL shape
+    N+1-style (see functions/query_budget.py). Async views (the SSE stream)
+    pass through uninspected: their queries run on other threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not inspector_enabled():
+            return self.get_response(request)
+        with inspect_queries() as log:
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unmatched"
+        response["X-DB-Queries"] = str(log.count)
+        response["X-DB-Time-ms"] = f"{log.time_ms:.1f}"
+        DB_QUERIES.observe(log.count, view=view_name)
+        if log.repeated():
+            N_PLUS_ONE.inc(view=view_name)
+        for problem in check_request(view_name, match.func if match else None, log):
+            print(f"⚠️ [queries] {request.method} {request.path}: {problem}")
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
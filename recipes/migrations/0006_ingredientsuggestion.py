@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_suggestions(apps, schema_editor):
+    """Build the initial suggestion index from existing ingredients."""
+    from collections import Counter
+
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientSuggestion = apps.get_model('recipes', 'IngredientSuggestion')
+
+    counts = Counter()
+    rows = Ingredient.objects.filter(recipe__isnull=False).values_list(
+        'recipe__user_id', 'recipe__visibility', 'name'
+    )
+    for user_id, visibility, name in rows.iterator():
+        name = (name or '').strip().lower()
+        if name:
+            counts[(user_id, visibility, name)] += 1
+
+    IngredientSuggestion.objects.bulk_create(
+        [IngredientSuggestion(user_id=u, visibility=v, name=n, occurrences=c)
+         for (u, v, n), c in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_rename_recipe_id_ingredient_recipe_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visibility', models.CharField(choices=[('private', 'Private'), ('friends', 'Friends'), ('public', 'Public')], max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_suggestions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['visibility', 'name'], name='ing_suggest_vis_name_idx')],
+                'unique_together': {('user', 'visibility', 'name')},
+            },
+        ),
+        migrations.RunPython(backfill_suggestions, migrations.RunPython.noop),
+    ]
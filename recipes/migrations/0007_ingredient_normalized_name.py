@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:58
+
+from django.db import migrations, models
+
+
+def fill_normalized_names(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    batch = []
+    for ing in Ingredient.objects.only('ingredient_id', 'name').iterator(chunk_size=2000):
+        ing.normalized_name = (ing.name or '').strip().lower()
+        batch.append(ing)
+        if len(batch) >= 2000:
+            Ingredient.objects.bulk_update(batch, ['normalized_name'])
+            batch = []
+    if batch:
+        Ingredient.objects.bulk_update(batch, ['normalized_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_ingredientsuggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='normalized_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['normalized_name', 'recipe'], name='ingredient_norm_name_idx'),
+        ),
+    ]
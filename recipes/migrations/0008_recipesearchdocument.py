@@ -0,0 +1,104 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:00
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+def create_search_backend(apps, schema_editor):
+    """GIN index on PostgreSQL, FTS5 mirror table on SQLite, nothing elsewhere."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS recipe_search_vector_gin '
+            'ON recipes_recipesearchdocument USING GIN (vector)'
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_search_fts "
+                "USING fts5(title, ingredients, instructions, notes, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except Exception as e:
+            print("ℹ️ SQLite FTS5 not available; recipe search falls back to icontains:", e)
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_search_fts')
+
+
+def backfill_documents(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Instruction = apps.get_model('recipes', 'Instruction')
+    RecipeSearchDocument = apps.get_model('recipes', 'RecipeSearchDocument')
+    connection = schema_editor.connection
+
+    ingredients, instructions = {}, {}
+    for rid, name in Ingredient.objects.filter(recipe__isnull=False).values_list('recipe_id', 'name').iterator():
+        ingredients.setdefault(rid, []).append(name or '')
+    for rid, text in Instruction.objects.order_by('step_number').values_list('recipe_id', 'description').iterator():
+        instructions.setdefault(rid, []).append(strip_tags(text or ''))
+
+    docs = [
+        RecipeSearchDocument(
+            recipe_id=rid,
+            title=title or '',
+            ingredients='\n'.join(ingredients.get(rid, [])),
+            instructions='\n'.join(instructions.get(rid, [])),
+            notes=notes or '',
+        )
+        for rid, title, notes in Recipe.objects.values_list('recipe_id', 'title', 'notes').iterator()
+    ]
+    RecipeSearchDocument.objects.bulk_create(docs, batch_size=500)
+
+    if connection.vendor == 'postgresql':
+        # same configuration the runtime queries use (recipes.functions.search)
+        config = getattr(settings, 'SEARCH_CONFIG', 'german')
+        schema_editor.execute(
+            "UPDATE recipes_recipesearchdocument SET vector = "
+            "setweight(to_tsvector(%s::regconfig, coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(ingredients, '')), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(instructions, '')), 'C') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(notes, '')), 'D')",
+            [config] * 4,
+        )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_search_fts'")
+            if cursor.fetchone():
+                cursor.executemany(
+                    "INSERT INTO recipes_search_fts (rowid, title, ingredients, instructions, notes) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    [(d.recipe_id, d.title, d.ingredients, d.instructions, d.notes) for d in docs],
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_ingredient_normalized_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchDocument',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='recipes.recipe')),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('ingredients', models.TextField(blank=True, default='')),
+                ('instructions', models.TextField(blank=True, default='')),
+                ('notes', models.TextField(blank=True, default='')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShowcaseSlot',
+            fields=[
+                ('slot', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='showcase_slot', to='recipes.recipe')),
+            ],
+        ),
+    ]
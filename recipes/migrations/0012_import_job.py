@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_visibility_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('source', models.CharField(choices=[('url', 'URL'), ('image', 'Images'), ('text', 'Text'), ('uploads', 'Uploads'), ('manual_llm', 'Manual + LLM')], max_length=20)),
+                ('input_hash', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('status', models.CharField(choices=[('started', 'Started'), ('finished', 'Finished'), ('failed', 'Failed')], default='started', max_length=10)),
+                ('error_code', models.CharField(blank=True, default='', max_length=50)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('stage_ms', models.JSONField(blank=True, default=dict)),
+                ('queue_ms', models.FloatField(blank=True, null=True)),
+                ('total_ms', models.FloatField(blank=True, null=True)),
+                ('llm_calls', models.PositiveIntegerField(default=0)),
+                ('llm_cache_hits', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('input_bytes', models.PositiveIntegerField(default=0)),
+                ('image_bytes', models.PositiveIntegerField(default=0)),
+                ('enqueued_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('recipe', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='recipes.recipe')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['source', 'started_at'], name='import_job_source_started_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,31 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
+from django.utils import timezone
+
+
+def normalize_ingredient_name(name):
+    """Canonical form used for ingredient search and suggestions."""
+    return (name or "").strip().lower()
+
+
+class RecipeQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Recipes `user` may view: own, public, and 'friends' recipes of friends.
+        One predicate over (visibility, user_id); the friend ids come from the
+        cached friend graph, so no extra query per row or per request.
+        """
+        from accounts.friend_graph import friend_ids
+
+        if not getattr(user, "is_authenticated", False):
+            return self.filter(visibility='public')
+        return self.filter(
+            models.Q(user_id=user.pk)
+            | models.Q(visibility='public')
+            | models.Q(visibility='friends', user_id__in=friend_ids(user.pk))
+        )
 
 
 # Create your models here.
@@ -16,6 +41,8 @@ class Recipe(models.Model):
     cook_time = models.PositiveIntegerField()
     portions = models.PositiveIntegerField()
     image = models.ImageField(upload_to='recipe_images/', blank=True, null=True)
+    # manifest of resized WebP/AVIF copies of `image` (see functions/image_variants.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -30,6 +57,14 @@ class Recipe(models.Model):
     visibility = models.CharField(max_length=10,
                                    choices=VISIBILITY_CHOICES, default='private')
 
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # serves Recipe.objects.visible_to(): visibility = ... AND user_id IN (...)
+            models.Index(fields=['visibility', 'user'], name='recipe_visibility_user_idx'),
+        ]
+
 
     def __str__(self):
         return self.title
@@ -49,6 +84,9 @@ class Ingredient(models.Model):
     )
 
     name = models.CharField(max_length=255)
+    # Indexed, normalized copy of `name` for server-side "contains ingredient" filtering.
+    # Set in save(); bulk_create callers must fill it themselves.
+    normalized_name = models.CharField(max_length=255, blank=True, default='', editable=False)
     quantity = models.FloatField(max_length=50, blank=True, null=True)
     unit = models.CharField(max_length=50, blank=True, null=True)
 
@@ -59,6 +97,18 @@ class Ingredient(models.Model):
         help_text="Optionally link this ingredient to another recipe."
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['normalized_name', 'recipe'], name='ingredient_norm_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_ingredient_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.quantity or ''} {self.unit or ''} {self.name}"
 
@@ -73,4 +123,136 @@ class Instruction(models.Model):
         ordering = ['step_number']
 
     def __str__(self):
-        return f"Step {self.step_number} for {self.recipe_id.title}"
\ No newline at end of file
+        return f"Step {self.step_number} for {self.recipe_id.title}"
+
+
+class IngredientSuggestion(models.Model):
+    """
+    Denormalized ingredient vocabulary per owner and recipe visibility.
+    Kept in sync by recipes.signals / recipes.functions.suggestions so list
+    pages can offer prefix suggestions without scanning the ingredient table.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ingredient_suggestions'
+    )
+    visibility = models.CharField(max_length=10, choices=Recipe.VISIBILITY_CHOICES)
+    name = models.CharField(max_length=255)  # normalized: stripped + lower-cased
+    occurrences = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'visibility', 'name')
+        indexes = [
+            models.Index(fields=['visibility', 'name'], name='ing_suggest_vis_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.user_id}/{self.visibility})"
+
+
+class RecipeSearchDocument(models.Model):
+    """
+    Denormalized, weighted search text for one recipe
+    (title > ingredients > instructions > notes), rebuilt by
+    recipes.functions.search whenever the recipe or its children change.
+
+    `vector` is only populated on PostgreSQL (GIN-indexed tsvector); SQLite
+    keeps a parallel FTS5 table instead (see migration 0008).
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    title = models.CharField(max_length=255, blank=True, default='')
+    ingredients = models.TextField(blank=True, default='')
+    instructions = models.TextField(blank=True, default='')
+    notes = models.TextField(blank=True, default='')
+    vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for {self.recipe_id}"
+
+
+class ShowcaseSlot(models.Model):
+    """
+    Sampled pool of public recipes with an image for the home-page showcase.
+    Slots are dense (0..n-1), so a random draw is a primary-key lookup of a
+    few random slot numbers. Maintained by recipes.functions.showcase.
+    """
+    slot = models.PositiveIntegerField(primary_key=True)
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='showcase_slot'
+    )
+
+    def __str__(self):
+        return f"Showcase slot {self.slot}: {self.recipe_id}"
+
+
+class ImportJob(models.Model):
+    """
+    Durable record of one background recipe import, written by the import
+    tasks (recipes.functions.import_jobs). RQ keeps no results and drops
+    failures after an hour; this row keeps the outcome and where the time
+    went (stage_ms: milliseconds per pipeline stage).
+    """
+    SOURCE_CHOICES = [
+        ('url', 'URL'),
+        ('image', 'Images'),
+        ('text', 'Text'),
+        ('uploads', 'Uploads'),
+        ('manual_llm', 'Manual + LLM'),
+    ]
+    STATUS_CHOICES = [
+        ('started', 'Started'),
+        ('finished', 'Finished'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='import_jobs'
+    )
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    input_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='started')
+    error_code = models.CharField(max_length=50, blank=True, default='')
+    error_message = models.TextField(blank=True, default='')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs'
+    )
+
+    stage_ms = models.JSONField(default=dict, blank=True)
+    queue_ms = models.FloatField(null=True, blank=True)
+    total_ms = models.FloatField(null=True, blank=True)
+    llm_calls = models.PositiveIntegerField(default=0)
+    llm_cache_hits = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    input_bytes = models.PositiveIntegerField(default=0)
+    image_bytes = models.PositiveIntegerField(default=0)
+
+    enqueued_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['source', 'started_at'], name='import_job_source_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} import {self.job_id or self.pk} ({self.status})"
@@ -0,0 +1,194 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Recipe, Ingredient, Instruction
+from .functions.suggestions import (
+    apply_suggestion_deltas,
+    move_recipe_suggestions,
+    normalize_ingredient_name,
+    recipe_suggestion_deltas,
+    skipped_recipe_ids,
+)
+from .functions.search import delete_search_documents, schedule_search_refresh
+from .functions.pdf_export import schedule_pdf_invalidation
+from .functions.image_variants import schedule_image_variants, variants_current
+from .functions.showcase import schedule_showcase_sync
+
+
+#region INGREDIENT SUGGESTIONS
+##################### INGREDIENT SUGGESTIONS #####################
+
+@receiver(pre_save, sender=Ingredient)
+def _ingredient_remember_previous(sender, instance, raw=False, **kwargs):
+    instance._suggestion_previous = None
+    if raw or not instance.pk:
+        return
+    instance._suggestion_previous = (
+        Ingredient.objects.filter(pk=instance.pk)
+        .values_list("name", "recipe__user_id", "recipe__visibility")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def _ingredient_saved(sender, instance, raw=False, **kwargs):
+    if raw or instance.recipe_id is None:
+        return
+    recipe = instance.recipe
+    new_key = (recipe.user_id, recipe.visibility, normalize_ingredient_name(instance.name))
+    previous = getattr(instance, "_suggestion_previous", None)
+    old_key = None
+    if previous and previous[1] is not None:
+        old_key = (previous[1], previous[2], normalize_ingredient_name(previous[0]))
+    if old_key == new_key:
+        return
+    deltas = {new_key: 1}
+    if old_key:
+        deltas[old_key] = deltas.get(old_key, 0) - 1
+    apply_suggestion_deltas(deltas)
+
+
+@receiver(post_delete, sender=Ingredient)
+def _ingredient_deleted(sender, instance, **kwargs):
+    # recipes being deleted / re-synced in bulk are handled by their caller
+    if instance.recipe_id is None or instance.recipe_id in skipped_recipe_ids():
+        return
+    owner = Recipe.objects.filter(pk=instance.recipe_id).values_list("user_id", "visibility").first()
+    if owner:
+        apply_suggestion_deltas({(owner[0], owner[1], normalize_ingredient_name(instance.name)): -1})
+
+
+@receiver(pre_save, sender=Recipe)
+def _recipe_remember_visibility(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._suggestion_previous_visibility = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and "visibility" not in update_fields:
+        return
+    instance._suggestion_previous_visibility = (
+        Recipe.objects.filter(pk=instance.pk).values_list("visibility", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def _recipe_saved(sender, instance, created=False, raw=False, **kwargs):
+    previous = getattr(instance, "_suggestion_previous_visibility", None)
+    if raw or created or previous is None:
+        return
+    move_recipe_suggestions(instance, previous, instance.visibility)
+
+
+@receiver(pre_delete, sender=Recipe)
+def _recipe_deleting(sender, instance, **kwargs):
+    # cascaded Ingredient deletes are skipped; the whole recipe is removed in one batch
+    instance._suggestion_deltas = recipe_suggestion_deltas([instance.pk], sign=-1)
+    skipped_recipe_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def _recipe_deleted(sender, instance, **kwargs):
+    skipped_recipe_ids().discard(instance.pk)
+    apply_suggestion_deltas(getattr(instance, "_suggestion_deltas", {}))
+
+##################### /INGREDIENT SUGGESTIONS #####################
+#endregion
+
+
+#region SEARCH DOCUMENTS
+##################### SEARCH DOCUMENTS #####################
+
+@receiver(post_save, sender=Recipe)
+def _recipe_search_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_search_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def _ingredient_search_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.recipe_id is None or instance.recipe_id in skipped_recipe_ids():
+        return
+    schedule_search_refresh(instance.recipe_id)
+
+
+@receiver(post_save, sender=Instruction)
+@receiver(post_delete, sender=Instruction)
+def _instruction_search_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.recipe_id_id in skipped_recipe_ids():
+        return
+    schedule_search_refresh(instance.recipe_id_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def _recipe_search_deleted(sender, instance, **kwargs):
+    delete_search_documents([instance.pk])
+
+##################### /SEARCH DOCUMENTS #####################
+#endregion
+
+
+#region PDF ARTIFACTS
+##################### PDF ARTIFACTS #####################
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def _recipe_pdf_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_pdf_invalidation(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def _ingredient_pdf_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.recipe_id is None or instance.recipe_id in skipped_recipe_ids():
+        return
+    schedule_pdf_invalidation(instance.recipe_id)
+
+
+@receiver(post_save, sender=Instruction)
+@receiver(post_delete, sender=Instruction)
+def _instruction_pdf_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.recipe_id_id in skipped_recipe_ids():
+        return
+    schedule_pdf_invalidation(instance.recipe_id_id)
+
+##################### /PDF ARTIFACTS #####################
+#endregion
+
+
+
+#region IMAGE VARIANTS
+##################### IMAGE VARIANTS #####################
+
+@receiver(post_save, sender=Recipe)
+def _recipe_image_variants(sender, instance, raw=False, **kwargs):
+    # Only when the image changed since the variants were built (or was removed)
+    if raw:
+        return
+    stale = bool(instance.image) and not variants_current(instance)
+    removed = not instance.image and instance.image_variants
+    if stale or removed:
+        schedule_image_variants(instance.pk)
+
+##################### /IMAGE VARIANTS #####################
+#endregion
+
+
+
+#region SHOWCASE POOL
+##################### SHOWCASE POOL #####################
+
+@receiver(post_save, sender=Recipe)
+def _recipe_showcase_saved(sender, instance, raw=False, **kwargs):
+    # visibility or image may have changed: add to / drop from the home-page pool
+    if not raw:
+        schedule_showcase_sync([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def _recipe_showcase_deleted(sender, instance, **kwargs):
+    # the slot cascades with the recipe; the sync refills the hole it leaves
+    schedule_showcase_sync([instance.pk], deleting=True)
+
+##################### /SHOWCASE POOL #####################
+#endregion
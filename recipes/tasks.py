@@ -20,12 +20,31 @@ from .functions.data_acquisition import (
     crop_image_to_visible_area,
 )
 
+from .functions.staging import StagedFile, read_staged, delete_staged
+from .functions.pdf_export import build_pdf_artifact
+from .functions.cookbook import export_cookbook
+from .functions.image_variants import generate_recipe_image_variants
+from .functions.copying import copy_recipes
+from .functions.job_events import emit_stage, publishes_job_events
+from .functions.import_jobs import import_stage, record_input, records_import_job
+from .functions.metrics import traced_task
+from .models import Recipe
+from contextlib import contextmanager
+
 
 def _openai_key():
     # env first, then settings attr (works locally & on Heroku)
     return os.getenv("OPENAI_KEY") or getattr(settings, "OPENAI_KEY", None)
 
 
+class JobFailed(RuntimeError):
+    """Raised by _fail_job; carries the error_code for the job-record/event wrappers."""
+
+    def __init__(self, error_code, message):
+        super().__init__(message)
+        self.error_code = error_code
+
+
 def _fail_job(error_code: str, message: str):
     """
     Annotate the current RQ job with a failure code/message so the client
@@ -38,9 +57,29 @@ def _fail_job(error_code: str, message: str):
         job.meta["error_message"] = message
         job.save_meta()
     # Raising any exception marks the job as failed in RQ
-    raise RuntimeError(message)
+    raise JobFailed(error_code, message)
 
 
+@contextmanager
+def _consume_staged(refs):
+    """
+    Delete the job's staged uploads once it is done with them: after success,
+    and after failure unless RQ is going to retry the job with the same refs.
+    """
+    try:
+        yield
+    except BaseException:
+        job = get_current_job()
+        if not (job and getattr(job, "retries_left", None)):
+            delete_staged(refs)
+        raise
+    else:
+        delete_staged(refs)
+
+
+@traced_task
+@publishes_job_events
+@records_import_job("url")
 def process_recipe_from_url(user_id, url, transform_vegan, custom_instruction, custom_title):
     """
     Background job for add_recipe_from_url.
@@ -51,9 +90,11 @@ def process_recipe_from_url(user_id, url, transform_vegan, custom_instruction, c
     user = User.objects.get(pk=user_id)
 
     print(f"📥 [TASK] URL import started for user={user_id} url={url}")
+    record_input(url)
 
     try:
         # 1) fetch + LLM organize + optional image download (your function)
+        emit_stage("fetching")
         data, image_bytes = get_data_from_url(
             url=url,
             api_key=_openai_key(),
@@ -66,14 +107,16 @@ def process_recipe_from_url(user_id, url, transform_vegan, custom_instruction, c
             data["title"] = custom_title
 
         # 2) Save to DB
-        recipe = save_structured_recipe_to_db(
+        emit_stage("saving")
+        recipe, save_stats = save_structured_recipe_to_db(
             data=data,
             user=user,
             image_bytes=image_bytes,
+            return_stats=True,
         )
 
         print(f"✅ [TASK] URL import done: {recipe.title} (id={recipe.recipe_id})")
-        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title}
+        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title, "save_stats": save_stats}
 
     except requests.exceptions.RequestException:
         # Explicit “webpage could not be found” path
@@ -82,6 +125,9 @@ def process_recipe_from_url(user_id, url, transform_vegan, custom_instruction, c
         _fail_job("url_import_failed", f"URL import failed: {e}")
 
 
+@traced_task
+@publishes_job_events
+@records_import_job("image")
 def process_recipe_from_image(user_id, images_bytes_list, transform_vegan, custom_instruction, custom_title):
     """
     Background job for add_recipe_from_image.
@@ -92,11 +138,13 @@ def process_recipe_from_image(user_id, images_bytes_list, transform_vegan, custo
     user = User.objects.get(pk=user_id)
 
     print(f"🖼️ [TASK] Image import started for user={user_id} images={len(images_bytes_list) if images_bytes_list else 0}")
+    record_input(*(images_bytes_list or []))
 
     try:
         # Convert bytes -> BytesIO to satisfy extract loop using .read()
         images_filelikes = [BytesIO(b) for b in (images_bytes_list or [])]
 
+        emit_stage("extracting")
         structured_data, best_image_bytes = get_data_from_image(
             images=images_filelikes,
             api_key=_openai_key(),
@@ -107,22 +155,29 @@ def process_recipe_from_image(user_id, images_bytes_list, transform_vegan, custo
         )
 
         # Keep your extra crop step (you do this in the view)
-        best_image_bytes = crop_image_to_visible_area(best_image_bytes) if best_image_bytes else None
+        emit_stage("image")
+        with import_stage("crop"):
+            best_image_bytes = crop_image_to_visible_area(best_image_bytes) if best_image_bytes else None
 
 
-        recipe = save_structured_recipe_to_db(
+        emit_stage("saving")
+        recipe, save_stats = save_structured_recipe_to_db(
             data=structured_data,
             user=user,
             image_bytes=(best_image_bytes or structured_data.get("image_bytes")),  # may be None
+            return_stats=True,
         )
 
         print(f"✅ [TASK] Image import done: {recipe.title} (id={recipe.recipe_id})")
-        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title}
+        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title, "save_stats": save_stats}
 
     except Exception as e:
         _fail_job("image_import_failed", f"Image import failed: {e}")
 
 
+@traced_task
+@publishes_job_events
+@records_import_job("text")
 def process_recipe_from_text(user_id, raw_text, use_llm, custom_instruction):
     """
     Background job for add_recipe_from_text.
@@ -133,9 +188,11 @@ def process_recipe_from_text(user_id, raw_text, use_llm, custom_instruction):
     user = User.objects.get(pk=user_id)
 
     print(f"⌨️ [TASK] Text import started for user={user_id} use_llm={use_llm}")
+    record_input(raw_text)
 
     try:
         if use_llm:
+            emit_stage("extracting")
             api_key = _openai_key()
             if not api_key:
                 _fail_job("manual_import_failed", "OPENAI_KEY missing for LLM mode.")
@@ -173,23 +230,31 @@ def process_recipe_from_text(user_id, raw_text, use_llm, custom_instruction):
                 "raw_text": raw_text,
             }
 
-        recipe = save_structured_recipe_to_db(
+        emit_stage("saving")
+        recipe, save_stats = save_structured_recipe_to_db(
             data=structured_data,
             user=user,
             image_bytes=None,
+            return_stats=True,
         )
 
         print(f"✅ [TASK] Text import done: {recipe.title} (id={recipe.recipe_id})")
-        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title}
+        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title, "save_stats": save_stats}
 
     except Exception as e:
         _fail_job("manual_import_failed", f"Manual import failed: {e}")
 
 
+@traced_task
+@publishes_job_events
+@records_import_job("uploads")
 def process_recipe_from_uploads(user_id, uploads, transform_vegan=False, custom_instruction="", custom_title=""):
     """
     NEW: Handles mixed uploads of images and documents.
-    `uploads` is a list of dicts: {"name": str, "content_type": str, "bytes": bytes}
+    `uploads` is a list of staging references from recipes.functions.staging
+    ({"key", "sha256", "size", "name", "content_type"}); blobs are fetched only
+    when needed and deleted when the job ends. Legacy jobs enqueued with
+    {"name", "content_type", "bytes"} dicts are still accepted.
     - Prefer documents for text extraction if present.
     - Use images to try to get a title image (optional).
     - Never fail just because a title image was not found.
@@ -199,55 +264,50 @@ def process_recipe_from_uploads(user_id, uploads, transform_vegan=False, custom_
     user = User.objects.get(pk=user_id)
 
     print(f"📦 [TASK] Mixed upload started for user={user_id} files={len(uploads) if uploads else 0}")
+    # staged uploads carry their content hash and size, so nothing is read for this
+    record_input(
+        *[f.get("sha256") if "key" in f else f.get("bytes") for f in (uploads or [])],
+        size=sum((f.get("size") or 0) if "key" in f else len(f.get("bytes") or b"") for f in (uploads or [])),
+    )
+
+    staged_refs = [f for f in (uploads or []) if "key" in f]
+    with _consume_staged(staged_refs):
+        try:
+            api_key = _openai_key()
 
-    try:
-        api_key = _openai_key()
-
-        image_files = []
-        document_files = []
-        for f in (uploads or []):
-            name = (f.get("name") or "").lower()
-            ctype = (f.get("content_type") or "").lower()
-            blob = f.get("bytes") or b""
-            if not blob:
-                continue
-            if ctype.startswith("image/") or name.endswith((".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp")):
-                image_files.append(io.BytesIO(blob))
-            elif ("pdf" in ctype or name.endswith(".pdf") or
-                  "word" in ctype or name.endswith(".docx") or name.endswith(".doc")):
-                document_files.append({"name": name, "content_type": ctype, "bytes": blob})
-
-        structured_data = None
-        best_image_bytes = None
-
-        # 1) Prefer reading the text from documents (PDF/DOCX) if present
-        if document_files:
-            structured_data, best_image_bytes = get_data_from_documents(
-                documents=document_files,
-                api_key=api_key,
-                transform_vegan=transform_vegan,
-                custom_instruction=custom_instruction,
-                custom_title=custom_title
-            )
-
-        # 2) If no structured text yet, fall back to OCR/vision on images
-        if not structured_data and image_files:
-            structured_data, best_image_bytes = get_data_from_image(
-                images=image_files,
-                api_key=api_key,
-                transform_vegan=transform_vegan,
-                custom_instruction=custom_instruction,
-                custom_title=custom_title,
-                return_image_bytes=True,
-            )
-
-        if not structured_data:
-            _fail_job("import_failed", "Could not extract a recipe from the provided files.")
+            image_files = []
+            document_files = []
+            for f in (uploads or []):
+                name = (f.get("name") or "").lower()
+                ctype = (f.get("content_type") or "").lower()
+                staged = "key" in f
+                if not (f.get("size") if staged else f.get("bytes")):
+                    continue
+                if ctype.startswith("image/") or name.endswith((".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp")):
+                    image_files.append(StagedFile(f) if staged else io.BytesIO(f["bytes"]))
+                elif ("pdf" in ctype or name.endswith(".pdf") or
+                      "word" in ctype or name.endswith(".docx") or name.endswith(".doc")):
+                    blob = read_staged(f) if staged else f["bytes"]
+                    document_files.append({"name": name, "content_type": ctype, "bytes": blob})
+
+            structured_data = None
+            best_image_bytes = None
+
+            # 1) Prefer reading the text from documents (PDF/DOCX) if present
+            if document_files:
+                emit_stage("extracting", source="documents")
+                structured_data, best_image_bytes = get_data_from_documents(
+                    documents=document_files,
+                    api_key=api_key,
+                    transform_vegan=transform_vegan,
+                    custom_instruction=custom_instruction,
+                    custom_title=custom_title
+                )
 
-        # 3) If text came from docs and we also have images, try to pick a title image (optional)
-        if best_image_bytes is None and image_files:
-            try:
-                _, best_image_bytes = get_data_from_image(
+            # 2) If no structured text yet, fall back to OCR/vision on images
+            if not structured_data and image_files:
+                emit_stage("extracting", source="images")
+                structured_data, best_image_bytes = get_data_from_image(
                     images=image_files,
                     api_key=api_key,
                     transform_vegan=transform_vegan,
@@ -255,35 +315,58 @@ def process_recipe_from_uploads(user_id, uploads, transform_vegan=False, custom_
                     custom_title=custom_title,
                     return_image_bytes=True,
                 )
-            except Exception as e:
-                print("⚠️ Could not derive hero image from images:", e)
 
-        # 4) Optional crop step—same helper you already use
-        if best_image_bytes:
-            try:
-                best_image_bytes = crop_image_to_visible_area(best_image_bytes)
-            except Exception:
-                pass
-
-        recipe = save_structured_recipe_to_db(
-            data=structured_data,
-            user=user,
-            image_bytes=best_image_bytes,   # may be None — that’s OK
-        )
+            if not structured_data:
+                _fail_job("import_failed", "Could not extract a recipe from the provided files.")
+
+            # 3) If text came from docs and we also have images, try to pick a title image (optional)
+            if best_image_bytes is None and image_files:
+                emit_stage("image")
+                try:
+                    _, best_image_bytes = get_data_from_image(
+                        images=image_files,
+                        api_key=api_key,
+                        transform_vegan=transform_vegan,
+                        custom_instruction=custom_instruction,
+                        custom_title=custom_title,
+                        return_image_bytes=True,
+                    )
+                except Exception as e:
+                    print("⚠️ Could not derive hero image from images:", e)
+
+            # 4) Optional crop step—same helper you already use
+            if best_image_bytes:
+                try:
+                    with import_stage("crop"):
+                        best_image_bytes = crop_image_to_visible_area(best_image_bytes)
+                except Exception:
+                    pass
+
+            emit_stage("saving")
+            recipe, save_stats = save_structured_recipe_to_db(
+                data=structured_data,
+                user=user,
+                image_bytes=best_image_bytes,   # may be None — that’s OK
+                return_stats=True,
+            )
 
-        print(f"✅ [TASK] Mixed upload done: {recipe.title} (id={recipe.recipe_id})")
-        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title}
+            print(f"✅ [TASK] Mixed upload done: {recipe.title} (id={recipe.recipe_id})")
+            return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title, "save_stats": save_stats}
 
-    except Exception as e:
-        _fail_job("mixed_import_failed", f"Import failed: {e}")
+        except Exception as e:
+            _fail_job("mixed_import_failed", f"Import failed: {e}")
 
 
-def process_recipe_from_manual_llm(user_id, base_fields, ingredients_text, instructions_text, transform_vegan=False, custom_instruction="", image_bytes=None):
+@traced_task
+@publishes_job_events
+@records_import_job("manual_llm")
+def process_recipe_from_manual_llm(user_id, base_fields, ingredients_text, instructions_text, transform_vegan=False, custom_instruction="", image_bytes=None, image_ref=None):
     """
     Background job for create_recipe (when 'AI Assistance' is ON).
     - Takes the basic form fields the user entered (title/cook_time/portions/notes),
       plus two textareas (ingredients_text, instructions_text).
-    - Optionally accepts image_bytes for the recipe cover photo.
+    - Optionally accepts the recipe cover photo as a staging reference (image_ref,
+      preferred) or as raw image_bytes (jobs enqueued before staging existed).
     - Calls organize_with_llm to structure the recipe.
     - Saves via save_structured_recipe_to_db.
     - Overrides the title/cook_time/portions/notes with what the user entered (if present).
@@ -292,47 +375,131 @@ def process_recipe_from_manual_llm(user_id, base_fields, ingredients_text, instr
     user = User.objects.get(pk=user_id)
 
     print(f"🧾 [TASK] Manual+LLM create started for user={user_id}")
+    record_input(
+        ingredients_text, instructions_text, image_ref.get("sha256") if image_ref else image_bytes,
+        size=len((ingredients_text or "").encode()) + len((instructions_text or "").encode())
+        + ((image_ref.get("size") or 0) if image_ref else len(image_bytes or b"")),
+    )
+
+    staged_refs = [image_ref] if image_ref else []
+    with _consume_staged(staged_refs):
+        try:
+            api_key = _openai_key()
+            if not api_key:
+                _fail_job("manual_import_failed", "OPENAI_KEY missing for LLM mode.")
 
-    try:
-        api_key = _openai_key()
-        if not api_key:
-            _fail_job("manual_import_failed", "OPENAI_KEY missing for LLM mode.")
+            ingredients = [ln.strip() for ln in (ingredients_text or "").splitlines() if ln.strip()]
+            instructions = [ln.strip() for ln in (instructions_text or "").splitlines() if ln.strip()]
 
-        ingredients = [ln.strip() for ln in (ingredients_text or "").splitlines() if ln.strip()]
-        instructions = [ln.strip() for ln in (instructions_text or "").splitlines() if ln.strip()]
+            raw_data = {"ingredients": ingredients, "instructions": instructions}
 
-        raw_data = {"ingredients": ingredients, "instructions": instructions}
+            emit_stage("extracting")
+            structured = organize_with_llm(
+                data=raw_data,
+                api_key=api_key,
+                transform_vegan=transform_vegan,
+                custom_instructions=custom_instruction,
+            )
 
-        structured = organize_with_llm(
-            data=raw_data,
-            api_key=api_key,
-            transform_vegan=transform_vegan,
-            custom_instructions=custom_instruction,
-        )
+            # Respect user-provided base fields (if set)
+            if base_fields:
+                if base_fields.get("title"):
+                    structured["title"] = base_fields["title"]
+                # Your save util expects numbers in strings too; we keep ints fine
+                if base_fields.get("cook_time") is not None:
+                    structured["cook_time"] = base_fields["cook_time"]
+                if base_fields.get("portions") is not None:
+                    structured["portions"] = base_fields["portions"]
+                # Notes: we append user notes if present
+                if base_fields.get("notes"):
+                    structured["notes"] = base_fields["notes"]
+
+            # Save with optional image
+            emit_stage("saving")
+            recipe, save_stats = save_structured_recipe_to_db(
+                data=structured,
+                user=user,
+                image_bytes=read_staged(image_ref) if image_ref else image_bytes,
+                return_stats=True,
+            )
 
-        # Respect user-provided base fields (if set)
-        if base_fields:
-            if base_fields.get("title"):
-                structured["title"] = base_fields["title"]
-            # Your save util expects numbers in strings too; we keep ints fine
-            if base_fields.get("cook_time") is not None:
-                structured["cook_time"] = base_fields["cook_time"]
-            if base_fields.get("portions") is not None:
-                structured["portions"] = base_fields["portions"]
-            # Notes: we append user notes if present
-            if base_fields.get("notes"):
-                structured["notes"] = base_fields["notes"]
-
-        # Save with optional image
-        recipe = save_structured_recipe_to_db(
-            data=structured,
-            user=user,
-            image_bytes=image_bytes,  # Now accepts user-uploaded cover photo
-        )
+            print(f"✅ [TASK] Manual+LLM create done: {recipe.title} (id={recipe.recipe_id})")
+            return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title, "save_stats": save_stats}
+
+        except Exception as e:
+            _fail_job("manual_import_failed", f"Manual+LLM import failed: {e}")
+
+
+@traced_task
+def render_recipe_pdf(recipe_id):
+    """
+    Background job for recipe_pdf: render the recipe once and store the PDF
+    artifact; the view serves it from storage on this and later requests.
+    """
+    recipe = (Recipe.objects.select_related("user")
+              .prefetch_related("ingredients", "instructions")
+              .get(pk=recipe_id))
+    try:
+        key = build_pdf_artifact(recipe)
+    except Exception as e:
+        _fail_job("pdf_render_failed", f"PDF rendering failed: {e}")
+    return {"ok": True, "recipe_id": recipe.recipe_id, "artifact": key}
+
+
+@traced_task
+def process_cookbook_export(user_id, recipe_ids, fmt):
+    """
+    Background job for cookbook_export: build one PDF or import-compatible ZIP
+    for recipe_ids and store it. Progress and the stored key go into job.meta
+    so the status page can show them and the download view can find the file.
+    """
+    job = get_current_job()
+    total = len(recipe_ids or [])
+    print(f"📚 [TASK] Cookbook export started for user={user_id} recipes={total} format={fmt}")
 
-        print(f"✅ [TASK] Manual+LLM create done: {recipe.title} (id={recipe.recipe_id})")
-        return {"ok": True, "recipe_id": recipe.recipe_id, "title": recipe.title}
+    def progress(done):
+        if job:
+            job.meta["progress"] = {"done": done, "total": total}
+            job.save_meta()
 
+    try:
+        key_stem = f"{user_id}/{job.id if job else 'adhoc'}"
+        key = export_cookbook(recipe_ids, fmt, key_stem, progress=progress)
     except Exception as e:
-        _fail_job("manual_import_failed", f"Manual+LLM import failed: {e}")
+        _fail_job("export_failed", f"Cookbook export failed: {e}")
 
+    if job:
+        job.meta["artifact"] = key
+        job.save_meta()
+    print(f"✅ [TASK] Cookbook export done: {key}")
+    return {"ok": True, "artifact": key, "format": fmt, "recipes": total}
+
+
+@traced_task
+def process_image_variants(recipe_id):
+    """
+    Background job scheduled after a recipe image is saved: build its resized
+    WebP/AVIF variants and record them on the recipe.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:
+        return {"ok": False, "recipe_id": recipe_id, "missing": True}
+    manifest = generate_recipe_image_variants(recipe)
+    return {"ok": True, "recipe_id": recipe_id, "variants": len((manifest or {}).get("sizes", {}))}
+
+
+@traced_task
+def process_bulk_copy(user_id, recipe_ids=None, source_user_id=None, image_mode="reference"):
+    """
+    Background job for copy_recipes_bulk when a collection is too large to
+    copy inside the request. Permissions are re-checked against the user here.
+    """
+    User = get_user_model()
+    user = User.objects.get(pk=user_id)
+    print(f"📋 [TASK] Bulk copy started for user={user_id} source_user={source_user_id} ids={len(recipe_ids or [])}")
+    try:
+        copies = copy_recipes(user, recipe_ids=recipe_ids, source_user_id=source_user_id, image_mode=image_mode)
+    except Exception as e:
+        _fail_job("copy_failed", f"Copying recipes failed: {e}")
+    print(f"✅ [TASK] Bulk copy done: {len(copies)} recipe(s)")
+    return {"ok": True, "copied": len(copies), "recipe_ids": [c.recipe_id for c in copies]}
@@ -0,0 +1,45 @@
+"""
+Template helpers for recipe images.
+
+    {% load recipe_images %}
+    {% recipe_picture recipe "thumb" alt=recipe.title class="h-12 w-16 object-cover" %}
+    <img src="{{ recipe|recipe_image_url:'card' }}">
+
+recipe_picture renders a <picture> with AVIF/WebP <source>s of the requested
+size and the original as <img> fallback; recipe_image_url returns a single URL
+(WebP variant when available). Both fall back to the original image while the
+variants have not been built yet.
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from recipes.functions.image_variants import MIME_TYPES, VARIANT_FORMATS, variant_url, variants_current
+
+register = template.Library()
+
+
+@register.filter
+def recipe_image_url(recipe, variant="card"):
+    return variant_url(recipe, variant)
+
+
+@register.simple_tag
+def recipe_picture(recipe, variant="card", alt="", loading="lazy", **attrs):
+    if not recipe.image:
+        return ""
+    extra = format_html_join("", ' {}="{}"', sorted(attrs.items()))
+
+    if not variants_current(recipe):
+        return format_html('<img src="{}" alt="{}" loading="{}"{}>', recipe.image.url, alt, loading, extra)
+
+    entry = recipe.image_variants["sizes"].get(variant) or {}
+    storage = recipe.image.storage
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}">',
+        ((MIME_TYPES[fmt], storage.url(entry[fmt])) for fmt in VARIANT_FORMATS if entry.get(fmt)),
+    )
+    size = format_html(' width="{}" height="{}"', entry["w"], entry["h"]) if entry.get("w") else ""
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}" loading="{}"{}{}></picture>',
+        sources, recipe.image.url, alt, loading, size, extra,
+    )
@@ -0,0 +1,1455 @@
+import asyncio
+import datetime
+import io
+import json
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connections
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+import numpy as np
+from PIL import Image
+
+from accounts.models import Friendship
+from .functions import data_acquisition
+from .functions.benchmark import SCENARIOS
+from .functions.cookbook import EXPORT_PREFIX, export_cookbook, purge_stale_exports
+from .functions.copying import copy_recipes
+from .functions.image_variants import VARIANT_FORMATS, generate_recipe_image_variants, variants_current
+from .functions.import_jobs import (
+    _summary, import_stage, percentile, record_input, record_llm_usage, record_payload, records_import_job,
+)
+from .functions.job_events import LAST_PREFIX, stream_job_events
+from .functions.llm_cache import (
+    cached_llm_call, digest_bytes, get_llm_cache, make_key, normalize_text, reset_llm_cache,
+)
+from .functions.pdf_export import artifact_storage, build_pdf_artifact, get_pdf_artifact, pdf_artifact_key
+from .functions.permissions import can_copy, can_edit, can_view, recipe_permissions
+from .functions.pipelines import save_structured_recipe_to_db
+from .functions.query_budget import budget_for, inspect_queries, sql_shape
+from .functions.search import search_recipes
+from .functions.showcase import sync_showcase
+from .functions.staging import (
+    StagedFile, delete_staged, purge_stale_staging, read_staged, stage_uploads, staging_storage,
+)
+from .functions.suggestions import apply_suggestion_deltas, rebuild_ingredient_suggestions
+from .functions.synthetic import (
+    LiveDatabaseError, ensure_scratch_database, generate_dataset, is_scratch_database, synthetic_users,
+)
+from .functions.visibility import (
+    INVALID, NOT_FOUND, UNCHANGED, UPDATED, bulk_set_visibility, set_all_visibility,
+)
+from .management.commands import rqimageworker
+from .management.commands.import_recipes import ImportCheckpoint, import_user_folder, iter_json_array
+from .models import ImportJob, Ingredient, IngredientSuggestion, Instruction, Recipe, ShowcaseSlot
+from .tasks import JobFailed
+from .workers import ConnectionReusingWorker
+
+PAGE = 10  # the list views paginate by 10; one more than a page makes per-row queries visible
+PLAIN_STATICFILES = {
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},  # no collectstatic manifest in tests
+}
+
+
+@override_settings(STORAGES=PLAIN_STATICFILES)
+class QueryBudgetTests(TestCase):
+    """
+    Every main view must stay within its @query_budget whatever the number of
+    rows on the page, and must not repeat one SQL shape per row (N+1).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.viewer = User.objects.create_user("viewer", "viewer@example.com", "pw", is_verified=True)
+        cls.friend = User.objects.create_user("friend", "friend@example.com", "pw", is_verified=True)
+        cls.stranger = User.objects.create_user("stranger", "stranger@example.com", "pw", is_verified=True)
+        Friendship.objects.create(user=cls.viewer, friend=cls.friend)
+        Friendship.objects.create(user=cls.friend, friend=cls.viewer)
+
+        with cls.captureOnCommitCallbacks(execute=True):  # search documents are built on commit
+            for owner, visibility in ((cls.viewer, "private"), (cls.friend, "friends"), (cls.stranger, "public")):
+                for i in range(PAGE + 2):
+                    cls._recipe(owner, visibility, f"{owner.username} dish {i}")
+        # an ingredient linking to another (visible) recipe, as recipe_detail renders them
+        cls.detail = cls._recipe(cls.stranger, "public", "Linked dish")
+        target = Recipe.objects.filter(user=cls.stranger).exclude(pk=cls.detail.pk).first()
+        Ingredient.objects.create(recipe=cls.detail, name="Base", linked_recipe=target)
+
+    @classmethod
+    def _recipe(cls, owner, visibility, title):
+        recipe = Recipe.objects.create(user=owner, title=title, cook_time=10, portions=2, visibility=visibility)
+        for n, name in enumerate(("Zwiebel", "Knoblauch", "Tomaten"), start=1):
+            Ingredient.objects.create(recipe=recipe, category="Zutaten", name=name, quantity=n, unit="g")
+            Instruction.objects.create(recipe_id=recipe, step_number=n, description=f"Step {n} with <b>{name}</b>")
+        return recipe
+
+    def setUp(self):
+        cache.clear()  # friend-graph sets are cached: every test starts cold
+        self.client.force_login(self.viewer)
+
+    def urls(self):
+        return {
+            "home": reverse("recipes:home"),
+            "recipe_list": reverse("recipes:recipe_list"),
+            "recipe_list (ingredient filter)": reverse("recipes:recipe_list") + "?ing=zwiebel",
+            "recipe_detail": reverse("recipes:recipe_detail", args=[self.detail.pk]),
+            "public_recipes": reverse("recipes:public_recipes"),
+            "public_recipes (page 2)": reverse("recipes:public_recipes") + "?page=2",
+            "friends_recipes": reverse("recipes:friends_recipes", args=[self.friend.pk]),
+            "search_recipes": reverse("recipes:search_recipes") + "?q=dish",
+            "ingredient_suggestions": reverse("recipes:ingredient_suggestions") + "?scope=public&q=zw",
+        }
+
+    def test_views_stay_within_query_budget(self):
+        for label, url in self.urls().items():
+            with self.subTest(view=label):
+                budget = budget_for(resolve(url.split("?")[0]).func)
+                self.assertIsNotNone(budget, f"{label} has no @query_budget")
+                with inspect_queries() as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(queries.count, budget, f"{label}: {queries.count} queries > budget {budget}")
+                self.assertEqual(queries.repeated(), [], f"{label} repeats queries per row")
+                if label in ("search_recipes", "ingredient_suggestions"):
+                    # an empty index would pass any budget
+                    self.assertTrue(response.json()["results"], f"{label} returned nothing")
+
+    def test_repeated_query_shapes_are_detected(self):
+        with inspect_queries() as queries:
+            for recipe in Recipe.objects.filter(user=self.stranger)[:PAGE]:
+                recipe.user.username  # one user lookup per row
+        self.assertEqual(len(queries.repeated()), 1)
+        self.assertEqual(queries.repeated()[0][1], PAGE)
+
+    def test_sql_shape_folds_literals_and_in_lists(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND kind = 'a' LIMIT 10"),
+            sql_shape("SELECT * FROM t WHERE id IN (%s) AND kind = 'b' LIMIT 20"),
+        )
+
+    @override_settings(QUERY_INSPECTOR={"ENABLED": True, "N_PLUS_ONE_THRESHOLD": 5})
+    def test_middleware_reports_query_count(self):
+        response = self.client.get(reverse("recipes:public_recipes"))
+        self.assertGreater(int(response["X-DB-Queries"]), 0)
+        self.assertIn("X-DB-Time-ms", response)
+
+
+class SaveStructuredRecipeTests(TestCase):
+    """save_structured_recipe_to_db writes each child table with one bulk INSERT and cleans up after failures."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("cook", "cook@example.com", "pw", is_verified=True)
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        cm = override_settings(STORAGES={
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.media}},
+        })
+        cm.enable()
+        self.addCleanup(cm.disable)
+
+    @staticmethod
+    def data(n):
+        return {
+            "title": "Soup", "cook_time": "30 min", "portions": "4 servings",
+            "ingredients": [
+                {"category": "Base", "items": [{"name": f" Zutat {i} ", "quantity": "1 1/2", "unit": "g"}
+                                               for i in range(n)]},
+                {"category": "Topping", "items": [{"name": "Petersilie", "quantity": "½", "unit": ""}]},
+            ],
+            "instructions": [f" Step {i} " for i in range(n)],
+        }
+
+    def queries_for(self, n):
+        with inspect_queries() as queries:
+            save_structured_recipe_to_db(self.data(n), self.user)
+        return queries.count
+
+    def test_query_count_does_not_grow_with_children(self):
+        self.assertEqual(self.queries_for(2), self.queries_for(40))
+
+    def test_children_keep_their_order(self):
+        recipe = save_structured_recipe_to_db(self.data(3), self.user)
+        self.assertEqual(
+            list(recipe.ingredients.order_by("pk").values_list("category", "name", "quantity")),
+            [("Base", "Zutat 0", 1.5), ("Base", "Zutat 1", 1.5), ("Base", "Zutat 2", 1.5), ("Topping", "Petersilie", 0.5)],
+        )
+        self.assertEqual(
+            list(recipe.instructions.order_by("pk").values_list("step_number", "description")),
+            [(1, "Step 0"), (2, "Step 1"), (3, "Step 2")],
+        )
+        self.assertEqual((recipe.cook_time, recipe.portions), (30, 4))
+
+    def test_return_stats(self):
+        recipe, stats = save_structured_recipe_to_db(self.data(3), self.user, image_bytes=b"png", return_stats=True)
+        self.assertEqual((stats["ingredients"], stats["instructions"], stats["image_bytes"]), (4, 3, 3))
+        self.assertGreaterEqual(stats["total_ms"], stats["db_ms"])
+        self.assertTrue(default_storage.exists(recipe.image.name))
+
+    def test_failed_write_removes_the_uploaded_image(self):
+        with mock.patch.object(Instruction.objects, "bulk_create", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                save_structured_recipe_to_db(self.data(2), self.user, image_bytes=b"png")
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(default_storage.listdir("recipe_images")[1], [])
+
+
+class FastImportTests(TestCase):
+    """Streaming parser, checkpoint resume and the batched --fast write path of import_recipes."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def _write(self, name, data):
+        path = self.tmp / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return path
+
+    def _import(self, username, recipes, **options):
+        self._write(f"{username}/recipe_data.json", recipes)
+        opts = {"update": False, "create_missing_users": True, "dry_run": False,
+                "image_threads": 1, "batch_size": 50, "checkpoint": None, **options}
+        return import_user_folder(self.tmp / username, opts)
+
+    def test_iter_json_array_streams_across_chunk_boundaries(self):
+        items = [{"title": f"Dish {i}", "notes": "x" * i} for i in range(40)] + [1, "two", None, [3]]
+        path = self._write("data.json", items)
+        self.assertEqual(list(iter_json_array(path, chunk_size=7)), items)
+
+    def test_iter_json_array_rejects_non_arrays_and_truncation(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(self._write("obj.json", {"title": "x"})))
+        truncated = self.tmp / "truncated.json"
+        truncated.write_text('[{"title": "a"}, {"title": ', encoding="utf-8")
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(truncated, chunk_size=4))
+
+    def test_checkpoint_resumes_from_highest_index_and_ignores_torn_lines(self):
+        path = self.tmp / "import.ckpt"
+        checkpoint = ImportCheckpoint(path)
+        checkpoint.record("anna", 50)
+        checkpoint.record("anna", 100)
+        checkpoint.record("ben", 20, done=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write('{"user": "anna", "ne')  # crash mid-write
+
+        resumed = ImportCheckpoint(path)
+        self.assertEqual(resumed.resume_index("anna"), 100)
+        self.assertFalse(resumed.is_done("anna"))
+        self.assertTrue(resumed.is_done("ben"))
+        self.assertEqual(resumed.resume_index("carl"), 0)
+
+    def test_import_skips_recipes_before_the_checkpoint(self):
+        checkpoint = self.tmp / "import.ckpt"
+        ImportCheckpoint(checkpoint).record("anna", 2)
+        summary = self._import("anna", [{"title": f"Dish {i}"} for i in range(4)], checkpoint=str(checkpoint))
+        self.assertEqual(summary["created"], 2)
+        self.assertEqual(sorted(Recipe.objects.values_list("title", flat=True)), ["Dish 2", "Dish 3"])
+        self.assertTrue(ImportCheckpoint(checkpoint).is_done("anna"))
+
+    def test_repeated_title_in_one_batch_is_skipped_without_update(self):
+        recipes = [{"title": "Soup", "cook_time": "10"}, {"title": "Soup", "cook_time": "99"}]
+        summary = self._import("anna", recipes)
+        self.assertEqual((summary["created"], summary["updated"], summary["skipped"]), (1, 0, 1))
+        self.assertEqual(Recipe.objects.get(title="Soup").cook_time, 10)
+
+    def test_update_bumps_updated_at_and_drops_pdf_artifacts(self):
+        self._import("anna", [{"title": "Soup", "cook_time": "10"}])
+        recipe = Recipe.objects.get(title="Soup")
+        stale_key = pdf_artifact_key(recipe)
+
+        with mock.patch("recipes.functions.pdf_export.delete_pdf_artifacts") as delete:
+            with self.captureOnCommitCallbacks(execute=True):
+                summary = self._import("anna", [{"title": "Soup", "cook_time": "20"}], update=True)
+
+        self.assertEqual(summary["updated"], 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.cook_time, 20)
+        self.assertNotEqual(pdf_artifact_key(recipe), stale_key)
+        delete.assert_called_once()
+        self.assertIn(recipe.pk, delete.call_args.args[0])
+
+
+class IngredientSuggestionTests(TestCase):
+    """The suggestion index follows ingredient adds, edits and deletes by delta, per (owner, visibility)."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("cook", "cook@example.com", "pw", is_verified=True)
+        self.recipe = Recipe.objects.create(user=self.user, title="Soup", cook_time=10, portions=2)
+
+    def counts(self):
+        return {(s.visibility, s.name): s.occurrences for s in IngredientSuggestion.objects.filter(user=self.user)}
+
+    def test_add_counts_normalized_names(self):
+        Ingredient.objects.create(recipe=self.recipe, name="Zwiebel")
+        Ingredient.objects.create(recipe=self.recipe, name=" zwiebel ")
+        Ingredient.objects.create(recipe=self.recipe, name="Salz")
+        self.assertEqual(self.counts(), {("private", "zwiebel"): 2, ("private", "salz"): 1})
+
+    def test_edit_moves_one_occurrence(self):
+        onion = Ingredient.objects.create(recipe=self.recipe, name="Zwiebel")
+        Ingredient.objects.create(recipe=self.recipe, name="Zwiebel")
+        onion.name = "Lauch"
+        onion.save()
+        self.assertEqual(self.counts(), {("private", "zwiebel"): 1, ("private", "lauch"): 1})
+
+    def test_delete_drops_rows_at_zero(self):
+        onion = Ingredient.objects.create(recipe=self.recipe, name="Zwiebel")
+        Ingredient.objects.create(recipe=self.recipe, name="Salz")
+        onion.delete()
+        self.assertEqual(self.counts(), {("private", "salz"): 1})
+        self.recipe.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_visibility_change_moves_scope(self):
+        Ingredient.objects.create(recipe=self.recipe, name="Zwiebel")
+        self.recipe.visibility = "public"
+        self.recipe.save()
+        self.assertEqual(self.counts(), {("public", "zwiebel"): 1})
+
+    def test_concurrent_first_occurrences_both_count(self):
+        # another transaction inserts the same new name right before this one writes
+        def competing_insert(execute, sql, params, many, context):
+            if not raced and sql.startswith("INSERT") and IngredientSuggestion._meta.db_table in sql:
+                raced.append(True)
+                IngredientSuggestion.objects.create(user=self.user, visibility="private", name="zwiebel", occurrences=1)
+            return execute(sql, params, many, context)
+
+        raced = []
+        with connections["default"].execute_wrapper(competing_insert):
+            apply_suggestion_deltas({(self.user.pk, "private", "zwiebel"): 2})
+        self.assertTrue(raced)
+        self.assertEqual(self.counts(), {("private", "zwiebel"): 3})
+
+    def test_removals_never_go_below_zero(self):
+        Ingredient.objects.create(recipe=self.recipe, name="Zwiebel")
+        Ingredient.objects.create(recipe=self.recipe, name="Salz")
+        apply_suggestion_deltas({(self.user.pk, "private", "zwiebel"): -5, (self.user.pk, "private", "lauch"): -1})
+        self.assertEqual(self.counts(), {("private", "salz"): 1})
+
+    def test_incremental_index_matches_rebuild(self):
+        for name in ("Zwiebel", "Äpfel", "äpfel", "Salz"):
+            Ingredient.objects.create(recipe=self.recipe, name=name)
+        Ingredient.objects.filter(name="Salz").first().delete()
+        incremental = self.counts()
+        rebuild_ingredient_suggestions(self.user.pk)
+        self.assertEqual(self.counts(), incremental)
+
+
+@override_settings(STORAGES=PLAIN_STATICFILES)
+class IngredientFilterTests(TestCase):
+    """?ing= filters the list views server-side: every term must match, and the terms survive pagination."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("cook", "cook@example.com", "pw", is_verified=True)
+        cls.both = cls._recipe("Both", ("Zwiebel", "Knoblauch"))
+        cls.onion = cls._recipe("Onion only", ("Zwiebel",))
+        cls._recipe("Neither", ("Salz",))
+        for i in range(PAGE + 2):
+            cls._recipe(f"Tomato {i}", ("Tomaten",))
+
+    @classmethod
+    def _recipe(cls, title, names):
+        recipe = Recipe.objects.create(user=cls.user, title=title, cook_time=10, portions=2)
+        for name in names:
+            Ingredient.objects.create(recipe=recipe, name=name)
+        return recipe
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, query):
+        response = self.client.get(reverse("recipes:recipe_list") + query)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def titles(self, response):
+        return {r.title for r in response.context["page_obj"]}
+
+    def test_all_terms_must_match(self):
+        response = self.get("?ing=Zwiebel&ing=%20knoblauch%20")
+        self.assertEqual(self.titles(response), {"Both"})
+        self.assertEqual(response.context["current_ingredients"], ["knoblauch", "zwiebel"])
+        self.assertEqual(self.titles(self.get("?ing=zwiebel")), {"Both", "Onion only"})
+
+    def test_empty_terms_are_ignored(self):
+        self.assertEqual(self.titles(self.get("?ing=&ing=zwiebel")), {"Both", "Onion only"})
+        response = self.get("?ing=")
+        self.assertEqual(response.context["current_ingredients"], [])
+        self.assertEqual(response.context["page_obj"].paginator.count, Recipe.objects.count())
+
+    def test_terms_survive_pagination(self):
+        first = self.get("?ing=tomaten")
+        self.assertEqual(first.context["page_obj"].paginator.count, PAGE + 2)
+        self.assertContains(first, 'href="?page=2&sort=created_at&dir=desc&amp;ing=tomaten"')
+        second = self.get("?page=2&ing=tomaten")
+        self.assertEqual(len(second.context["page_obj"]), 2)
+        self.assertTrue(all(title.startswith("Tomato") for title in self.titles(second)))
+
+    def test_terms_reach_the_page_as_json_not_markup(self):
+        response = self.get("?ing=" + "<img src=x onerror=alert(1)>")
+        self.assertNotContains(response, "<img src=x")
+        self.assertContains(response, "\\u003Cimg src=x onerror=alert(1)\\u003E")
+
+
+class SearchVisibilityTests(TestCase):
+    """search_recipes only returns recipes the searching user may view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user("owner", "owner@example.com", "pw", is_verified=True)
+        cls.friend = User.objects.create_user("friend", "friend@example.com", "pw", is_verified=True)
+        cls.stranger = User.objects.create_user("stranger", "stranger@example.com", "pw", is_verified=True)
+        Friendship.objects.create(user=cls.owner, friend=cls.friend)
+        Friendship.objects.create(user=cls.friend, friend=cls.owner)
+        with cls.captureOnCommitCallbacks(execute=True):  # documents are refreshed on commit
+            cls.recipes = {
+                visibility: Recipe.objects.create(
+                    user=cls.owner, title=f"Gulasch {visibility}", cook_time=60, portions=4, visibility=visibility
+                )
+                for visibility in ("private", "friends", "public")
+            }
+            Recipe.objects.create(user=cls.owner, title="Apfelkuchen", cook_time=60, portions=8, visibility="public")
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, user):
+        return {rid for rid, _ in search_recipes(user, "gulasch")}
+
+    def expected(self, *visibilities):
+        return {self.recipes[v].pk for v in visibilities}
+
+    def test_owner_finds_all_own_recipes(self):
+        self.assertEqual(self.found(self.owner), self.expected("private", "friends", "public"))
+
+    def test_friend_finds_friends_and_public(self):
+        self.assertEqual(self.found(self.friend), self.expected("friends", "public"))
+
+    def test_stranger_and_anonymous_find_public_only(self):
+        self.assertEqual(self.found(self.stranger), self.expected("public"))
+        self.assertEqual(self.found(AnonymousUser()), self.expected("public"))
+
+    def test_title_matches_rank_first(self):
+        Ingredient.objects.create(recipe=self.recipes["public"], name="Paprika")
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(recipe=Recipe.objects.get(title="Apfelkuchen"), name="Gulasch-Gewürz")
+        ranked = [rid for rid, _ in search_recipes(self.stranger, "gulasch")]
+        self.assertEqual(ranked[-1], Recipe.objects.get(title="Apfelkuchen").pk)
+
+
+class LLMCacheTests(TestCase):
+    """Cache keys separate everything that changes the answer; entries expire after TTL."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.addCleanup(reset_llm_cache)
+
+    def use_file_cache(self, **config):
+        cm = override_settings(LLM_CACHE={"BACKEND": "file", "PATH": self.tmp, "TTL": 60, "MAX_ENTRIES": 0, **config})
+        cm.enable()
+        self.addCleanup(cm.disable)
+        reset_llm_cache()
+
+    def test_normalize_text_ignores_formatting_but_keeps_list_boundaries(self):
+        self.assertEqual(normalize_text("  Zwiebel\n\t schneiden "), "Zwiebel schneiden")
+        self.assertEqual(normalize_text(["a  b", " c"]), normalize_text(["a b", "c"]))
+        self.assertNotEqual(normalize_text(["a b"]), normalize_text(["a", "b"]))
+        self.assertNotEqual(normalize_text(["a", "", "b"]), normalize_text(["a", "b"]))
+
+    def test_key_changes_with_every_input(self):
+        base = dict(kind="organize", model="m", template_version=1, normalized_input="x")
+        key = make_key(**base)
+        self.assertEqual(key, make_key(**base, custom_instruction="  "))
+        for change in ({"model": "m2"}, {"template_version": 2}, {"normalized_input": "y"},
+                       {"transform_vegan": True}, {"custom_instruction": "no salt"}):
+            with self.subTest(change=change):
+                self.assertNotEqual(key, make_key(**{**base, **change}))
+        self.assertTrue(key.startswith("organize:"))
+        self.assertNotEqual(digest_bytes(b"ab", b"c"), digest_bytes(b"a", b"bc"))
+
+    def test_hit_skips_compute_and_failures_are_not_cached(self):
+        self.use_file_cache()
+        compute = mock.Mock(return_value={"title": "Soup"})
+        self.assertEqual(cached_llm_call("organize:k", compute), {"title": "Soup"})
+        self.assertEqual(cached_llm_call("organize:k", compute), {"title": "Soup"})
+        self.assertEqual(compute.call_count, 1)
+
+        empty = mock.Mock(return_value=None)
+        cached_llm_call("organize:none", empty)
+        cached_llm_call("organize:none", empty)
+        self.assertEqual(empty.call_count, 2)
+
+    def test_entries_expire_after_ttl(self):
+        self.use_file_cache(TTL=60)
+        cache = get_llm_cache()
+        cache.set("organize:k", {"title": "Soup"})
+        self.assertEqual(cache.get("organize:k"), {"title": "Soup"})
+        path = cache._file("organize:k")
+        stale = time.time() - 61
+        os.utime(path, (stale, stale))
+        self.assertIsNone(cache.get("organize:k"))
+        self.assertFalse(os.path.exists(path))
+
+    def test_lru_cap_evicts_least_recently_used(self):
+        self.use_file_cache(MAX_ENTRIES=2)
+        cache = get_llm_cache()
+        for i, key in enumerate(("a:1", "a:2")):
+            cache.set(key, i)
+            os.utime(cache._file(key), (time.time() - 10 + i, time.time() - 10 + i))
+        cache.get("a:1")  # refreshes its last use
+        cache.set("a:3", 3)
+        self.assertEqual((cache.get("a:1"), cache.get("a:2"), cache.get("a:3")), (0, None, 3))
+
+
+def _image_bytes(size=(256, 256), seed=0, blank=False, fmt="PNG"):
+    """Noise images hash far apart (dHash); the same seed gives a near-identical image."""
+    if blank:
+        img = Image.new("RGB", size, (200, 200, 200))
+    else:
+        img = Image.fromarray(np.random.RandomState(seed).randint(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class DishImageSelectionTests(TestCase):
+    """Local pre-filter and concurrent per-image scoring of dish image candidates."""
+
+    def setUp(self):
+        cm = override_settings(LLM_CACHE={"BACKEND": "off"})
+        cm.enable()
+        self.addCleanup(cm.disable)
+        reset_llm_cache()
+        self.addCleanup(reset_llm_cache)
+        client = mock.patch.object(data_acquisition.openai, "OpenAI")
+        client.start()
+        self.addCleanup(client.stop)
+        self.images = [
+            _image_bytes(seed=1),
+            _image_bytes(size=(64, 64), seed=2),   # too small
+            _image_bytes(blank=True),              # blank
+            _image_bytes(seed=1, fmt="JPEG"),      # re-encoded copy of 0
+            _image_bytes(seed=3),
+        ]
+
+    def score(self, answers, **kwargs):
+        """identify_best_dish_image in parallel mode with canned per-index answers."""
+        scored = []
+
+        def fake_score(client, idx, image_bytes):
+            scored.append(idx)
+            answer = answers[idx]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer() if callable(answer) else dict(answer)
+
+        with mock.patch.object(data_acquisition, "_score_dish_image", side_effect=fake_score):
+            result, image_bytes = data_acquisition.identify_best_dish_image(
+                self.images, "key", mode="parallel", prepared=True, **kwargs
+            )
+        return result, image_bytes, scored
+
+    def test_prefilter_drops_small_blank_and_duplicate_images(self):
+        kept = data_acquisition._prefilter_dish_candidates(self.images)
+        self.assertEqual([idx for idx, _, _, _ in kept], [0, 4])
+
+    def test_scores_map_back_to_original_candidates(self):
+        result, image_bytes, scored = self.score({
+            0: {"confidence": 0.3, "bounding_box": [0, 0, 0.5, 0.5]},
+            4: {"confidence": 0.6, "bounding_box": [0.1, 0.1, 0.5, 0.5]},
+        }, early_exit_confidence=0.99)
+        self.assertEqual(sorted(scored), [0, 4])
+        self.assertIs(image_bytes, self.images[4])
+        self.assertEqual((result["confidence"], result["bounding_box"]), (0.6, [25, 25, 128, 128]))
+
+    def test_failed_and_malformed_answers_are_skipped(self):
+        for bad in (ValueError("Empty content from API"), {"confidence": 0.9, "bounding_box": [0, 0, 1]},
+                    {"confidence": "high", "bounding_box": [0, 0, 1, 1]}, {"confidence": 0.9, "bounding_box": None}):
+            with self.subTest(answer=bad):
+                result, image_bytes, _ = self.score({0: bad, 4: {"confidence": 0.2, "bounding_box": [0, 0, 1, 1]}})
+                self.assertIs(image_bytes, self.images[4])
+        self.assertEqual(self.score({0: {}, 4: {"confidence": 0, "bounding_box": None}})[:2], (None, None))
+
+    def test_confident_answer_skips_remaining_candidates(self):
+        self.images = [_image_bytes(seed=seed) for seed in (1, 2, 3)]
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow():
+            release.wait(5)
+            return {"confidence": 0.1, "bounding_box": [0, 0, 1, 1]}
+
+        result, image_bytes, scored = self.score(
+            {0: {"confidence": 0.95, "bounding_box": [0, 0, 1, 1]}, 1: slow, 2: slow},
+            max_concurrency=1, early_exit_confidence=0.9,
+        )
+        self.assertIs(image_bytes, self.images[0])
+        self.assertEqual(result["confidence"], 0.95)
+        self.assertNotIn(2, scored)  # still queued behind the single worker: cancelled
+
+
+class DishRankingTests(TestCase):
+    """Batched dish ranking: model output is parsed back into candidate indices defensively."""
+
+    CANDIDATES = [(1, b"first", 200, 100), (3, b"second", 100, 100)]
+
+    def setUp(self):
+        cm = override_settings(LLM_CACHE={"BACKEND": "off"})
+        cm.enable()
+        self.addCleanup(cm.disable)
+        reset_llm_cache()
+        self.addCleanup(reset_llm_cache)
+
+    @staticmethod
+    def fake_client(content):
+        message = SimpleNamespace(content=content)
+        client = mock.Mock()
+        client.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=message)], usage=None, model="test"
+        )
+        return client
+
+    def test_best_ignores_out_of_range_duplicate_and_malformed_entries(self):
+        box = [0, 0, 1, 1]
+        ranking = [
+            {"index": 7, "confidence": 0.99, "bounding_box": box},       # not a candidate
+            {"index": True, "confidence": 0.99, "bounding_box": box},    # bool, not index 1
+            {"index": "3", "confidence": 0.99, "bounding_box": box},
+            {"index": 3, "confidence": "sure", "bounding_box": box},
+            {"index": 3, "confidence": 0.95, "bounding_box": [0, 0, 1]},
+            {"index": 1, "confidence": 0.4, "bounding_box": [0, 0, 0.5, 0.5]},
+            {"index": 1, "confidence": 0.8, "bounding_box": [0.5, 0.5, 0.5, 0.5]},  # same index again, better
+            {"index": 3, "confidence": 0.9, "bounding_box": None},
+            "junk",
+        ]
+        result, image_bytes = data_acquisition._best_from_ranking(ranking, self.CANDIDATES)
+        self.assertEqual(image_bytes, b"first")
+        self.assertEqual(result, {"index": 1, "confidence": 0.8, "bounding_box": [100, 50, 100, 50]})
+
+    def test_empty_or_non_list_ranking_selects_nothing(self):
+        for ranking in ([], None, {"index": 1}, [{"index": 1, "confidence": 0, "bounding_box": None}]):
+            with self.subTest(ranking=ranking):
+                self.assertEqual(data_acquisition._best_from_ranking(ranking, self.CANDIDATES), (None, None))
+
+    def test_batch_indices_map_back_to_candidates(self):
+        content = '```json\n{"dish_ranking": [' \
+                  '{"index": 1, "confidence": 0.9}, {"index": 0, "confidence": 0.5}, ' \
+                  '{"index": 2}, {"index": -1}, {"index": false}, "junk"]}\n```'
+        ranking = data_acquisition._rank_dish_images_batch(self.fake_client(content), self.CANDIDATES, image_parts=None)
+        self.assertEqual([(e["index"], e["confidence"]) for e in ranking], [(3, 0.9), (1, 0.5)])
+
+    def test_unusable_batch_answers_raise(self):
+        for content in ("the second one", '["dish_ranking"]', '{"ranking": []}', ""):
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                data_acquisition._rank_dish_images_batch(self.fake_client(content), self.CANDIDATES)
+
+    def test_batch_mode_falls_back_to_per_image_scoring(self):
+        images = [_image_bytes(seed=1), _image_bytes(seed=3)]
+        score = {"confidence": 0.7, "bounding_box": [0, 0, 1, 1]}
+        with mock.patch.object(data_acquisition.openai, "OpenAI", return_value=self.fake_client("not json")), \
+                mock.patch.object(data_acquisition, "_score_dish_image", side_effect=lambda c, i, b: dict(score)):
+            result, image_bytes = data_acquisition.identify_best_dish_image(images, "key", mode="batch", prepared=True)
+        self.assertIs(image_bytes, images[0])
+        self.assertEqual(result["bounding_box"], [0, 0, 256, 256])
+
+
+class ImageWorkerForkTests(TestCase):
+    """rqimageworker preloads rembg once, forks the workers and replaces crashed ones."""
+
+    def run_command(self, waits, processes=2):
+        events, handlers = [], {}
+        pids = iter(range(101, 200))
+
+        def fork():
+            events.append("fork")
+            return next(pids)
+
+        def wait():
+            outcome = waits.pop(0)
+            return outcome() if callable(outcome) else outcome
+
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch.object(rqimageworker, "warm_up_rembg", lambda: events.append("preload")), \
+                mock.patch.object(rqimageworker.connections, "close_all", lambda: events.append("close_db")), \
+                mock.patch.object(rqimageworker.os, "fork", fork), \
+                mock.patch.object(rqimageworker.os, "wait", wait), \
+                mock.patch.object(rqimageworker.os, "kill") as kill, \
+                mock.patch.object(rqimageworker.signal, "signal", lambda signum, h: handlers.setdefault(signum, h)), \
+                mock.patch.object(rqimageworker.time, "sleep"):
+            self.handlers = handlers
+            call_command("rqimageworker", processes=processes, stdout=out, stderr=err)
+        return events, kill, err.getvalue()
+
+    def test_model_is_loaded_before_forking_and_crashed_children_are_replaced(self):
+        events, _, err = self.run_command([(101, 1 << 8), (102, 0), (103, signal.SIGKILL), (104, 0)])
+        self.assertEqual(events, ["preload", "close_db", "fork", "fork", "fork", "fork"])
+        self.assertIn("101 exited with 1", err)
+        self.assertIn("103 exited with -9", err)
+
+    def test_children_stopped_by_a_signal_are_not_replaced(self):
+        def stop():
+            self.handlers[signal.SIGTERM](signal.SIGTERM, None)
+            return 101, signal.SIGTERM
+
+        events, kill, _ = self.run_command([stop, (102, signal.SIGTERM)])
+        self.assertEqual(events.count("fork"), 2)
+        self.assertEqual(sorted(c.args for c in kill.call_args_list),
+                         [(101, signal.SIGTERM), (102, signal.SIGTERM)])
+
+    def test_child_runs_one_worker_and_exits(self):
+        command = rqimageworker.Command()
+        for failure, code in ((None, 0), (RuntimeError("redis went away"), 1)):
+            with self.subTest(code=code), \
+                    mock.patch.object(rqimageworker.os, "fork", return_value=0), \
+                    mock.patch.object(rqimageworker.os, "_exit") as exit_, \
+                    mock.patch.object(rqimageworker.signal, "signal"), \
+                    mock.patch.object(command, "_work", side_effect=failure) as work:
+                command._spawn(["images"], {"burst": True})
+            work.assert_called_once_with(["images"], {"burst": True})
+            exit_.assert_called_once_with(code)
+
+
+class UploadStagingTests(TestCase):
+    """Uploads are staged by reference and verified against their checksum when read back."""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        cm = override_settings(UPLOAD_STAGING={"BACKEND": "local", "PATH": tmp})
+        cm.enable()
+        self.addCleanup(cm.disable)
+
+    def test_round_trip_and_dedup_within_batch(self):
+        photo = b"\xff\xd8 jpeg bytes"
+        batch_id, refs = stage_uploads([
+            SimpleUploadedFile("a.jpg", photo, content_type="image/jpeg"),
+            SimpleUploadedFile("b.jpg", photo, content_type="image/jpeg"),
+            SimpleUploadedFile("empty.jpg", b""),
+        ])
+        self.assertEqual(len(refs), 2)
+        self.assertEqual(refs[0]["key"], refs[1]["key"])
+        self.assertEqual((refs[0]["name"], refs[0]["size"]), ("a.jpg", len(photo)))
+        self.assertEqual(StagedFile(refs[1]).read(), photo)
+
+        delete_staged(refs)
+        self.assertFalse(staging_storage().exists(refs[0]["key"]))
+
+    def test_checksum_mismatch_is_rejected(self):
+        _, [ref] = stage_uploads([SimpleUploadedFile("a.jpg", b"original")])
+        storage = staging_storage()
+        storage.delete(ref["key"])
+        storage.save(ref["key"], ContentFile(b"tampered"))
+        with self.assertRaisesMessage(ValueError, "checksum mismatch"):
+            read_staged(ref)
+
+    def test_purge_removes_only_stale_blobs(self):
+        _, [old] = stage_uploads([SimpleUploadedFile("old.jpg", b"old")])
+        _, [new] = stage_uploads([SimpleUploadedFile("new.jpg", b"new")])
+        storage = staging_storage()
+        stale = time.time() - 25 * 3600
+        os.utime(storage.path(old["key"]), (stale, stale))
+
+        self.assertEqual(purge_stale_staging(max_age_hours=24), 1)
+        self.assertFalse(storage.exists(old["key"]))
+        self.assertTrue(storage.exists(new["key"]))
+
+
+class PdfArtifactTests(TestCase):
+    """PDF artifacts are keyed by recipe state, dropped on edits and only served after the visibility check."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user("owner", "owner@example.com", "pw", is_verified=True)
+        cls.stranger = User.objects.create_user("stranger", "stranger@example.com", "pw", is_verified=True)
+        cls.recipe = Recipe.objects.create(user=cls.owner, title="Gulasch", cook_time=60, portions=4)
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        cm = override_settings(STORAGES={
+            **settings.STORAGES,
+            "artifacts": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.tmp}},
+        })
+        cm.enable()
+        self.addCleanup(cm.disable)
+        render = mock.patch("recipes.functions.pdf_export.render_recipe_pdf_bytes", return_value=b"%PDF-1.4 test")
+        render.start()
+        self.addCleanup(render.stop)
+
+    def test_key_follows_recipe_state_and_is_not_guessable(self):
+        key = pdf_artifact_key(self.recipe)
+        self.assertEqual(key, pdf_artifact_key(Recipe.objects.get(pk=self.recipe.pk)))
+        self.assertTrue(key.startswith(f"pdf_artifacts/{self.recipe.pk}/"))
+        self.assertRegex(key, r"-v\d+-[0-9a-f]{20}\.pdf$")
+        self.recipe.save()
+        self.assertNotEqual(pdf_artifact_key(self.recipe), key)
+
+    def test_artifact_is_stored_privately_and_reused(self):
+        key = build_pdf_artifact(self.recipe)
+        self.assertEqual(get_pdf_artifact(self.recipe), key)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, key)))
+        self.assertFalse(default_storage.exists(key))
+        self.assertEqual(build_pdf_artifact(self.recipe), key)
+
+    def test_child_edit_drops_artifacts(self):
+        key = build_pdf_artifact(self.recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(recipe=self.recipe, name="Paprika")
+        self.assertFalse(artifact_storage().exists(key))
+        self.assertIsNone(get_pdf_artifact(self.recipe))
+
+    def test_download_is_streamed_to_viewers_only(self):
+        build_pdf_artifact(self.recipe)
+        url = reverse("recipes:recipe_pdf_xhtml2pdf", args=[self.recipe.pk])
+
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.force_login(self.owner)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4 test")
+        self.assertIn('attachment; filename="gulasch.pdf"', response["Content-Disposition"])
+
+
+class CookbookExportTests(TestCase):
+    """Combined PDFs are assembled chunk by chunk on disk; expired exports are purged."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user("owner", "owner@example.com", "pw", is_verified=True)
+        cls.ids = [Recipe.objects.create(user=cls.owner, title=f"Dish {i}", cook_time=5, portions=1).pk
+                   for i in range(5)]
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        cm = override_settings(STORAGES={
+            **settings.STORAGES,
+            "artifacts": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.tmp}},
+        })
+        cm.enable()
+        self.addCleanup(cm.disable)
+
+    @staticmethod
+    def _one_page_pdf(recipe, link_callback=None):
+        import fitz
+        with fitz.open() as doc:
+            doc.new_page().insert_text((72, 72), recipe.title)
+            return doc.tobytes()
+
+    def test_pdf_keeps_every_recipe_across_chunks(self):
+        import fitz
+        with mock.patch("recipes.functions.cookbook.CHUNK_SIZE", 2), \
+                mock.patch("recipes.functions.cookbook.render_recipe_pdf_bytes", side_effect=self._one_page_pdf):
+            key = export_cookbook(self.ids, "pdf", f"{self.owner.pk}/job")
+        with artifact_storage().open(key, "rb") as fh, fitz.open(stream=fh.read(), filetype="pdf") as book:
+            self.assertEqual(book.page_count, len(self.ids))
+            self.assertIn("Dish 4", book[-1].get_text())
+
+    def test_purge_removes_only_expired_exports(self):
+        storage = artifact_storage()
+        old = storage.save(f"{EXPORT_PREFIX}/{self.owner.pk}/old.zip", ContentFile(b"old"))
+        new = storage.save(f"{EXPORT_PREFIX}/{self.owner.pk}/new.zip", ContentFile(b"new"))
+        stale = time.time() - 25 * 3600
+        os.utime(storage.path(old), (stale, stale))
+
+        self.assertEqual(purge_stale_exports(max_age_hours=24), 1)
+        self.assertFalse(storage.exists(old))
+        self.assertTrue(storage.exists(new))
+
+
+class ImageVariantTests(TestCase):
+    """Resized WebP/AVIF variants are built once per image; templates fall back to the original until then."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        cm = override_settings(STORAGES={
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": media}},
+        })
+        cm.enable()
+        self.addCleanup(cm.disable)
+        user = get_user_model().objects.create_user("cook", "cook@example.com", "pw", is_verified=True)
+        self.recipe = Recipe.objects.create(user=user, title="Soup", cook_time=10, portions=2)
+        self.recipe.image.save("soup.png", ContentFile(_image_bytes(size=(400, 300))), save=False)
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=self.recipe.image.name)
+
+    def render(self, source):
+        return Template("{% load recipe_images %}" + source).render(Context({"recipe": self.recipe}))
+
+    def test_variants_are_built_from_the_original(self):
+        manifest = generate_recipe_image_variants(self.recipe)
+        self.assertEqual(manifest["source"], self.recipe.image.name)
+        self.assertEqual({v: (e["w"], e["h"]) for v, e in manifest["sizes"].items()},
+                         {"large": (400, 300), "card": (400, 300), "thumb": (160, 120)})  # never upscaled
+        for entry in manifest["sizes"].values():
+            for fmt in VARIANT_FORMATS:
+                self.assertTrue(default_storage.exists(entry[fmt]))
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).image_variants, manifest)
+        self.assertTrue(variants_current(self.recipe))
+
+        thumb = manifest["sizes"]["thumb"]
+        self.assertEqual(self.render("{{ recipe|recipe_image_url:'thumb' }}"), default_storage.url(thumb["webp"]))
+        picture = self.render('{% recipe_picture recipe "thumb" alt="Soup" %}')
+        self.assertIn('<source type="image/webp" srcset="%s">' % default_storage.url(thumb["webp"]), picture)
+        self.assertIn('width="160" height="120"', picture)
+
+    def test_tag_falls_back_to_the_original_without_variants(self):
+        original = self.recipe.image.url
+        for manifest in ({}, {"v": 1, "source": "recipe_images/older.png", "sizes": {"thumb": {"webp": "x.webp"}}}):
+            with self.subTest(manifest=manifest):
+                self.recipe.image_variants = manifest
+                self.assertEqual(self.render("{{ recipe|recipe_image_url:'thumb' }}"), original)
+                self.assertHTMLEqual(
+                    self.render('{% recipe_picture recipe "thumb" alt="Soup" %}'),
+                    f'<img src="{original}" alt="Soup" loading="lazy">',
+                )
+
+
+@override_settings(SHOWCASE={"POOL_SIZE": 50})
+class ShowcasePoolTests(TestCase):
+    """The showcase pool stays dense under adds and removes, in a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user("owner", "owner@example.com", "pw", is_verified=True)
+
+    def setUp(self):
+        patcher = mock.patch("recipes.signals.schedule_image_variants")  # no variant builds for fake images
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make(self, count, visibility="public"):
+        # bulk_create sends no signals: the tests drive the pool explicitly
+        return [r.pk for r in Recipe.objects.bulk_create([
+            Recipe(user=self.owner, title=f"Dish {i}", cook_time=5, portions=1,
+                   visibility=visibility, image=f"recipe_images/dish-{i}.jpg")
+            for i in range(count)
+        ])]
+
+    def pool(self):
+        return dict(ShowcaseSlot.objects.values_list("slot", "recipe_id"))
+
+    def assertDense(self):
+        self.assertEqual(sorted(self.pool()), list(range(len(self.pool()))))
+
+    def test_add_and_remove_keep_slots_dense(self):
+        ids = self.make(8)
+        sync_showcase(ids)
+        self.assertEqual(set(self.pool().values()), set(ids))
+        self.assertDense()
+
+        gone = ids[1:6:2]
+        Recipe.objects.filter(pk__in=gone).update(visibility="private")
+        sync_showcase(gone)
+        self.assertEqual(set(self.pool().values()), set(ids) - set(gone))
+        self.assertDense()
+
+    def test_query_count_does_not_grow_with_ids(self):
+        counts = []
+        for batch in (self.make(2), self.make(20)):
+            with inspect_queries() as queries:
+                sync_showcase(batch)
+            counts.append(queries.count)
+            Recipe.objects.filter(pk__in=batch).update(visibility="private")
+            with inspect_queries() as queries:
+                sync_showcase(batch)
+            counts.append(queries.count)
+        self.assertEqual(counts[:2], counts[2:])
+        self.assertDense()
+
+    @override_settings(SHOWCASE={"POOL_SIZE": 5})
+    def test_full_pool_replaces_random_slots(self):
+        first = self.make(5)
+        sync_showcase(first)
+        later = self.make(3)
+        sync_showcase(later)
+        pool = self.pool()
+        self.assertEqual(sorted(pool), list(range(5)))
+        self.assertEqual(len(set(pool.values()) & set(later)), 3)
+
+    def test_save_and_delete_sync_after_commit(self):
+        recipe = Recipe.objects.create(user=self.owner, title="Soup", cook_time=5, portions=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.visibility = "public"
+            recipe.image = "recipe_images/soup.jpg"
+            recipe.save()
+        self.assertIn(recipe.pk, self.pool().values())
+
+        sync_showcase(self.make(4))
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertNotIn(recipe.pk, self.pool().values())
+        self.assertEqual(len(self.pool()), 4)
+        self.assertDense()
+
+    def test_showcase_errors_never_fail_the_save(self):
+        recipe = Recipe.objects.create(user=self.owner, title="Soup", cook_time=5, portions=1)
+        with mock.patch("recipes.functions.showcase.sync_showcase", side_effect=RuntimeError("boom")):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.visibility = "public"
+                recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.visibility, "public")
+
+
+class RecipePermissionTests(TestCase):
+    """can_view / can_copy / can_edit for each visibility, and their batched form."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user("owner", "owner@example.com", "pw", is_verified=True)
+        cls.friend = User.objects.create_user("friend", "friend@example.com", "pw", is_verified=True)
+        cls.stranger = User.objects.create_user("stranger", "stranger@example.com", "pw", is_verified=True)
+        Friendship.objects.create(user=cls.owner, friend=cls.friend)
+        Friendship.objects.create(user=cls.friend, friend=cls.owner)
+        cls.recipes = {
+            visibility: Recipe.objects.create(user=cls.owner, title=visibility, cook_time=5, portions=1,
+                                              visibility=visibility)
+            for visibility in ("private", "friends", "public")
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    # (view, copy, edit) per visibility
+    EXPECTED = {
+        "owner": {"private": (True, False, True), "friends": (True, True, True), "public": (True, True, True)},
+        "friend": {"private": (False, False, False), "friends": (True, True, False), "public": (True, True, False)},
+        "stranger": {"private": (False, False, False), "friends": (False, False, False), "public": (True, True, False)},
+        "anonymous": {"private": (False, False, False), "friends": (False, False, False), "public": (True, False, False)},
+    }
+
+    def users(self):
+        return {"owner": self.owner, "friend": self.friend, "stranger": self.stranger, "anonymous": AnonymousUser()}
+
+    def test_single_checks(self):
+        for who, user in self.users().items():
+            for visibility, recipe in self.recipes.items():
+                with self.subTest(user=who, visibility=visibility):
+                    got = (can_view(user, recipe), bool(can_copy(user, recipe)), bool(can_edit(user, recipe)))
+                    self.assertEqual(got, self.EXPECTED[who][visibility])
+
+    def test_batched_checks_match_and_match_visible_to(self):
+        for who, user in self.users().items():
+            permissions = recipe_permissions(user, self.recipes.values())
+            visible = set(Recipe.objects.visible_to(user).values_list("pk", flat=True))
+            for visibility, recipe in self.recipes.items():
+                with self.subTest(user=who, visibility=visibility):
+                    p = permissions[recipe.pk]
+                    self.assertEqual((p["view"], p["copy"], p["edit"]), self.EXPECTED[who][visibility])
+                    self.assertEqual(p["view"], recipe.pk in visible)
+
+    def test_page_of_recipes_costs_one_friend_lookup(self):
+        recipe_permissions(self.friend, self.recipes.values())  # warm the friend graph
+        with self.assertNumQueries(0):
+            recipe_permissions(self.friend, self.recipes.values())
+
+
+class BulkVisibilityTests(TestCase):
+    """bulk_set_visibility applies a whole selection in a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user("owner", "owner@example.com", "pw", is_verified=True)
+        cls.other = User.objects.create_user("other", "other@example.com", "pw", is_verified=True)
+
+    def make(self, count, user=None):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(user=user or self.owner, title=f"Dish {i}", cook_time=5, portions=1,
+                   image=f"recipe_images/dish-{i}.jpg")
+            for i in range(count)
+        ])
+        Ingredient.objects.bulk_create([Ingredient(recipe=r, name="Zwiebel") for r in recipes])
+        return [r.pk for r in recipes]
+
+    def publish(self, ids):
+        with inspect_queries() as queries, self.captureOnCommitCallbacks(execute=True):
+            outcomes = set_all_visibility(self.owner, ids, "public")
+        return outcomes, queries.count
+
+    def test_outcomes_per_id(self):
+        mine, theirs = self.make(1), self.make(1, user=self.other)
+        Recipe.objects.filter(pk=mine[0]).update(visibility="friends")
+        outcomes = bulk_set_visibility(self.owner, {mine[0]: "friends", theirs[0]: "public", "x": "public"})
+        self.assertEqual(outcomes, {mine[0]: UNCHANGED, theirs[0]: NOT_FOUND, "x": INVALID})
+        self.assertEqual(bulk_set_visibility(self.owner, {mine[0]: "secret"}), {mine[0]: INVALID})
+
+    def test_query_count_does_not_grow_with_selection(self):
+        _, few = self.publish(self.make(2))
+        outcomes, many = self.publish(self.make(20))
+        self.assertEqual(set(outcomes.values()), {UPDATED})
+        self.assertEqual(few, many)
+        self.assertEqual(ShowcaseSlot.objects.count(), 22)
+        self.assertEqual(
+            IngredientSuggestion.objects.get(user=self.owner, visibility="public", name="zwiebel").occurrences, 22
+        )
+
+
+class CopyRecipesTests(TestCase):
+    """copy_recipes creates private copies owned by the copier, sharing or duplicating the image."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user("owner", "owner@example.com", "pw", is_verified=True)
+        cls.friend = User.objects.create_user("friend", "friend@example.com", "pw", is_verified=True)
+        cls.stranger = User.objects.create_user("stranger", "stranger@example.com", "pw", is_verified=True)
+        Friendship.objects.create(user=cls.owner, friend=cls.friend)
+        Friendship.objects.create(user=cls.friend, friend=cls.owner)
+        cls.recipes = {}
+        for visibility in ("private", "friends", "public"):
+            recipe = Recipe.objects.create(user=cls.owner, title=f"Gulasch {visibility}", cook_time=60,
+                                           portions=4, visibility=visibility)
+            Ingredient.objects.create(recipe=recipe, category="Zutaten", name="Paprika", quantity=2, unit="Stk")
+            Instruction.objects.create(recipe_id=recipe, step_number=1, description="Anbraten")
+            cls.recipes[visibility] = recipe
+
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        cm = override_settings(STORAGES={
+            **settings.STORAGES,
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": tmp}},
+        })
+        cm.enable()
+        self.addCleanup(cm.disable)
+        public = self.recipes["public"]
+        public.image.name = default_storage.save("recipe_images/gulasch.jpg", ContentFile(b"jpeg"))
+        public.image_variants = {"sizes": {"thumb": "recipe_images/variants/gulasch-thumb.webp"}}
+        Recipe.objects.filter(pk=public.pk).update(image=public.image.name, image_variants=public.image_variants)
+
+    def test_only_shared_visible_recipes_are_copied(self):
+        all_ids = [r.pk for r in self.recipes.values()]
+        self.assertEqual({c.title for c in copy_recipes(self.friend, all_ids)}, {"Gulasch friends", "Gulasch public"})
+        self.assertEqual([c.title for c in copy_recipes(self.stranger, all_ids)], ["Gulasch public"])
+        self.assertEqual(copy_recipes(self.owner, [self.recipes["private"].pk]), [])
+
+    def test_copies_are_private_and_owned_by_the_copier(self):
+        [copy] = copy_recipes(self.stranger, source_user_id=self.owner.pk)
+        copy.refresh_from_db()
+        self.assertEqual((copy.user, copy.visibility), (self.stranger, "private"))
+        self.assertEqual(
+            list(copy.ingredients.values_list("category", "name", "quantity", "unit")),
+            [("Zutaten", "Paprika", 2, "Stk")],
+        )
+        self.assertEqual(list(copy.instructions.values_list("step_number", "description")), [(1, "Anbraten")])
+        self.assertEqual(Recipe.objects.get(pk=self.recipes["public"].pk).user, self.owner)
+        self.assertTrue(can_edit(self.stranger, copy))
+
+    def test_reference_mode_shares_the_stored_image(self):
+        [copy] = copy_recipes(self.stranger, [self.recipes["public"].pk], image_mode="reference")
+        copy.refresh_from_db()
+        self.assertEqual(copy.image.name, "recipe_images/gulasch.jpg")
+        self.assertEqual(copy.image_variants, self.recipes["public"].image_variants)
+
+    def test_duplicate_mode_stores_a_new_blob(self):
+        with mock.patch("recipes.functions.copying.schedule_image_variants") as schedule:
+            [copy] = copy_recipes(self.stranger, [self.recipes["public"].pk], image_mode="duplicate")
+        copy.refresh_from_db()
+        self.assertNotEqual(copy.image.name, "recipe_images/gulasch.jpg")
+        with default_storage.open(copy.image.name, "rb") as fh:
+            self.assertEqual(fh.read(), b"jpeg")
+        schedule.assert_called_once_with(copy.pk)
+
+    def test_unknown_image_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            copy_recipes(self.stranger, [self.recipes["public"].pk], image_mode="link")
+
+
+class _FakeAsyncRedis:
+    """Just enough of redis.asyncio for stream_job_events: stored last events plus a queue of live messages."""
+
+    def __init__(self, last, live):
+        self.last, self.live = last, list(live)
+
+    async def get(self, key):
+        return self.last.get(key)
+
+    def pubsub(self):
+        return self
+
+    async def subscribe(self, *channels):
+        self.channels = channels
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        return {"data": self.live.pop(0)} if self.live else None
+
+    async def unsubscribe(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+class JobEventStreamTests(TestCase):
+    """The SSE stream forwards only events published for the subscribing user."""
+
+    @staticmethod
+    def event(job_id, event, user_id):
+        return json.dumps({"job_id": job_id, "event": event, "user_id": user_id})
+
+    def stream(self, job_ids, last, live, user_id=1):
+        async def collect():
+            return [frame async for frame in stream_job_events(job_ids, user_id, max_seconds=1, heartbeat=0)]
+
+        fake = _FakeAsyncRedis({LAST_PREFIX + jid: raw.encode() for jid, raw in last.items()}, live)
+        with mock.patch("redis.asyncio.Redis.from_url", return_value=fake):
+            frames = asyncio.run(collect())
+        frames = [f for f in frames if f.startswith("event: ") and not f.startswith("event: end")]
+        return [json.loads(f.split("data: ", 1)[1]) for f in frames]
+
+    def test_only_the_owners_events_are_forwarded(self):
+        events = self.stream(
+            ["mine", "ownerless", "theirs"],
+            last={"mine": self.event("mine", "started", 1), "ownerless": self.event("ownerless", "stage", None),
+                  "theirs": self.event("theirs", "stage", 2)},
+            live=[self.event("mine", "stage", None), self.event("mine", "stage", 2),
+                  self.event("ownerless", "finished", None), self.event("mine", "finished", 1)],
+        )
+        self.assertEqual([(e["job_id"], e["event"]) for e in events], [("mine", "started"), ("mine", "finished")])
+
+    def test_anonymous_subscriber_gets_nothing(self):
+        events = self.stream(["job"], last={"job": self.event("job", "stage", None)}, live=[], user_id=None)
+        self.assertEqual(events, [])
+
+
+class ImportJobRecordTests(TestCase):
+    """@records_import_job keeps one ImportJob row per run with its outcome and stage timings."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("cook", "cook@example.com", "pw", is_verified=True)
+        self.recipe = Recipe.objects.create(user=self.user, title="Soup", cook_time=10, portions=2)
+
+    def run_job(self, body, job=None):
+        @records_import_job("url")
+        def task(user_id):
+            with import_stage("llm"):
+                record_llm_usage(SimpleNamespace(
+                    usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5), model="test"
+                ))
+            record_input("https://example.com/soup")
+            return body()
+
+        with mock.patch("recipes.functions.import_jobs.get_current_job", return_value=job):
+            return task(self.user.pk)
+
+    def test_success_is_recorded(self):
+        def body():
+            record_payload(image_bytes=7)
+            return {"status": "success", "recipe_id": self.recipe.pk}
+
+        self.run_job(body)
+        job = ImportJob.objects.get()
+        self.assertEqual((job.status, job.source, job.user, job.recipe), ("finished", "url", self.user, self.recipe))
+        self.assertEqual(set(job.stage_ms), {"llm"})
+        self.assertEqual((job.llm_calls, job.prompt_tokens, job.completion_tokens), (1, 10, 5))
+        self.assertEqual((job.input_bytes, job.image_bytes), (len("https://example.com/soup"), 7))
+        self.assertEqual(len(job.input_hash), 64)
+        self.assertIsNotNone(job.finished_at)
+        self.assertGreaterEqual(job.total_ms, job.stage_ms["llm"])
+
+    def test_job_failed_is_recorded_and_reraised(self):
+        def body():
+            raise JobFailed("llm_failed", "The model did not answer.")
+
+        with self.assertRaises(JobFailed):
+            self.run_job(body)
+        job = ImportJob.objects.get()
+        self.assertEqual((job.status, job.error_code, job.error_message),
+                         ("failed", "llm_failed", "The model did not answer."))
+        self.assertIsNone(job.recipe)
+        self.assertEqual(job.llm_calls, 1)  # work done before the failure is kept
+
+    def test_retried_job_reuses_its_row(self):
+        enqueued = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(seconds=2)  # RQ: naive UTC
+        job = SimpleNamespace(id="job-1", enqueued_at=enqueued)
+        with self.assertRaises(RuntimeError):
+            self.run_job(mock.Mock(side_effect=RuntimeError("network")), job=SimpleNamespace(
+                **vars(job), get_meta=lambda refresh: {"error_code": "scrape_failed"}
+            ))
+        self.assertEqual(ImportJob.objects.get().error_code, "scrape_failed")
+        self.run_job(lambda: {"recipe_id": self.recipe.pk}, job=job)
+        record = ImportJob.objects.get(job_id="job-1")
+        self.assertEqual((record.status, record.error_code), ("finished", ""))
+        self.assertGreaterEqual(record.queue_ms, 2000)
+        self.assertEqual(record.enqueued_at, enqueued.replace(tzinfo=datetime.timezone.utc))
+
+    def test_percentiles_on_small_samples(self):
+        self.assertEqual(_summary([]), {"count": 0})
+        self.assertEqual(_summary([5]), {"count": 1, "mean": 5, "p50": 5, "p90": 5, "p95": 5, "p99": 5})
+        self.assertEqual(_summary([20, 10]), {"count": 2, "mean": 15, "p50": 15, "p90": 19, "p95": 19.5, "p99": 19.9})
+        self.assertEqual(percentile([1, 2, 3], 0), 1)
+        self.assertEqual(percentile([1, 2, 3], 100), 3)
+
+
+class MetricsEndpointTests(TestCase):
+    """/metrics needs the bearer token when one is configured, a staff user otherwise."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user("ops", "ops@example.com", "pw", is_verified=True, is_staff=True)
+        cls.cook = User.objects.create_user("cook", "cook@example.com", "pw", is_verified=True)
+
+    def get(self, user=None, **headers):
+        if user:
+            self.client.force_login(user)
+        return self.client.get(reverse("metrics"), headers=headers)
+
+    def test_token_is_required_when_configured(self):
+        with override_settings(METRICS={**settings.METRICS, "TOKEN": "s3cret"}):
+            self.assertEqual(self.get().status_code, 401)
+            self.assertEqual(self.get(Authorization="Bearer wrong").status_code, 401)
+            self.assertEqual(self.get(self.staff).status_code, 401)  # the token replaces the staff check
+            response = self.get(Authorization="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+    def test_staff_only_without_token(self):
+        with override_settings(METRICS={**settings.METRICS, "TOKEN": ""}):
+            self.assertEqual(self.get().status_code, 403)
+            self.assertEqual(self.get(self.cook).status_code, 403)
+            self.assertEqual(self.get(self.staff).status_code, 200)
+
+    def test_instrumentation_runs_inside_the_security_middleware(self):
+        order = settings.MIDDLEWARE.index
+        security = order("django.middleware.security.SecurityMiddleware")
+        self.assertLess(security, order("recipes.middleware.MetricsMiddleware"))
+        self.assertLess(security, order("recipes.middleware.QueryInspectorMiddleware"))
+
+
+class WorkerConnectionTests(TestCase):
+    """ConnectionReusingWorker treats each job like a request; the backend times connection setup."""
+
+    def run_job(self, outcome):
+        calls = []
+        worker = ConnectionReusingWorker.__new__(ConnectionReusingWorker)
+
+        def execute_job(job, queue):
+            calls.append("job")
+            return outcome()
+
+        with mock.patch("recipes.workers.close_old_connections", lambda: calls.append("close")), \
+                mock.patch("rq.SimpleWorker.execute_job", side_effect=execute_job):
+            try:
+                return worker.execute_job(object(), object()), calls
+            except RuntimeError:
+                return None, calls
+
+    def test_connections_are_checked_around_each_job(self):
+        result, calls = self.run_job(lambda: True)
+        self.assertTrue(result)
+        self.assertEqual(calls, ["close", "job", "close"])
+
+    def test_connections_are_checked_after_a_failing_job(self):
+        def boom():
+            raise RuntimeError("job crashed")
+
+        _, calls = self.run_job(boom)
+        self.assertEqual(calls, ["close", "job", "close"])
+
+    def test_backend_times_new_connections(self):
+        from django.db.backends.postgresql import base as postgresql
+        from recipes.db_backend.base import DB_CONNECT_SECONDS, DatabaseWrapper, process_role
+
+        wrapper = DatabaseWrapper({**connections["default"].settings_dict, "OPTIONS": {}}, alias="timed")
+        raw = object()
+        with mock.patch.object(postgresql.DatabaseWrapper, "get_new_connection", return_value=raw), \
+                mock.patch.object(DB_CONNECT_SECONDS, "observe") as observe:
+            self.assertIs(wrapper.get_new_connection({}), raw)
+        seconds = observe.call_args.args[0]
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(observe.call_args.kwargs, {"role": process_role(), "pooled": "no"})
+
+
+class BenchmarkSmokeTests(TestCase):
+    """benchmark_imports runs every scenario offline on a tiny corpus and writes its report."""
+
+    def setUp(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.corpus, self.images, self.output = root / "corpus", root / "images", root / "results.json"
+        (self.corpus / "bench").mkdir(parents=True)
+        self.images.mkdir()
+        recipes = [{
+            "title": title, "cook_time": "10", "portions": "2",
+            "ingredients": [{"category": "", "items": [{"name": name, "quantity": 1.0, "unit": "Stk"}]}],
+            "instructions": [f"{name} schneiden", "servieren"],
+        } for title, name in (("Salat", "Gurke"), ("Suppe", "Tomate"))]
+        (self.corpus / "bench" / "recipe_data.json").write_text(json.dumps(recipes), encoding="utf-8")
+        for i, color in enumerate(("red", "green")):
+            Image.new("RGB", (64, 48), color).save(self.images / f"dish{i}.png")
+
+    def test_all_scenarios_run_end_to_end(self):
+        call_command("benchmark_imports", corpus=str(self.corpus), images=str(self.images),
+                     iterations=1, warmup=0, rembg="stub", no_isolate=True, output=str(self.output),
+                     stdout=io.StringIO())
+        report = json.loads(self.output.read_text(encoding="utf-8"))
+        self.assertEqual(set(report["scenarios"]), set(SCENARIOS))
+        for name, result in report["scenarios"].items():
+            with self.subTest(scenario=name):
+                self.assertNotIn("error", result)
+                self.assertEqual(result["iterations"], 1)
+                self.assertGreater(result["items"], 0)
+        self.assertEqual(report["meta"]["options"]["iterations"], 1)
+        self.assertEqual(Recipe.objects.count(), 0)  # every scenario rolls back
+
+
+class SyntheticDatasetGuardTests(TestCase):
+    """Synthetic data is only written into local or test databases unless explicitly allowed."""
+
+    def database(self, **settings_dict):
+        conn = connections["default"]
+        patches = [mock.patch.object(conn, "vendor", "postgresql"),
+                   mock.patch.dict(conn.settings_dict, settings_dict)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_local_and_test_databases_are_scratch(self):
+        self.assertTrue(is_scratch_database())  # SQLite
+        for db in ({"HOST": "localhost", "NAME": "recipes"}, {"HOST": "/var/run/postgresql", "NAME": "recipes"},
+                   {"HOST": "db.example.supabase.co", "NAME": "test_recipes"}):
+            with self.subTest(db=db):
+                self.database(**db)
+                self.assertTrue(is_scratch_database())
+
+    def test_remote_database_is_refused_before_writing(self):
+        self.database(HOST="aws-0-eu-central-1.pooler.supabase.com", NAME="postgres")
+        self.assertFalse(is_scratch_database())
+        with self.assertRaises(LiveDatabaseError):
+            generate_dataset(users=2, recipes=5)
+        self.assertFalse(synthetic_users().exists())
+        ensure_scratch_database(allow_live=True)  # --i-know
@@ -20,11 +20,18 @@ urlpatterns = [
     path('recipes/add-from-text/', views.add_recipe_from_text, name='add_recipe_from_text'),
     path('friends/recipes/<int:friend_id>/', views.friends_recipes, name='friends_recipes'),
     path('copy/<int:recipe_id>/', views.copy_recipe, name='copy_recipe'),
+    path('copy/bulk/', views.copy_recipes_bulk, name='copy_recipes_bulk'),
     path('update-visibility/', views.update_visibility_ajax, name='update_visibility'),
     path('create-options/', views.create_recipe_landing, name='create_recipe_landing'),
     path("public/", views.public_recipes, name="public_recipes"),
     path("recipe/<int:recipe_id>/pdf/", views.recipe_pdf, name="recipe_pdf_xhtml2pdf"),
     path("job-status/", views.job_status, name="job_status"),
+    path("job-events/", views.job_events, name="job_events"),
+    path("ingredient-suggestions/", views.ingredient_suggestions, name="ingredient_suggestions"),
+    path("search/", views.search_recipes, name="search_recipes"),
+    path("cookbook-export/", views.cookbook_export, name="cookbook_export"),
+    path("cookbook-export/<str:job_id>/", views.cookbook_export_status, name="cookbook_export_status"),
+    path("cookbook-export/<str:job_id>/download/", views.cookbook_export_download, name="cookbook_export_download"),
 ]
 
 
@@ -4,7 +4,7 @@ import redis
 from rq.job import Job
 from django_rq import get_connection
 from django.views.decorators.http import require_GET
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.contrib import messages
@@ -16,9 +16,9 @@ from django.http import HttpResponseForbidden
 from .forms import RecipeForm, IngredientFormSet, InstructionFormSet
 from django.contrib import messages
 from .forms import AddRecipeForm
-from .models import Recipe, Ingredient, Instruction
+from .models import Recipe, Ingredient, Instruction, ImportJob, normalize_ingredient_name
 from django.conf import settings
-from accounts.models import Friendship
+from accounts.friend_graph import are_friends, friend_users
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
@@ -27,26 +27,48 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 import json
 from django.shortcuts import redirect, get_object_or_404
-from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
 from django.http import HttpResponse, HttpResponseForbidden, Http404
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
-from django.db.models import Q
+from django.db.models import Prefetch, Q
+from django.db import transaction
 from accounts.models import CustomUser
 from . import tasks
 from .tasks import process_recipe_from_uploads
 from .tasks import process_recipe_from_manual_llm
+from .tasks import process_bulk_copy
 
 from .functions.pipelines import *  
 from .functions.data_acquisition import *
 from .forms import ParseWithLLMForm
+from .functions.staging import stage_upload, stage_uploads, new_batch_id
+from .functions.image_variants import variant_url
+from .functions.showcase import draw_showcase
+from .functions.permissions import can_copy, can_edit, recipe_permissions
+from .functions.job_events import publish_job_event, stream_job_events
+from .functions.metrics import render_metrics
+from .functions.query_budget import query_budget
+from .functions.copying import IMAGE_MODES, copy_recipes, copyable_recipes
+from .functions.visibility import INVALID, NOT_FOUND, UPDATED, bulk_set_visibility, set_all_visibility
 
 ingredient_formset = IngredientFormSet(prefix="ingredients")
 instruction_formset = InstructionFormSet(prefix="instructions")
 
 
+def _remember_import_job(request, resp, job):
+    """
+    Hand the job id to the browser (short-lived last_import_job cookie, read by
+    base.html) and announce it on the job's event channel.
+    """
+    existing = request.COOKIES.get('last_import_job')
+    val = job.id if not existing else f"{existing},{job.id}"
+    resp.set_cookie('last_import_job', val, max_age=900, samesite='Lax')
+    publish_job_event(job.id, "queued", user_id=request.user.id)
+
+
 # Helper function to safe enqueue a job
 
 def get_safe_rq_queue(name: str = "default"):
@@ -75,60 +97,34 @@ from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
-try:
-    # adjust import path to wherever your Friendship model lives
-    from accounts.models import Friendship
-except Exception:
-    Friendship = None
 
 
-def _friend_users_for(user):
+def _filter_by_ingredients(recipes_qs, request):
     """
-    Return a queryset of CustomUser friends for `user`,
-    handling either a direct M2M to User or a Friendship through-model.
+    Server-side "recipes containing ALL of these ingredients" filter.
+    Each ?ing=<name> becomes an indexed semi-join on Ingredient.normalized_name,
+    so pagination runs over the filtered set. Returns (queryset, terms, querystring).
     """
-    # Case A: direct M2M to the user model (user.friends is a manager of User)
-    if hasattr(user, "friends") and getattr(user.friends, "model", None) is User:
-        return user.friends.all().order_by("username")
-
-    # Case B: Friendship model with user<->friend links
-    if Friendship is not None:
-        # Collect the other side's user IDs
-        pairs = Friendship.objects.filter(
-            Q(user=user) | Q(friend=user)
-        ).values_list("user_id", "friend_id")
-
-        uid = user.id
-        friend_ids = []
-        for u_id, f_id in pairs:
-            friend_ids.append(f_id if u_id == uid else u_id)
-
-        # de-duplicate while preserving order
-        seen = set()
-        friend_ids = [fid for fid in friend_ids if not (fid in seen or seen.add(fid))]
-
-        if not friend_ids:
-            return User.objects.none()
-        # return actual users, ordered by username
-        return User.objects.filter(id__in=friend_ids).order_by("username")
-
-    # Fallback: no friends at all
-    return User.objects.none()
+    terms = sorted({normalize_ingredient_name(t) for t in request.GET.getlist('ing')} - {''})
+    for term in terms:
+        recipes_qs = recipes_qs.filter(
+            recipe_id__in=Ingredient.objects.filter(normalized_name=term).values('recipe_id')
+        )
+    ing_query = ''.join(f'&{urlencode({"ing": t})}' for t in terms)
+    return recipes_qs, terms, ing_query
 
 
 @login_required
+@query_budget(6)
 def home(request):
     recipes = (
         Recipe.objects.filter(user=request.user).order_by("-created_at")[:10]
     )
 
-    random_images = (
-        Recipe.objects.filter(visibility="public")
-        .exclude(image="")
-        .order_by("?")[:12]
-    )
+    # random draw from the precomputed showcase pool (no ORDER BY random())
+    random_images = draw_showcase(12)
 
-    friends = _friend_users_for(request.user)
+    friends = friend_users(request.user)
 
     return render(
         request,
@@ -150,6 +146,22 @@ from django.views.decorators.http import require_GET
 from django_rq import get_connection
 from rq.job import Job
 
+def _import_job_payload(record):
+    """job_status response for a job that is only known from its ImportJob row."""
+    if record.status == "failed":
+        return {
+            "status": "failed",
+            "error_code": record.error_code or "unknown",
+            "error_message": record.error_message or "Import failed.",
+        }
+    if record.status == "finished":
+        payload = {"status": "finished", "ok": True, "recipe_id": record.recipe_id}
+        if record.recipe:
+            payload["title"] = record.recipe.title
+        return payload
+    return {"status": "started"}
+
+
 @require_GET
 @login_required
 def job_status(request):
@@ -161,7 +173,12 @@ def job_status(request):
         conn = get_connection("default")
         job = Job.fetch(job_id, connection=conn)
     except Exception:
-        return JsonResponse({"status": "error", "message": "invalid job_id"}, status=404)
+        # RQ keeps no results (RESULT_TTL 0) and drops failures after an hour:
+        # finished and older jobs are answered from their ImportJob record.
+        record = ImportJob.objects.filter(job_id=job_id, user=request.user).select_related("recipe").first()
+        if record is None:
+            return JsonResponse({"status": "error", "message": "invalid job_id"}, status=404)
+        return JsonResponse(_import_job_payload(record))
 
     if job.is_finished:
         result = job.result or {}
@@ -186,10 +203,51 @@ def job_status(request):
     return JsonResponse({"status": "queued"})
 
 
+@require_GET
+@login_required
+async def job_events(request):
+    """
+    Server-Sent Events stream for ?job_id=<id>[,<id>...]: pushes the
+    queued/started/stage/finished/failed events the tasks publish, so the
+    browser does not have to poll job_status. Needs the ASGI server
+    (config/asgi.py); under WSGI it would hold a worker for the whole stream.
+    """
+    job_ids = [j for j in (request.GET.get("job_id") or "").split(",") if j][:10]
+    if not job_ids:
+        return JsonResponse({"status": "error", "message": "job_id missing"}, status=400)
+    user = await request.auser()
+    resp = StreamingHttpResponse(stream_job_events(job_ids, user.id), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+
 ########################### /JOB STATUS #########################
 #endregion JOB STATUS
 
 
+#region METRICS
+########################### METRICS #########################
+
+@require_GET
+def metrics(request):
+    """
+    Prometheus scrape endpoint (routed at /metrics in config/urls.py):
+    request, job, import-stage, LLM and storage metrics of all web and worker
+    processes. Bearer METRICS["TOKEN"] when configured, staff users otherwise.
+    """
+    token = getattr(settings, "METRICS", {}).get("TOKEN")
+    if token:
+        if request.headers.get("Authorization", "") != f"Bearer {token}":
+            return HttpResponse("Unauthorized", status=401)
+    elif not request.user.is_staff:
+        return HttpResponseForbidden("Staff only.")
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+########################### /METRICS #########################
+#endregion METRICS
+
+
 #region MANAGE RECIPES
 ########################## MANAGING RECIPES ##########################
 
@@ -200,14 +258,31 @@ def create_recipe_landing(request):
 
 
 # Render a Recipe Template
+@query_budget(5)
 def recipe_detail(request, recipe_id):
-    recipe = get_object_or_404(Recipe, recipe_id=recipe_id)
+    recipe = get_object_or_404(
+        Recipe.objects.visible_to(request.user)
+        .select_related("user")
+        .prefetch_related(
+            Prefetch("ingredients", queryset=Ingredient.objects.select_related("linked_recipe")),
+            "instructions",
+        ),
+        recipe_id=recipe_id,
+    )
+    # Only link ingredients to recipes this user may open (decided in memory)
+    ingredients = recipe.ingredients.all()
+    linked = recipe_permissions(request.user, [i.linked_recipe for i in ingredients if i.linked_recipe])
+    for ingredient in ingredients:
+        ingredient.link_visible = bool(ingredient.linked_recipe and linked[ingredient.linked_recipe_id]["view"])
+
     return render(request, 'recipes/recipe_detail.html', {
-        'recipe': recipe
+        'recipe': recipe,
+        'permissions': recipe_permissions(request.user, [recipe])[recipe.pk],
     })
 
 # Render all Recipes
 @login_required
+@query_budget(4)
 def recipe_list(request):
     recipes_qs = Recipe.objects.filter(user=request.user)
     # Determine sorting field and direction from query params (default: created_at desc)
@@ -217,37 +292,29 @@ def recipe_list(request):
         sort_field = 'created_at'
         direction = 'desc'
     order_by_expr = sort_field if direction == 'asc' else f'-{sort_field}'
-    recipes_qs = recipes_qs.order_by(order_by_expr).prefetch_related('ingredients')
-    # Get all ingredient names for this user's recipes (for dynamic suggestions)
-    all_names = Ingredient.objects.filter(recipe__user=request.user).values_list('name', flat=True).distinct()
-    all_names = sorted({name.lower() for name in all_names})
-    # Paginate the recipes queryset (e.g., 10 per page)
+    recipes_qs, ing_terms, ing_query = _filter_by_ingredients(recipes_qs.order_by(order_by_expr), request)
+    # Paginate the (filtered) recipes queryset (e.g., 10 per page)
     paginator = Paginator(recipes_qs, 10)  # :contentReference[oaicite:10]{index=10}
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)  # returns a Page object for the given page
-    # Attach a comma-separated ingredients list to each recipe (for data-ingredients attribute)
-    for recipe in page_obj:
-        ingredient_list = [ing.name for ing in recipe.ingredients.all()]
-        recipe.ingredients_csv = ", ".join(ingredient_list)
     # Handle bulk visibility update if form submitted
     if request.method == 'POST':
         recipe_ids = request.POST.getlist("recipe_ids")
         if not recipe_ids:
             messages.error(request, "No recipes found for update.")
             return redirect('recipes:recipe_list')
-        updated_count = 0
+        changes = {}
         for rid in recipe_ids:
             visibility = request.POST.get(f'visibility_{rid}')
             if visibility:
-                try:
-                    recipe = Recipe.objects.get(recipe_id=int(rid), user=request.user)
-                    recipe.visibility = visibility
-                    recipe.save()
-                    updated_count += 1
-                except Recipe.DoesNotExist:
-                    messages.warning(request, f"Failed to update recipe ID {rid}.")
+                changes[rid] = visibility
             else:
                 messages.warning(request, f"No visibility selected for recipe ID {rid}.")
+        outcomes = bulk_set_visibility(request.user, changes)
+        for rid, outcome in outcomes.items():
+            if outcome in (NOT_FOUND, INVALID):
+                messages.warning(request, f"Failed to update recipe ID {rid}.")
+        updated_count = sum(1 for outcome in outcomes.values() if outcome == UPDATED)
         if updated_count:
             messages.success(request, f"✅ Updated visibility for {updated_count} recipe(s).")
         else:
@@ -264,22 +331,34 @@ def recipe_list(request):
         'page_obj': page_obj,
         'current_sort': sort_field,
         'current_dir': direction,
-        'all_ing_json': json.dumps(all_names)
+        'current_ingredients': ing_terms,
+        'ing_query': ing_query,
     })
 
 @require_POST
 @login_required
 def update_visibility_ajax(request):
+    """
+    Bulk visibility update. JSON body, one of:
+      {"changes": {"<recipe_id>": "<visibility>", ...}}
+      {"recipe_ids": [...], "visibility": "<visibility>"}   (set all selected to X)
+      {"recipe_id": ..., "visibility": "<visibility>"}      (single recipe)
+    Responds with per-id outcomes: updated / unchanged / not_found / invalid.
+    """
     try:
         data = json.loads(request.body)
-        recipe_id = data.get("recipe_id")
-        visibility = data.get("visibility")
-
-        recipe = get_object_or_404(Recipe, recipe_id=recipe_id, user=request.user)
-        recipe.visibility = visibility
-        recipe.save()
+        if "changes" in data:
+            outcomes = bulk_set_visibility(request.user, data.get("changes") or {})
+        elif "recipe_ids" in data:
+            outcomes = set_all_visibility(request.user, data.get("recipe_ids") or [], data.get("visibility"))
+        else:
+            outcomes = bulk_set_visibility(request.user, {data.get("recipe_id"): data.get("visibility")})
 
-        return JsonResponse({"status": "success"})
+        return JsonResponse({
+            "status": "success",
+            "results": {str(rid): outcome for rid, outcome in outcomes.items()},
+            "updated": sum(1 for outcome in outcomes.values() if outcome == UPDATED),
+        })
 
     except Exception as e:
         return JsonResponse({"status": "error", "message": str(e)})
@@ -289,7 +368,7 @@ def update_visibility_ajax(request):
 @login_required
 def recipe_delete(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
-    if recipe.user != request.user:
+    if not can_edit(request.user, recipe):
         return HttpResponseForbidden()
 
     next_url = request.GET.get('next') or request.POST.get('next')
@@ -316,7 +395,7 @@ def recipe_delete(request, pk):
 @login_required
 def recipe_edit(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
-    if recipe.user != request.user:
+    if not can_edit(request.user, recipe):
         return HttpResponseForbidden()
 
     if request.method == 'POST':
@@ -327,9 +406,11 @@ def recipe_edit(request, pk):
         # Formsets now handle empty forms automatically
 
         if recipe_form.is_valid() and ingredient_formset.is_valid() and instruction_formset.is_valid():
-            recipe_form.save()
-            ingredient_formset.save()
-            instruction_formset.save()
+            # one transaction so the search document is rebuilt once, on commit
+            with transaction.atomic():
+                recipe_form.save()
+                ingredient_formset.save()
+                instruction_formset.save()
             return redirect('recipes:recipe_detail', recipe_id=recipe.recipe_id)
         else:
             print("Recipe form errors:", recipe_form.errors)
@@ -385,11 +466,11 @@ def create_recipe(request):
                         "notes": recipe_form.cleaned_data.get("notes", ""),
                     }
 
-                    # FIX: Serialize the uploaded image if present
-                    image_bytes = None
+                    # Stage the uploaded cover image; only its reference goes into the job
+                    image_ref = None
                     if recipe_form.cleaned_data.get("image"):
                         uploaded_file = recipe_form.cleaned_data["image"]
-                        image_bytes = uploaded_file.read()
+                        image_ref = stage_upload(uploaded_file, new_batch_id())
 
                     queue = get_safe_rq_queue('default')
                     job = queue.enqueue(
@@ -400,14 +481,13 @@ def create_recipe(request):
                         instructions_text,
                         transform_vegan,
                         custom_instruction,
-                        image_bytes,  # Now passing the image!
+                        None,       # image_bytes (legacy)
+                        image_ref,
                     )
 
                     messages.success(request, "✅ Import request was succesfully submitted. It can take a few minutes. If something goes wrong with the import, you will be notified.")
                     resp = redirect('recipes:recipe_list')
-                    existing = request.COOKIES.get('last_import_job')
-                    val = job.id if not existing else f"{existing},{job.id}"
-                    resp.set_cookie('last_import_job', val, max_age=900, samesite='Lax')
+                    _remember_import_job(request, resp, job)
                     return resp
 
                 except Exception as e:
@@ -429,8 +509,9 @@ def create_recipe(request):
                 instruction_formset = InstructionFormSet(request.POST, instance=recipe, prefix="instructions")
 
                 if ingredient_formset.is_valid() and instruction_formset.is_valid():
-                    ingredient_formset.save()
-                    instruction_formset.save()
+                    with transaction.atomic():
+                        ingredient_formset.save()
+                        instruction_formset.save()
 
                     messages.success(request, f"✅ Recipe '{recipe.title}' created.")
                     return redirect('recipes:recipe_detail', recipe_id=recipe.recipe_id)
@@ -485,10 +566,7 @@ def add_recipe_from_url(request):
             messages.success(request, "✅ Import request was succesfully submitted. It can take a few minutes. If something goes wrong with the import, you will be notified.")
             resp = redirect('recipes:recipe_list')
 
-            # append job id into cookie (comma-separated), ~15 minutes
-            existing = request.COOKIES.get('last_import_job')
-            val = job.id if not existing else f"{existing},{job.id}"
-            resp.set_cookie('last_import_job', val, max_age=900, samesite='Lax')
+            _remember_import_job(request, resp, job)
             return resp
 
         except Exception as e:
@@ -508,19 +586,12 @@ def add_recipe_from_image(request):
         custom_title = request.POST.get('custom_title', '')
 
         try:
-            # NEW: keep metadata so the worker can split images vs docs
-            uploads_serialized = []
-            for f in uploads:
-                blob = f.read()
-                if not blob:
-                    continue
-                uploads_serialized.append({
-                    "name": getattr(f, "name", ""),
-                    "content_type": getattr(f, "content_type", "") or "",
-                    "bytes": blob,
-                })
+            # Stream uploads to the staging store; the job only carries references
+            # (with name/content_type so the worker can split images vs docs)
+            _, uploads_serialized = stage_uploads(uploads)
 
-            queue = get_safe_rq_queue('default')
+            # Image/document jobs go to the image queue, whose worker keeps rembg preloaded
+            queue = get_safe_rq_queue(settings.IMAGE_QUEUE_NAME)
             # NEW: route to a more general worker that accepts mixed uploads
             job = queue.enqueue(
                 process_recipe_from_uploads,
@@ -534,9 +605,7 @@ def add_recipe_from_image(request):
             messages.success(request, "✅ Import request was succesfully submitted. It can take a few minutes. If something goes wrong with the import, you will be notified.")
             resp = redirect('recipes:recipe_list')
 
-            existing = request.COOKIES.get('last_import_job')
-            val = job.id if not existing else f"{existing},{job.id}"
-            resp.set_cookie('last_import_job', val, max_age=900, samesite='Lax')
+            _remember_import_job(request, resp, job)
             return resp
 
         except Exception as e:
@@ -570,9 +639,7 @@ def add_recipe_from_text(request):
                 messages.success(request, "✅ Import request was succesfully submitted. It can take a few minutes. If something goes wrong with the import, you will be notified.")
                 resp = redirect('recipes:recipe_list')
 
-                existing = request.COOKIES.get('last_import_job')
-                val = job.id if not existing else f"{existing},{job.id}"
-                resp.set_cookie('last_import_job', val, max_age=900, samesite='Lax')
+                _remember_import_job(request, resp, job)
                 return resp
 
             except Exception as e:
@@ -600,8 +667,9 @@ def add_recipe_from_text(request):
 #region FRIEND MANAGEMENT
 ###################### FRIEND MANAGEMENT #####################
 @login_required
+@query_budget(5)
 def friends_recipes(request, friend_id):
-    if not Friendship.objects.filter(user=request.user, friend_id=friend_id).exists():
+    if not are_friends(request.user.id, friend_id):
         return HttpResponseForbidden("You are not friends with this user.")
 
     # Fetch the full User object for display
@@ -611,66 +679,80 @@ def friends_recipes(request, friend_id):
     direction = request.GET.get('dir') or 'desc'
     order_expr = sort_field if direction == 'asc' else f'-{sort_field}'
 
-    recipes_qs = Recipe.objects.filter(
-        user_id=friend_id,
-        visibility__in=['friends', 'public']
-    ).order_by(order_expr).prefetch_related('ingredients')
-
-    all_ingredients = Ingredient.objects.filter(
-        recipe__in=recipes_qs
-    ).values_list('name', flat=True).distinct()
-    all_ingredients = sorted({name.lower() for name in all_ingredients})
+    recipes_qs = Recipe.objects.visible_to(request.user).filter(user_id=friend_id).order_by(order_expr)
+    recipes_qs, ing_terms, ing_query = _filter_by_ingredients(recipes_qs, request)
 
     paginator = Paginator(recipes_qs, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    for recipe in page_obj:
-        ingredient_list = [ing.name for ing in recipe.ingredients.all()]
-        recipe.ingredients_csv = ", ".join(ingredient_list)
-
     return render(request, 'recipes/friends_recipes.html', {
         'page_obj': page_obj,
         'current_sort': sort_field,
         'current_dir': direction,
-        'all_ing_json': json.dumps(all_ingredients),
+        'current_ingredients': ing_terms,
+        'ing_query': ing_query,
         'friend_id': friend_id,
         'friend': friend  # ✅ Now passed to the template
     })
 
+def _copy_redirect(request):
+    next_url = request.POST.get('next') or request.GET.get('next') or request.META.get('HTTP_REFERER')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect("recipes:recipe_list")
+
+
 @login_required
 def copy_recipe(request, recipe_id):
-    original = get_object_or_404(Recipe, recipe_id=recipe_id)
-    if original.visibility not in ['friends', 'public']:
+    original = get_object_or_404(Recipe.objects.visible_to(request.user), recipe_id=recipe_id)
+    if not can_copy(request.user, original):
         return HttpResponseForbidden("Not allowed to copy this recipe.")
-    
-    copied = Recipe.objects.create(
-        title=original.title,
-        cook_time=original.cook_time,
-        portions=original.portions,
-        image=original.image,
-        notes=original.notes,
-        user=request.user,
-        visibility='private',
-    )
-    for ing in original.ingredients.all():
-        copied.ingredients.create(
-            name=ing.name,
-            quantity=ing.quantity,
-            unit=ing.unit,               # <-- This line fixes the issue
-            category=ing.category
-        )
-    for inst in original.instructions.all():
-        copied.instructions.create(description=inst.description, step_number=inst.step_number)
-    
+
+    copy_recipes(request.user, recipe_ids=[original.recipe_id])
     messages.success(request, "Recipe copied!")
-    next_url = request.POST.get('next') or request.GET.get('next') or request.META.get('HTTP_REFERER')
+    return _copy_redirect(request)
 
-    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
-        return redirect(next_url)
 
-    # Final fallback (adjust to whatever makes sense in your app)
-    return redirect("recipes:friends_list")  # or friends_recipes, etc.
+# Larger collections are copied by an RQ job instead of inside the request
+COPY_INLINE_MAX = int(os.getenv("COPY_INLINE_MAX", "50"))
+
+@require_POST
+@login_required
+def copy_recipes_bulk(request):
+    """
+    Copy many recipes at once.
+    POST: recipe_ids (repeated) or friend_id (= all recipes that friend shares
+          with you); image_mode = reference (default) | duplicate.
+    """
+    image_mode = request.POST.get("image_mode", "reference")
+    if image_mode not in IMAGE_MODES:
+        image_mode = "reference"
+    friend_id = request.POST.get("friend_id")
+    if friend_id:
+        if not are_friends(request.user.id, friend_id):
+            return HttpResponseForbidden("You are not friends with this user.")
+        params = {"source_user_id": int(friend_id)}
+    else:
+        params = {"recipe_ids": [int(r) for r in request.POST.getlist("recipe_ids") if str(r).isdigit()]}
+
+    count = copyable_recipes(request.user, **params).count()
+    if not count:
+        messages.error(request, "No recipes to copy.")
+        return _copy_redirect(request)
+
+    if count > COPY_INLINE_MAX:
+        try:
+            queue = get_safe_rq_queue('default')
+            queue.enqueue(process_bulk_copy, request.user.id, image_mode=image_mode, job_timeout=1800, **params)
+            messages.success(request, f"📋 Copying {count} recipes in the background. They will appear in My Recipes shortly.")
+            return _copy_redirect(request)
+        except Exception as e:
+            print("⚠️ Bulk copy queue unavailable, copying inline:", e)
+
+    copies = copy_recipes(request.user, image_mode=image_mode, **params)
+    messages.success(request, f"📋 Copied {len(copies)} recipe(s) to your collection.")
+    return _copy_redirect(request)
 
 ###################### /FRIEND MANAGEMENT #####################
 
@@ -678,6 +760,7 @@ def copy_recipe(request, recipe_id):
 #region PUBLIC RECIPES
 ####################### PUBLIC RECIPES #######################
 @login_required
+@query_budget(4)
 def public_recipes(request):
     # Sorting (default: created_at desc)
     sort_field = request.GET.get('sort') or 'created_at'
@@ -689,147 +772,310 @@ def public_recipes(request):
         Recipe.objects
         .filter(visibility='public')
         .exclude(user=request.user)
+        .select_related('user')  # the table shows each owner's username
         .order_by(order_expr)
-        .prefetch_related('ingredients')
     )
-
-    # Ingredient suggestions (lowercased/distinct), like friends_recipes
-    all_ingredients = Ingredient.objects.filter(
-        recipe__in=recipes_qs
-    ).values_list('name', flat=True).distinct()
-    all_ingredients = sorted({name.lower() for name in all_ingredients})
+    recipes_qs, ing_terms, ing_query = _filter_by_ingredients(recipes_qs, request)
 
     # Pagination (10 per page, consistent with your other lists)
     paginator = Paginator(recipes_qs, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    # Build CSV for client-side ingredient filtering
-    for recipe in page_obj:
-        ingredient_list = [ing.name for ing in recipe.ingredients.all()]
-        recipe.ingredients_csv = ", ".join(ingredient_list)
-
     return render(request, 'recipes/public_recipes.html', {
         'page_obj': page_obj,
         'current_sort': sort_field,
         'current_dir': direction,
-        'all_ing_json': json.dumps(all_ingredients),
+        'current_ingredients': ing_terms,
+        'ing_query': ing_query,
     })
 ####################### /PUBLIC RECIPES #######################
 #endregion PUBLIC RECIPES
 
 
+#region INGREDIENT SUGGESTIONS
+####################### INGREDIENT SUGGESTIONS #######################
+from .functions.suggestions import suggest_ingredients
 
+@require_GET
+@login_required
+@query_budget(3)
+def ingredient_suggestions(request):
+    """
+    Prefix search over the precomputed IngredientSuggestion index.
+    ?scope=mine | friend (&friend_id=) | public, ?q=<prefix>
+    """
+    scope = request.GET.get("scope", "mine")
+    prefix = request.GET.get("q", "")
+    try:
+        limit = min(int(request.GET.get("limit", 20)), 50)
+    except ValueError:
+        limit = 20
+
+    if scope == "mine":
+        results = suggest_ingredients(prefix, user_ids=[request.user.id], limit=limit)
+    elif scope == "friend":
+        friend_id = request.GET.get("friend_id")
+        if not friend_id or not are_friends(request.user.id, friend_id):
+            return JsonResponse({"status": "error", "message": "You are not friends with this user."}, status=403)
+        results = suggest_ingredients(
+            prefix, user_ids=[friend_id], visibilities=["friends", "public"], limit=limit
+        )
+    elif scope == "public":
+        results = suggest_ingredients(
+            prefix, visibilities=["public"], exclude_user_id=request.user.id, limit=limit
+        )
+    else:
+        return JsonResponse({"status": "error", "message": "unknown scope"}, status=400)
 
-#region PDF EXPORT
-######################### PDF EXPORT ########################
+    return JsonResponse({"results": results})
 
+####################### /INGREDIENT SUGGESTIONS #######################
+#endregion INGREDIENT SUGGESTIONS
 
-# recipes/views.py
-from io import BytesIO
-from django.http import HttpResponse, HttpResponseForbidden
-from xhtml2pdf import pisa
-from django.contrib.staticfiles import finders
-from django.template.loader import get_template
 
-import os
+#region RECIPE SEARCH
+####################### RECIPE SEARCH #######################
+from .functions.search import search_recipes as run_recipe_search
 
-from .models import Recipe
+@require_GET
+@login_required
+@query_budget(6)
+def search_recipes(request):
+    """
+    Ranked full-text search over title > ingredients > instructions > notes,
+    limited to recipes the user may see (own, friends' shared, public).
+    ?q=<query>&page=<n>
+
+    Queries: session, user, friend graph (when not cached), the search
+    (COUNT + page on PostgreSQL, one MATCH on SQLite), the page's recipes.
+    """
+    query = (request.GET.get("q") or "").strip()
+    paginator = Paginator(run_recipe_search(request.user, query), 10)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    ranked = list(page_obj.object_list)
+    recipes = Recipe.objects.select_related("user").in_bulk([rid for rid, _ in ranked])
+    results = []
+    for rid, rank in ranked:
+        recipe = recipes.get(rid)
+        if recipe is None:
+            continue
+        results.append({
+            "recipe_id": recipe.recipe_id,
+            "title": recipe.title,
+            "owner": recipe.user.username,
+            "visibility": recipe.visibility,
+            "image": variant_url(recipe, "thumb") or None,
+            "url": reverse("recipes:recipe_detail", args=[recipe.recipe_id]),
+            "rank": round(float(rank or 0), 4),
+        })
 
-def user_can_view_recipe(user, recipe):
-    if recipe.visibility == "public":
-        return True
-    if user.is_authenticated and recipe.user_id == user.id:
-        return True
-    # add any "friends" rules here if you have them
-    return False
+    return JsonResponse({
+        "query": query,
+        "results": results,
+        "page": page_obj.number,
+        "num_pages": paginator.num_pages,
+        "total": paginator.count,
+    })
 
-def _is_abs(url: str) -> bool:
-    return url.startswith("http://") or url.startswith("https://")
+####################### /RECIPE SEARCH #######################
+#endregion RECIPE SEARCH
 
-def _strip_prefix(s: str, prefix: str) -> str:
-    return s[len(prefix):] if s.startswith(prefix) else s
 
 
-def _link_callback(uri: str, rel: str | None):
-    """
-    Resolve URIs in HTML so xhtml2pdf can load assets.
 
-    - If the URI is absolute (http/https), return it unchanged (let xhtml2pdf fetch it).
-    - If MEDIA_URL/STATIC_URL are absolute (CDN/S3) and the URI starts with them, return the URI unchanged.
-    - If MEDIA_URL/STATIC_URL are relative, map to MEDIA_ROOT/STATIC_ROOT or use staticfiles finders.
-    - For other relative paths, resolve against 'rel' (the current template directory).
-    - Never raise FileNotFoundError; fall back to returning the original URI so xhtml2pdf can try.
+#region PDF EXPORT
+######################### PDF EXPORT ########################
+
+
+# recipes/views.py
+from django.http import HttpResponse, HttpResponseForbidden, FileResponse
+from rq.exceptions import NoSuchJobError
+
+from .models import Recipe
+from .functions.pdf_export import (
+    _link_callback,
+    artifact_storage,
+    build_pdf_artifact,
+    get_pdf_artifact,
+    pdf_artifact_key,
+    PdfRenderError,
+)
+from .tasks import render_recipe_pdf, process_cookbook_export
+
+def _serve_stored_file(key, filename, content_type="application/pdf"):
+    """
+    Serve a private artifact after the caller's permission check: redirect to
+    a short-lived signed URL when artifacts live on S3 (querystring auth is on
+    for that storage only), else stream the file from storage.
     """
-    if not uri:
-        return uri
-
-    # 1) Fully-qualified external URL?
-    if _is_abs(uri):
-        return uri
-
-    # 2) MEDIA_URL handling (S3/CDN vs local)
-    media_url = getattr(settings, "MEDIA_URL", "") or ""
-    if media_url:
-        if _is_abs(media_url) and uri.startswith(media_url):
-            # S3/CDN media → leave as is
-            return uri
-        if uri.startswith(media_url):
-            candidate = os.path.join(settings.MEDIA_ROOT, _strip_prefix(uri, media_url))
-            if os.path.isfile(candidate):
-                return candidate
-
-    # 3) STATIC_URL handling (CDN vs local)
-    static_url = getattr(settings, "STATIC_URL", "") or ""
-    if static_url:
-        if _is_abs(static_url) and uri.startswith(static_url):
-            # CDN static → leave as is
-            return uri
-        if uri.startswith(static_url):
-            # Try collectstatic path
-            found = finders.find(_strip_prefix(uri, static_url))
-            if found:
-                return found
-            candidate = os.path.join(getattr(settings, "STATIC_ROOT", "") or "", _strip_prefix(uri, static_url))
-            if candidate and os.path.isfile(candidate):
-                return candidate
-
-    # 4) Relative path: resolve against template directory if provided
-    if rel and not os.path.isabs(uri):
-        base_dir = os.path.dirname(rel)
-        candidate = os.path.normpath(os.path.join(base_dir, uri))
-        if os.path.isfile(candidate):
-            return candidate
-
-    # 5) Last resort: return the original string and let xhtml2pdf try
-    return uri
+    storage = artifact_storage()
+    if getattr(storage, "querystring_auth", False):
+        disposition = f'attachment; filename="{filename}"'
+        return redirect(storage.url(key, parameters={"ResponseContentDisposition": disposition}))
+    return FileResponse(storage.open(key, "rb"), as_attachment=True, filename=filename, content_type=content_type)
+
+
+def _pdf_job_id(recipe):
+    # One render job per artifact: concurrent requests for the same version share it
+    return "pdf-" + pdf_artifact_key(recipe).replace("/", "-").replace(".pdf", "")
+
 
 def recipe_pdf(request, recipe_id):
+    """
+    Serve the recipe PDF from the artifact store. On a miss the render is
+    enqueued and a small page polls (?status=1) until the artifact exists.
+    Falls back to rendering inline only when the queue is unavailable.
+    """
     recipe = get_object_or_404(
-        Recipe.objects.prefetch_related("ingredients", "instructions"),
+        Recipe.objects.visible_to(request.user)
+        .select_related("user").prefetch_related("ingredients", "instructions"),
         recipe_id=recipe_id
     )
-    if not user_can_view_recipe(request.user, recipe):
-        return HttpResponseForbidden("You don't have access to this recipe.")
 
-    # Optional: convenience attribute if your template wants it
-    recipe.ingredients_csv = ", ".join(i.name for i in recipe.ingredients.all())
+    filename = f'{slugify(recipe.title or "recipe")}.pdf'
+    status_only = bool(request.GET.get("status"))
+    key = get_pdf_artifact(recipe)
+    if key and not status_only:
+        return _serve_stored_file(key, filename)
 
-    template = get_template("recipes/recipe_pdf_xhtml2pdf.html")
-    html = template.render({"recipe": recipe, "request": request})
+    job = None
+    try:
+        queue = get_safe_rq_queue('default')
+        job_id = _pdf_job_id(recipe)
+        try:
+            job = Job.fetch(job_id, connection=queue.connection)
+        except NoSuchJobError:
+            job = None
+        if key is None and not status_only and (job is None or job.is_failed):
+            job = queue.enqueue(render_recipe_pdf, recipe.recipe_id, job_id=job_id, result_ttl=300)
+    except Exception as e:
+        print("⚠️ PDF queue unavailable, rendering inline:", e)
+        if key is None:
+            try:
+                key = build_pdf_artifact(recipe)
+            except PdfRenderError:
+                return HttpResponse("Error rendering PDF", status=500)
+        if not status_only:
+            return _serve_stored_file(key, filename)
 
-    result = BytesIO()
-    pdf_status = pisa.CreatePDF(html, dest=result, link_callback=_link_callback)
-    if pdf_status.err:
-        return HttpResponse("Error rendering PDF", status=500)
+    if status_only:
+        return JsonResponse({
+            "ready": key is not None,
+            "failed": key is None and job is not None and job.is_failed,
+        })
 
-    filename = f'{slugify(recipe.title or "recipe")}.pdf'
-    resp = HttpResponse(result.getvalue(), content_type="application/pdf")
-    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return resp
+    return render(request, "recipes/recipe_pdf_pending.html", {"recipe": recipe})
 
 
 ######################### /PDF EXPORT ########################
+#endregion
+
+
+#region COOKBOOK EXPORT
+######################### COOKBOOK EXPORT ########################
+from .functions.cookbook import EXPORT_FORMATS, EXPORT_TTL_HOURS
+
+COOKBOOK_EXPORT_MAX = int(os.getenv("COOKBOOK_EXPORT_MAX", "1000"))
+
+
+def _fetch_own_export_job(request, job_id):
+    """The export job, if it exists and belongs to the requesting user."""
+    try:
+        job = Job.fetch(job_id, connection=get_safe_rq_queue('default').connection)
+    except Exception:
+        return None
+    if (job.meta or {}).get("user_id") != request.user.id:
+        return None
+    return job
+
+
+@require_POST
+@login_required
+def cookbook_export(request):
+    """
+    Enqueue a cookbook export of many recipes.
+    POST: scope = selected | mine | friend | public, format = pdf | zip,
+          recipe_ids (scope=selected), friend_id (scope=friend).
+    Only recipes the user may see are ever exported.
+    """
+    scope = request.POST.get("scope", "selected")
+    fmt = request.POST.get("format", "pdf")
+    back = request.META.get("HTTP_REFERER") or reverse("recipes:recipe_list")
+    if fmt not in EXPORT_FORMATS:
+        messages.error(request, "Unknown export format.")
+        return redirect(back)
+
+    recipes_qs = Recipe.objects.visible_to(request.user)
+    if scope == "mine":
+        recipes_qs = recipes_qs.filter(user=request.user)
+    elif scope == "friend":
+        recipes_qs = recipes_qs.filter(user_id=request.POST.get("friend_id") or 0)
+    elif scope == "public":
+        recipes_qs = recipes_qs.filter(visibility="public")
+    else:
+        ids = [int(r) for r in request.POST.getlist("recipe_ids") if str(r).isdigit()]
+        recipes_qs = recipes_qs.filter(pk__in=ids)
+
+    recipe_ids = list(recipes_qs.order_by("title", "recipe_id").values_list("recipe_id", flat=True)[:COOKBOOK_EXPORT_MAX + 1])
+    if not recipe_ids:
+        messages.error(request, "No recipes selected for the export.")
+        return redirect(back)
+    if len(recipe_ids) > COOKBOOK_EXPORT_MAX:
+        messages.error(request, f"Exports are limited to {COOKBOOK_EXPORT_MAX} recipes at a time.")
+        return redirect(back)
+
+    try:
+        queue = get_safe_rq_queue('default')
+        job = queue.enqueue(
+            process_cookbook_export,
+            request.user.id,
+            recipe_ids,
+            fmt,
+            job_timeout=3600,
+            result_ttl=EXPORT_TTL_HOURS * 3600,
+            meta={"user_id": request.user.id, "progress": {"done": 0, "total": len(recipe_ids)}},
+        )
+    except Exception as e:
+        print("❌ Error enqueueing cookbook export:", e)
+        messages.error(request, "❌ The export service is currently in maintenance. Try again later!")
+        return redirect(back)
+
+    return redirect("recipes:cookbook_export_status", job_id=job.id)
+
+
+@login_required
+def cookbook_export_status(request, job_id):
+    """Status page for one export; ?json=1 is polled by the page itself."""
+    job = _fetch_own_export_job(request, job_id)
+    if job is None:
+        raise Http404("Export not found")
+
+    meta = job.meta or {}
+    status = job.get_status(refresh=False)
+    payload = {
+        "status": str(getattr(status, "value", status)),
+        "progress": meta.get("progress", {}),
+        "error_message": meta.get("error_message"),
+        "download_url": reverse("recipes:cookbook_export_download", args=[job.id]) if meta.get("artifact") else None,
+    }
+    if request.GET.get("json"):
+        return JsonResponse(payload)
+    return render(request, "recipes/cookbook_export_status.html", {"job_id": job.id, **payload})
+
+
+@login_required
+def cookbook_export_download(request, job_id):
+    job = _fetch_own_export_job(request, job_id)
+    key = (job.meta or {}).get("artifact") if job else None
+    if not key:
+        raise Http404("Export not ready")
+    fmt = key.rsplit(".", 1)[-1]
+    content_type = "application/pdf" if fmt == "pdf" else "application/zip"
+    return _serve_stored_file(key, f"cookbook-{job.id[:8]}.{fmt}", content_type)
+
+######################### /COOKBOOK EXPORT ########################
 
 
 
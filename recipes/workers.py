@@ -0,0 +1,27 @@
+"""
+RQ worker that keeps its database connection between jobs.
+
+rq.Worker forks a work horse per job, and the horse exits when the job ends
+-- taking its database connection (TCP + TLS + auth) with it, so every job
+pays a new connection setup. ConnectionReusingWorker runs jobs in the worker
+process instead (rq.SimpleWorker) and treats each job like Django treats a
+request: close_old_connections() before and after, which keeps the connection
+for CONN_MAX_AGE seconds, drops it if a job left it broken or inside a
+transaction, and (with DATABASES OPTIONS["pool"]) returns it to the pool.
+
+    python manage.py rqworker default --worker-class recipes.workers.ConnectionReusingWorker
+
+Trade-off: jobs share one process, so a job that leaks memory keeps it.
+"""
+from django.db import close_old_connections
+from rq import SimpleWorker
+
+
+class ConnectionReusingWorker(SimpleWorker):
+
+    def execute_job(self, job, queue):
+        close_old_connections()
+        try:
+            return super().execute_job(job, queue)
+        finally:
+            close_old_connections()